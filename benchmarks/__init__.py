@@ -0,0 +1,9 @@
+"""Performance benchmarks for Pratt Calc.
+
+Run the whole suite from the repository root with
+
+    uv run python -m benchmarks
+
+See 'python -m benchmarks --help' for options.
+
+"""
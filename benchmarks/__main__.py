@@ -0,0 +1,141 @@
+"""Run the benchmark suite, reporting the results as JSON.
+
+Each workload is timed over several rounds, of which the best and the
+median are reported, along with the throughput of the best round.
+
+"""
+
+import json
+import platform
+import statistics
+import sys
+import time
+from importlib.metadata import PackageNotFoundError, version
+from typing import Annotated, NamedTuple, cast
+
+import typer
+
+from benchmarks.workloads import WORKLOADS
+
+
+class Result(NamedTuple):
+    """The timings of a single workload."""
+
+    name: str
+    scale: int
+    size: int
+    units: str
+    rounds: int
+    best: float
+    median: float
+    throughput: float
+
+
+def measure(name: str, scale: int, rounds: int) -> Result:
+    """Time ROUNDS rounds of workload NAME at the given SCALE."""
+
+    workload = WORKLOADS[name](scale)
+
+    # Warm up, so that one-off costs (compiling regexes, filling
+    # caches) don't count against the first round.
+    _ = workload.run()
+
+    seconds: list[float] = []
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _ = workload.run()
+        seconds.append(time.perf_counter() - start)
+
+    best = min(seconds)
+
+    return Result(
+        name,
+        scale,
+        workload.size,
+        workload.units,
+        rounds,
+        best,
+        statistics.median(seconds),
+        workload.size / best,
+    )
+
+
+def compare(results: list[Result], filename: str):
+    """Print how RESULTS compare to those saved in FILENAME."""
+
+    with open(filename, encoding="utf-8") as f:
+        report = cast(dict[str, list[dict[str, float]]], json.load(f))
+
+    baseline = {str(r["name"]): r["best"] for r in report["results"]}
+
+    for result in results:
+        if (before := baseline.get(result.name)) is None:
+            continue
+
+        after = result.best
+        change = f"{before * 1000:10.2f} ms -> {after * 1000:10.2f} ms"
+
+        print(f"{result.name:>12}: {change}  ({before / after:5.2f}x)", file=sys.stderr)
+
+
+def main(
+    scale: Annotated[
+        int, typer.Option(help="Scale the size of every workload.", min=1)
+    ] = 1,
+    rounds: Annotated[
+        int, typer.Option(help="Number of timed rounds per workload.", min=1)
+    ] = 5,
+    only: Annotated[
+        list[str] | None,
+        typer.Option(help=f"Run only this workload: one of {', '.join(WORKLOADS)}."),
+    ] = None,
+    output: Annotated[
+        str | None, typer.Option(help="Write the results to this file.")
+    ] = None,
+    baseline: Annotated[
+        str | None,
+        typer.Option("--compare", help="Compare with an earlier run's results."),
+    ] = None,
+):
+    """Run the benchmark suite, printing the results as JSON.
+
+    With --compare, also print (to stderr) how each workload has
+    changed since the run whose results are in the given file.
+
+    """
+
+    names = only or list(WORKLOADS)
+
+    for name in names:
+        if name not in WORKLOADS:
+            raise typer.BadParameter(f"No such workload: '{name}'")
+
+    try:
+        package_version = version("pratt-calc")
+    except PackageNotFoundError:
+        package_version = None
+
+    results = [measure(name, scale, rounds) for name in names]
+
+    report = {
+        "version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [result._asdict() for result in results],
+    }
+
+    text = json.dumps(report, indent=2)
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as f:
+            _ = f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    typer.run(main)
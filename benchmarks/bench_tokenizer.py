@@ -0,0 +1,89 @@
+"""Compare tokenizer throughput against the original implementation.
+
+Run from the repository root with
+
+    uv run python benchmarks/bench_tokenizer.py
+
+"""
+
+import re
+import timeit
+from collections.abc import Generator
+
+from pratt_calc.tokenizer import Token, Type, scan
+
+
+def legacy_tokenize(raw_expression: str) -> Generator[Token]:
+    """The tokenizer as it was before the single-pass rewrite."""
+
+    raw_expression = re.sub(r"/\*.*?\*/", "", raw_expression, flags=re.DOTALL)
+    raw_expression = re.sub(r"\n+", ";", raw_expression)
+
+    token_specification = [
+        ("NUMBER", r"\d+(\.\d*)?"),
+        (
+            "OPERATOR",
+            r"pi|sin|cos|tan|sec|csc|cot|print|call|str|<-|[-+*/!()^;{}\"]",
+        ),
+        ("IDENTIFIER", r"[a-zA-Z_][\w]*"),
+        ("SKIP", r"[ \t]+"),
+        ("ERROR", r"."),
+    ]
+
+    token_regex = "|".join(f"(?P<{pair[0]}>{pair[1]})" for pair in token_specification)
+    pattern = re.compile(token_regex)
+
+    for mo in re.finditer(pattern, raw_expression):
+        what = mo.lastgroup
+        value = mo.group()
+
+        match what:
+            case "NUMBER":
+                if "." in value:
+                    yield Token(Type.FLOAT, value)
+                else:
+                    yield Token(Type.INT, value)
+
+            case "OPERATOR":
+                yield Token(Type.OPERATOR, value)
+
+            case "IDENTIFIER":
+                yield Token(Type.IDENTIFIER, value)
+
+            case "SKIP":
+                continue
+
+            case "ERROR":
+                raise ValueError(f"Bad token: '{value}'")
+
+            case _:
+                raise ValueError(f"Fatal: unknown category '{what}:{value}'")
+
+    yield Token(Type.EOF, "eof")
+
+
+WORKLOADS = {
+    "short expression": ("alice + 3 * (bob - 4.5) ^ 2", 20_000),
+    "long script": (
+        "/* comment */\n"
+        + "total <- price * qty; tax <- total * 0.07\n"
+        + "print(str(sin(pi / 4) + total))\n" * 5_000,
+        3,
+    ),
+}
+
+
+def main():
+    for name, (source, number) in WORKLOADS.items():
+        print(f"{name} ({len(source)} chars, {number} runs):")
+
+        for label, fn in [("legacy", legacy_tokenize), ("scan", scan)]:
+            timer = timeit.Timer(lambda fn=fn, source=source: list(fn(source)))
+            seconds = min(timer.repeat(number=number, repeat=5))
+            throughput = len(source) * number / seconds / 1e6
+
+            print(f"  {label:>8}: {seconds:8.4f} s  ({throughput:7.2f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Synthetic workloads for the benchmark suite.
+
+Each workload is a function taking a SCALE factor and returning a
+Workload: a callable doing one round of work, plus the size of that
+work. Doubling SCALE roughly doubles the work done per round.
+
+"""
+
+import contextlib
+import glob
+import io
+import itertools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.limits import Limits
+from pratt_calc.output import BufferedOutput
+from pratt_calc.programs import Programs
+from pratt_calc.tokenizer import tokenize
+
+
+class Workload(NamedTuple):
+    """A single round of work to be timed.
+
+    SIZE is how much work a round does, measured in UNITS (for
+    example, characters tokenized, or calls made.)
+
+    """
+
+    run: Callable[[], object]
+    size: int
+    units: str
+
+
+def script(scale: int) -> str:
+    """Return a script of typical statements, SCALE * 10,000 lines long."""
+
+    lines = [
+        "/* Some bookkeeping. */",
+        "total <- price * qty; tax <- total * 0.07",
+        'label <- "running total"',
+        "print(str(sin(pi / 4) + total))",
+    ]
+
+    return "\n".join(itertools.islice(itertools.cycle(lines), scale * 10_000))
+
+
+def tokenizer(scale: int) -> Workload:
+    """Tokenize a large script."""
+
+    source = script(scale)
+
+    return Workload(lambda: list(tokenize(source)), len(source), "chars")
+
+
+def precedence(scale: int) -> Workload:
+    """Compile and run expressions exercising every precedence level.
+
+    The compile cache is disabled, so that each round parses the
+    expression anew.
+
+    """
+
+    term = "-sin(a) + b * c ^ 2 ^ 0.5 / (d - e + 3)! - cos(-f) * tan(g + h)"
+    depth = scale * 25
+    source = "(" * depth + term + (" + " + term + ")") * depth
+
+    def run():
+        ev = Evaluator(cache_size=0)
+
+        return ev.evaluate(source)
+
+    return Workload(run, len(source), "chars")
+
+
+def registers(scale: int) -> Workload:
+    """Define and read back many registers."""
+
+    count = scale * 2000
+    statements = [f"r{i} <- r{i - 1} + {i}" for i in range(1, count)]
+
+    def run():
+        ev = Evaluator()
+
+        for statement in statements:
+            _ = ev.evaluate(statement)
+
+        return ev.evaluate(f"r{count - 1}")
+
+    return Workload(run, count, "registers")
+
+
+def calls(scale: int) -> Workload:
+    """Repeatedly call a quoted block, including a conditional."""
+
+    count = scale * 10_000
+    ev = Evaluator()
+    _ = ev.evaluate("f <- {x <- x + 1; (x - 1) { y <- y * 2 }; x}")
+
+    def run():
+        for _ in range(count):
+            _ = ev.evaluate("call f")
+
+    return Workload(run, count, "calls")
+
+
+def loop(scale: int, limits: Limits | None = None) -> Workload:
+    """Run a loop written as a block calling itself in tail position.
+
+    Run with and without LIMITS, to see what checking them costs.
+
+    """
+
+    count = scale * 100_000
+    ev = Evaluator(limits=limits)
+    _ = ev.evaluate("f <- {n <- n - 1; total <- total + n * 2; n { call f }}")
+
+    def run():
+        return ev.evaluate(f"n <- {count}; total <- 0; call f; total")
+
+    return Workload(run, count, "iterations")
+
+
+def formula(scale: int, native: bool) -> Workload:
+    """Run a loop evaluating a formula on each iteration.
+
+    Run with NATIVE both on and off, to compare running code natively
+    with running it on the VM.
+
+    """
+
+    count = scale * 100_000
+    ev = Evaluator(native=native)
+    formula = "a * sin(n) ^ 2 + (n - 3) * (n + 3) / b - cos(n / 7)"
+    _ = ev.evaluate("a <- 2.5; b <- 7")
+    _ = ev.evaluate(
+        "f <- {n <- n - 1; y <- " + formula + "; total <- total + y; n { call f }}"
+    )
+
+    def run():
+        return ev.evaluate(f"n <- {count}; total <- 0; call f; total")
+
+    return Workload(run, count, "iterations")
+
+
+def threads(scale: int, count: int) -> Workload:
+    """Evaluate the same statements from COUNT threads at once.
+
+    Each thread has an evaluator of its own, sharing compiled code
+    with the others. The total work doesn't depend on COUNT, so that
+    on a free-threaded build of Python, rounds should take less time
+    as COUNT grows (up to the number of CPUs.)
+
+    """
+
+    total = scale * 20_000
+    programs = Programs()
+    statements = [
+        "f <- {n <- n - 1; total <- total + n * 2; n { call f }}",
+        "n <- 10; total <- 0; call f; total",
+        "a <- sin(total) * 2.5 + (total - 3) * (total + 3) / 7",
+        's <- "hello"; t <- str(a)',
+    ]
+
+    def work(n: int):
+        ev = Evaluator(programs=programs)
+
+        for i in range(n):
+            _ = ev.evaluate(statements[i % len(statements)])
+
+    # Compile everything up front, so that only running it is timed.
+    work(len(statements))
+
+    def run():
+        with ThreadPoolExecutor(count) as pool:
+            _ = list(pool.map(work, [total // count] * count))
+
+    return Workload(run, total, "statements")
+
+
+def constants(scale: int, optimize: bool) -> Workload:
+    """Repeatedly call a block full of constant subexpressions.
+
+    Run with OPTIMIZE both on and off, to see what constant folding
+    buys us.
+
+    """
+
+    count = scale * 10_000
+    ev = Evaluator(optimize=optimize)
+    _ = ev.evaluate("f <- {a <- 2 * pi * r; b <- sin(0.5) * 10! / 3 ^ 0.5; a * 1 + b}")
+
+    def run():
+        for _ in range(count):
+            _ = ev.evaluate("call f")
+
+    return Workload(run, count, "calls")
+
+
+def strings(scale: int) -> Workload:
+    """Grow the heap with strings."""
+
+    count = scale * 5000
+
+    def run():
+        ev = Evaluator()
+
+        for _ in range(count):
+            _ = ev.evaluate('s <- "the quick brown fox"; t <- str(x <- x + 1)')
+
+        return len(ev.heap)
+
+    return Workload(run, count * 2, "strings")
+
+
+def printing(scale: int) -> Workload:
+    """Run a loop printing a few lines on each iteration.
+
+    Lines go to an in-memory stream, so that only the cost of
+    producing them is measured.
+
+    """
+
+    count = scale * 20000
+
+    def run():
+        stream = io.StringIO()
+        ev = Evaluator(output=BufferedOutput(stream))
+        _ = ev.evaluate(
+            'f <- {n <- n - 1; print(s); print("hello there"); print(str n); '
+            + "n { call f }}"
+        )
+        _ = ev.evaluate(f's <- "abc def"; n <- {count}; call f')
+
+        return len(stream.getvalue())
+
+    return Workload(run, count * 3, "lines")
+
+
+def files(scale: int) -> Workload:
+    """Evaluate the sample sources under test/."""
+
+    filenames = sorted(glob.glob("test/*.txt")) * scale * 100
+
+    if not filenames:
+        raise FileNotFoundError("Sample sources not found; run from the repository")
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for filename in filenames:
+                _ = Evaluator().evaluate_file(filename)
+
+    return Workload(run, len(filenames), "files")
+
+
+WORKLOADS: dict[str, Callable[[int], Workload]] = {
+    "tokenizer": tokenizer,
+    "precedence": precedence,
+    "registers": registers,
+    "calls": calls,
+    "loop": loop,
+    "limited": partial(
+        loop, limits=Limits(steps=10**12, heap=10**9, bits=10**6, seconds=3600)
+    ),
+    "formula": partial(formula, native=False),
+    "native": partial(formula, native=True),
+    "threads-1": partial(threads, count=1),
+    "threads-2": partial(threads, count=2),
+    "threads-4": partial(threads, count=4),
+    "threads-8": partial(threads, count=8),
+    "constants": partial(constants, optimize=True),
+    "unoptimized": partial(constants, optimize=False),
+    "strings": strings,
+    "printing": printing,
+    "files": files,
+}
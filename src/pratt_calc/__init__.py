@@ -1,9 +1,14 @@
+import sys
 from typing import Annotated
 
 import typer
 
+from pratt_calc.arithmetic import render
+from pratt_calc.diskcache import DiskCache
 from pratt_calc.evaluator import Evaluator
+from pratt_calc.parallel import evaluate_files, expand
 from pratt_calc.repl import Repl
+from pratt_calc.server import serve
 
 
 def app():
@@ -19,33 +24,119 @@ def app():
         exp: Annotated[
             str, typer.Option("--eval", "-e", help="Evaluate the given expression.")
         ] = "",
-        filename: Annotated[str, typer.Argument(help="Path to source file.")] = "",
+        jobs: Annotated[
+            int | None,
+            typer.Option(
+                "--jobs",
+                "-j",
+                help="Number of processes used to evaluate multiple files.",
+            ),
+        ] = None,
+        stream: Annotated[
+            bool,
+            typer.Option(
+                "--stream",
+                help="Run each statement of a file as soon as it's read.",
+            ),
+        ] = False,
+        cache: Annotated[
+            bool,
+            typer.Option(
+                "--cache/--no-cache",
+                help="Keep compiled files on disk, to speed up later runs.",
+            ),
+        ] = True,
+        profile: Annotated[
+            bool,
+            typer.Option(
+                "--profile",
+                help="Print a profile of the evaluation to stderr.",
+            ),
+        ] = False,
+        address: Annotated[
+            str | None,
+            typer.Option(
+                "--serve",
+                help="Serve requests on HOST:PORT, or on unix:PATH.",
+            ),
+        ] = None,
+        timeout: Annotated[
+            float,
+            typer.Option(help="With --serve, the time limit per request, in seconds."),
+        ] = 10.0,
+        filenames: Annotated[
+            list[str] | None,
+            typer.Argument(help="Paths (or glob patterns) of source files."),
+        ] = None,
     ):
         """Pratt Calc application.
 
-        Without FILENAME or --eval/-e, launch the REPL.
+        Without FILENAMES or --eval/-e, launch the REPL.
 
-        Use --interactive/-i to launch the REPL even when FILENAME or
+        Use --interactive/-i to launch the REPL even when FILENAMES or
         '-e/--eval' are provided.
 
         This is useful for interactively inspecting the state of the
         program.
 
+        Given more than one file, each file is evaluated independently
+        of the others, in parallel (see --jobs/-j), and the output and
+        result of each file is printed in the order the files were
+        given.
+
+        Compiled files are cached on disk (in $PRATT_CALC_CACHE, or
+        else under the user's cache directory), and reused as long as
+        they haven't changed. Use --no-cache to always compile them
+        afresh.
+
+        With --profile, report where the time went once FILENAME or
+        the --eval expression has been evaluated. This only works with
+        a single file.
+
+        With --serve, run an evaluation server instead, with --jobs/-j
+        worker processes.
+
         """
 
-        ev = Evaluator()
+        if address is not None:
+            serve(address, jobs, timeout)
+            return
+
+        disk_cache = DiskCache() if cache else None
+        ev = Evaluator(profile=profile, disk_cache=disk_cache)
+
+        def report():
+            if ev.profiler is not None:
+                print(ev.profiler.report(), file=sys.stderr)
 
         if exp != "":
-            print(ev.evaluate(exp))
+            print(render(ev.evaluate(exp)))
+
+        filenames = expand(filenames or [])
+
+        if profile and len(filenames) > 1:
+            raise typer.BadParameter("--profile works with a single file only")
 
-        if filename != "":
+        if len(filenames) == 1:
             try:
-                print(ev.evaluate_file(filename))
+                print(render(ev.evaluate_file(filenames[0], stream)))
             except Exception as e:
                 print(e)
+                report()
                 raise typer.Abort() from e
+        elif filenames:
+            results = evaluate_files(filenames, jobs, stream, disk_cache)
+
+            for result in results:
+                print(result)
+
+            if any(result.error is not None for result in results):
+                raise typer.Abort()
+
+        if profile and (filenames or exp != ""):
+            report()
 
-        launch_repl = interactive or (filename == "" and exp == "")
+        launch_repl = interactive or (not filenames and exp == "")
 
         if launch_repl:
             Repl(ev).cmdloop()
@@ -0,0 +1,99 @@
+"""Arithmetic shared by the evaluator and the optimizer.
+
+Integers in Pratt Calc are Python integers, and so have no fixed
+size. Both '!' and '^' keep integer results exact, however large
+they get. Python refuses to convert very long integers to text (see
+'sys.set_int_max_str_digits'), and so results are turned into text
+with 'render' instead.
+
+"""
+
+import functools
+import math
+from decimal import Decimal
+from typing import cast
+
+type Number = int | float
+
+
+@functools.lru_cache(maxsize=256)
+def _factorial(n: int) -> int:
+    return math.factorial(n)
+
+
+def factorial(value: Number) -> int:
+    """Return the factorial of VALUE, as computed by the '!' operator.
+
+    Note that, as it always has, this gives 0 for 0, and VALUE itself
+    (truncated to an integer) when VALUE is negative.
+
+    Recent results are remembered, since scripts tend to compute the
+    same factorials over and over.
+
+    """
+
+    n = int(value)
+
+    if n < 1:
+        return n
+
+    return _factorial(n)
+
+
+def power(base: Number, exponent: Number) -> Number:
+    """Raise BASE to EXPONENT, as computed by the '^' operator.
+
+    An integer raised to a non-negative integer power is an exact
+    integer. Anything else is worked out in floating point.
+
+    """
+
+    if type(base) is int and type(exponent) is int and exponent >= 0:
+        return cast(int, base**exponent)
+
+    return math.pow(base, exponent)
+
+
+def factorial_bits(value: Number) -> float:
+    """Estimate the size in bits of the factorial of VALUE."""
+
+    n = int(value)
+
+    if n < 2:
+        return n.bit_length()
+
+    try:
+        return math.lgamma(n + 1) / math.log(2)
+    except OverflowError:
+        return math.inf
+
+
+def power_bits(base: Number, exponent: Number) -> float:
+    """Estimate the size in bits of BASE raised to EXPONENT.
+
+    Only exact integer powers are measured: anything worked out in
+    floating point counts as 0 bits.
+
+    """
+
+    if type(base) is not int or type(exponent) is not int or exponent < 0:
+        return 0
+
+    if abs(base) < 2:
+        return 1
+
+    try:
+        return exponent * math.log2(abs(base))
+    except OverflowError:
+        return math.inf
+
+
+def render(value: Number) -> str:
+    """Return VALUE as text, however many digits it has."""
+
+    try:
+        return str(value)
+    except ValueError:
+        # Converting to a Decimal isn't limited, and an integer's
+        # Decimal is written out in full.
+        return str(Decimal(value))
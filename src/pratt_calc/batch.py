@@ -0,0 +1,457 @@
+"""Vectorized evaluation of compiled code over NumPy columns.
+
+This module needs NumPy, which is an optional dependency; see
+'Evaluator.evaluate_batch' for the public entry point.
+
+"""
+
+from __future__ import annotations
+
+import math
+import warnings
+from collections.abc import Callable, Mapping, Sequence
+from typing import Protocol, final
+
+import numpy as np
+import numpy.typing as npt
+
+from pratt_calc.arithmetic import factorial as scalar_factorial
+from pratt_calc.arithmetic import power as scalar_power
+from pratt_calc.compiler import Code, Opcode, registry
+
+type Column = npt.NDArray[np.generic]
+type Value = int | float | np.generic | Column
+
+# Opcodes which need the heap, and so can't be run column-wise.
+heap_ops = frozenset(
+    {
+        Opcode.PRINT,
+        Opcode.QUOTE,
+        Opcode.CALL,
+        Opcode.COND,
+        Opcode.STRING,
+        Opcode.STRCAST,
+    }
+)
+
+# The magnitude from which an integer no longer fits in an int64.
+_INT64_LIMIT = 2.0**63
+
+
+def _floats(x: Value) -> Column:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _checked(result: Value, floats: Callable[[], Value]) -> Value:
+    """Return RESULT, making sure it hasn't overflowed.
+
+    NumPy integers silently wrap around, while Pratt Calc integers
+    never do. An integer RESULT is therefore worked out again in
+    floating point, by FLOATS: where that's out of int64 range, the
+    exact result can't be had column-wise.
+
+    """
+
+    if np.asarray(result).dtype.kind in "iu" and np.any(
+        np.abs(floats()) >= _INT64_LIMIT
+    ):
+        raise Unvectorizable("Integer result doesn't fit in an int64")
+
+    return result
+
+
+def _exact_unary(op: Callable[[Value], Value]) -> Callable[[Value], Value]:
+    return lambda x: _checked(op(x), lambda: op(_floats(x)))
+
+
+def _exact_binary(
+    op: Callable[[Value, Value], Value],
+) -> Callable[[Value, Value], Value]:
+    return lambda x, y: _checked(op(x, y), lambda: op(_floats(x), _floats(y)))
+
+
+_unary: dict[Opcode, Callable[[Value], Value]] = {
+    Opcode.NEG: _exact_unary(np.negative),
+    Opcode.SIN: np.sin,
+    Opcode.COS: np.cos,
+    Opcode.TAN: np.tan,
+    Opcode.SEC: lambda x: 1 / np.cos(x),
+    Opcode.CSC: lambda x: 1 / np.sin(x),
+    Opcode.COT: lambda x: 1 / np.tan(x),
+}
+
+_binary: dict[Opcode, Callable[[Value, Value], Value]] = {
+    Opcode.ADD: _exact_binary(np.add),
+    Opcode.SUB: _exact_binary(np.subtract),
+    Opcode.MUL: _exact_binary(np.multiply),
+    Opcode.DIV: np.true_divide,
+}
+
+
+def _floor(x: Value) -> Value:
+    if np.asarray(x).dtype.kind in "iu":
+        return x
+
+    floors = np.floor(x)
+
+    # As with scalar evaluation, the result is an integer.
+    if not np.all(np.abs(floors) < _INT64_LIMIT):
+        raise Unvectorizable("Floor doesn't fit in an int64")
+
+    return floors.astype(np.int64)
+
+
+def _domain(
+    op: Callable[[Value], Value], within: Callable[[Column], Column]
+) -> Callable[[Value], Value]:
+    """Apply OP, where every element is WITHIN its domain.
+
+    Scalar evaluation raises ValueError outside of it, where NumPy
+    gives nan instead, and so such columns are left to row-by-row
+    evaluation.
+
+    """
+
+    def apply(x: Value) -> Value:
+        if not np.all(within(np.asarray(x))):
+            raise Unvectorizable("Argument outside of the function's domain")
+
+        return op(x)
+
+    return apply
+
+
+# The native functions Pratt Calc comes with, along with their NumPy
+# equivalents. These are keyed by function rather than by name, so
+# that a function registered in place of one of them (see
+# 'Registry.function') isn't mistaken for it.
+_natives: dict[Callable[..., int | float], Callable[..., Value]] = {
+    registry.functions["sqrt"].function: _domain(
+        np.sqrt, lambda x: np.greater_equal(x, 0)
+    ),
+    registry.functions["exp"].function: np.exp,
+    registry.functions["log"].function: _domain(np.log, lambda x: np.greater(x, 0)),
+    registry.functions["floor"].function: _floor,
+    registry.functions["abs"].function: _exact_unary(np.abs),
+    registry.functions["min"].function: np.minimum,
+    registry.functions["max"].function: np.maximum,
+}
+
+# The largest N for which N! fits in an int64.
+_INT_FACTORIAL_MAX = 20
+
+
+class RegisterLike(Protocol):
+    alias: str
+    value: int | float
+
+
+class Machine(Protocol):
+    """What batch evaluation needs from an evaluator."""
+
+    @property
+    def registers(self) -> Sequence[RegisterLike]: ...
+
+    def dealias(self, alias: str) -> int: ...
+
+    def execute(self, code: Code) -> int | float: ...
+
+
+class Unvectorizable(Exception):
+    """Raised when code can't be run column-wise after all."""
+
+
+class BatchFallbackWarning(RuntimeWarning):
+    """Issued when a batch has to be evaluated row by row."""
+
+
+def _admit(value: Value) -> Value:
+    """Return VALUE, in a form NumPy computes with exactly.
+
+    Integers beyond the range of an int64 (whether Python integers, or
+    columns of them, which NumPy keeps as objects) can't be computed
+    with column-wise, and raise Unvectorizable. Unsigned columns are
+    made signed, since mixing the two gives floats.
+
+    """
+
+    if type(value) is int:
+        if not -_INT64_LIMIT <= value < _INT64_LIMIT:
+            raise Unvectorizable("Integer too large")
+
+        return value
+
+    if isinstance(value, np.ndarray | np.generic):
+        match value.dtype.kind:
+            case "O":
+                raise Unvectorizable("Integer too large")
+
+            case "u":
+                unsigned = np.asarray(value, dtype=np.uint64)
+
+                if np.any(unsigned >= _INT64_LIMIT):
+                    raise Unvectorizable("Integer too large")
+
+                return unsigned.astype(np.int64)
+
+            case _:
+                pass
+
+    return value
+
+
+def needs_heap(code: Code) -> bool:
+    """Return whether running CODE involves the heap."""
+
+    return any(op in heap_ops for op, _ in code.ops)
+
+
+def factorial(x: Value) -> Value:
+    """Apply the 'factorial' led to every element of X.
+
+    As with scalar evaluation, X is first truncated to an integer,
+    and anything less than 1 is left as is.
+
+    """
+
+    if not isinstance(x, np.ndarray):
+        return _admit(scalar_factorial(int(x)))
+
+    truncated = np.trunc(x)
+
+    # Scalar factorials are exact integers, however large.
+    if not np.all((truncated > -_INT64_LIMIT) & (truncated <= _INT_FACTORIAL_MAX)):
+        raise Unvectorizable("Factorial doesn't fit in an int64")
+
+    n = truncated.astype(np.int64)
+    table = np.array(
+        [math.factorial(i) for i in range(_INT_FACTORIAL_MAX + 1)],
+        dtype=np.int64,
+    )
+
+    return np.where(n >= 1, table[np.clip(n, 0, _INT_FACTORIAL_MAX)], n)
+
+
+def power(x: Value, y: Value) -> Value:
+    """Apply '^' to every element of X and Y.
+
+    As with scalar evaluation, integers raised to non-negative integer
+    powers stay exact; anything else is worked out in floating point.
+    Exact results which don't fit in an int64 can't be vectorized.
+
+    """
+
+    if type(x) is int and type(y) is int:
+        return _admit(scalar_power(x, y))
+
+    base = np.asarray(x)
+    exponent = np.asarray(y)
+
+    # Integers too big for NumPy's own types.
+    if "O" in (base.dtype.kind, exponent.dtype.kind):
+        raise Unvectorizable("Integer too large")
+
+    floats = np.power(base.astype(np.float64), exponent)
+
+    if (
+        base.dtype.kind in "iu"
+        and exponent.dtype.kind in "iu"
+        and np.all(exponent >= 0)
+    ):
+        if np.any(np.abs(floats) >= _INT64_LIMIT):
+            raise Unvectorizable("Integer power doesn't fit in an int64")
+
+        return np.power(base, exponent)
+
+    return floats
+
+
+@final
+class BatchExecutor:
+    """Run heap-free compiled code over columns of register values.
+
+    Every instruction is applied to whole columns at once, so that
+    the code is run a single time no matter how many rows there are.
+
+    Registers bound to a column (and registers assigned while running)
+    shadow the evaluator's registers for the duration of the batch
+    only; the evaluator's registers are read, but never written.
+
+    """
+
+    def __init__(self, ev: Machine, bindings: Mapping[str, Column]):
+        self.ev = ev
+        self.env: dict[str, Value] = dict(bindings)
+
+    def load(self, name: str) -> Value:
+        try:
+            value = self.env[name]
+        except KeyError:
+            value = self.ev.registers[self.ev.dealias(name)].value
+
+        return _admit(value)
+
+    def execute(self, code: Code) -> Value:
+        """Run CODE column-wise, returning its result."""
+
+        stack: list[Value] = []
+
+        for op, arg in code.ops:
+            match op:
+                case Opcode.PUSH:
+                    stack.append(_admit(code.consts[arg]))
+
+                case Opcode.LOAD:
+                    stack.append(self.load(code.names[arg]))
+
+                case Opcode.REF:
+                    stack.append(self.ev.dealias(code.names[arg]))
+
+                case _ if op in _unary:
+                    stack[-1] = _unary[op](stack[-1])
+
+                case _ if op in _binary:
+                    right = stack.pop()
+                    stack[-1] = _binary[op](stack[-1], right)
+
+                case Opcode.POW:
+                    right = stack.pop()
+                    stack[-1] = power(stack[-1], right)
+
+                case Opcode.FACT:
+                    stack[-1] = factorial(stack[-1])
+
+                case Opcode.POP:
+                    _ = stack.pop()
+
+                case Opcode.STORE:
+                    right_hand_side = stack.pop()
+                    rindex = stack[-1]
+
+                    # An address computed from a column could name a
+                    # different register in every row.
+                    if isinstance(rindex, np.ndarray):
+                        raise Unvectorizable("Column-dependent assignment")
+
+                    alias = self.ev.registers[int(rindex)].alias
+                    self.env[alias] = right_hand_side
+                    stack[-1] = right_hand_side
+
+                case Opcode.NATIVE:
+                    native = code.natives[arg]
+                    first = len(stack) - native.arity
+                    arguments = stack[first:]
+
+                    # Native functions take plain numbers, not columns,
+                    # unless NumPy has one of its own.
+                    if not any(isinstance(value, np.ndarray) for value in arguments):
+                        result = _admit(native.function(*arguments))
+                    elif (function := _natives.get(native.function)) is not None:
+                        result = function(*arguments)
+                    else:
+                        raise Unvectorizable(f"Native function '{native.name}'")
+
+                    del stack[first:]
+                    stack.append(result)
+
+                case Opcode.RETURN:
+                    break
+
+                case _:
+                    raise Unvectorizable(f"Can't vectorize {op.name}")
+
+        return stack.pop()
+
+
+def evaluate_batch(
+    ev: Machine, code: Code, bindings: Mapping[str, npt.ArrayLike]
+) -> Column:
+    """Run CODE once for every row of BINDINGS, returning the results.
+
+    BINDINGS maps register names to equal-length columns of values.
+    Unless CODE needs the heap, it's run just once, column-wise (see
+    'BatchExecutor'); otherwise, it's run row by row (see
+    'evaluate_rows'), and a BatchFallbackWarning says so.
+
+    Rather than raising, rows whose arithmetic fails (for example, on
+    division by zero) yield nan or inf. Any other error is raised as
+    usual.
+
+    """
+
+    columns = {name: np.asarray(values) for name, values in bindings.items()}
+
+    if not columns:
+        raise ValueError("No columns to evaluate over")
+
+    if any(column.ndim != 1 for column in columns.values()):
+        raise ValueError("Columns must be one-dimensional")
+
+    lengths = {len(column) for column in columns.values()}
+
+    if len(lengths) != 1:
+        raise ValueError(f"Columns differ in length: {sorted(lengths)}")
+
+    (rows,) = lengths
+
+    if needs_heap(code):
+        warnings.warn(
+            "Expression uses the heap; evaluating row by row",
+            BatchFallbackWarning,
+            stacklevel=3,
+        )
+
+        return evaluate_rows(ev, code, columns, rows)
+
+    try:
+        with np.errstate(all="ignore"):
+            result = BatchExecutor(ev, columns).execute(code)
+    except Unvectorizable as e:
+        warnings.warn(f"{e}; evaluating row by row", BatchFallbackWarning, stacklevel=3)
+
+        return evaluate_rows(ev, code, columns, rows)
+
+    return np.broadcast_to(np.asarray(result), (rows,)).copy()
+
+
+def evaluate_rows(
+    ev: Machine, code: Code, columns: Mapping[str, Column], rows: int
+) -> Column:
+    """Run CODE separately for each of the ROWS rows of COLUMNS.
+
+    Each row starts out from the registers as they were before the
+    batch, so that rows don't affect one another. Anything stored in
+    the heap along the way stays there, however.
+
+    """
+
+    saved = [register.value for register in ev.registers]
+    rindices = {name: ev.dealias(name) for name in columns}
+    values: dict[str, list[int | float]] = {
+        name: column.tolist() for name, column in columns.items()
+    }
+
+    def restore():
+        for register, value in zip(ev.registers, saved, strict=False):
+            register.value = value
+
+        for register in ev.registers[len(saved) :]:
+            register.value = 0
+
+    results: list[int | float] = []
+
+    try:
+        for row in range(rows):
+            for name, rindex in rindices.items():
+                ev.registers[rindex].value = values[name][row]
+
+            try:
+                results.append(ev.execute(code))
+            except ArithmeticError:
+                results.append(math.nan)
+
+            restore()
+    finally:
+        restore()
+
+    return np.array(results)
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import final
+
+
+@final
+class LRUCache[K, V]:
+    """A least-recently-used cache holding at most MAXSIZE entries.
+
+    Once full, storing a new entry evicts whichever entry was used
+    least recently. A MAXSIZE of 0 disables caching altogether.
+
+    HITS, MISSES and EVICTIONS count what happened to lookups and
+    stores over the lifetime of the cache.
+
+    """
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 0:
+            raise ValueError(f"Cache size can't be negative: {maxsize}")
+
+        self.maxsize = maxsize
+        self.data: OrderedDict[K, V] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key: K):
+        return key in self.data
+
+    def get(self, key: K) -> V | None:
+        """Return the entry stored under KEY, or None if it's absent."""
+
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.data.move_to_end(key)
+
+        return value
+
+    def put(self, key: K, value: V):
+        """Store VALUE under KEY, evicting an old entry if need be."""
+
+        if self.maxsize == 0:
+            return
+
+        self.data[key] = value
+        self.data.move_to_end(key)
+
+        while len(self.data) > self.maxsize:
+            _ = self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, keeping the counters."""
+
+        self.data.clear()
@@ -0,0 +1,395 @@
+"""Run compiled code as native Python functions.
+
+'Evaluator.execute' dispatches on every instruction it runs, which
+costs far more than the arithmetic most instructions do. Since every
+Code object is straight-line code though, it can instead be translated
+once into the body of a Python function (see 'translate'), in which
+the value stack is gone: a block like '{x * x + 1}' becomes
+
+    return ((registers[r0].value * registers[r0].value) + (1))
+
+with R0 holding the address of register 'x'. Such functions are
+built with 'compile', kept for as long as their Code object is, and
+run by a Backend.
+
+Calls are where native code differs from the VM:
+
+- A call in tail position hands the block to be called back to the
+  Backend, which runs it next; loops written as a block calling itself
+  still run in constant space.
+
+- Any other call is an ordinary Python call. Past MAX_DEPTH nested
+  calls, the callee is run by the VM instead, since that isn't bound
+  by Python's recursion limit.
+
+"""
+
+import functools
+import math
+import weakref
+from collections.abc import Callable, Sequence
+from typing import cast, final
+
+from pratt_calc.arithmetic import factorial, power, render
+from pratt_calc.compiler import Code, Native, Opcode
+from pratt_calc.heap import Heap
+
+# The number of nested (non-tail) calls native code may make before
+# handing over to the VM.
+MAX_DEPTH = 100
+
+# Integers beyond this size are left in the constant table rather than
+# written out in full, since Python limits how long an integer literal
+# may be.
+MAX_LITERAL = 10**100
+
+# How deeply a Python expression may nest before it's assigned to a
+# temporary.
+MAX_NESTING = 50
+
+type Function = Callable[
+    [
+        Sequence[object],
+        Heap,
+        tuple[int | float, ...],
+        tuple[Code, ...],
+        tuple[Native, ...],
+    ],
+    int | float | Code,
+]
+
+# What translated code may refer to besides its arguments; these are
+# passed to the factory 'translate' wraps each function in.
+_HELPERS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "power": power,
+    "factorial": factorial,
+    "render": render,
+}
+
+_unary = {
+    Opcode.NEG: "(-{})",
+    Opcode.SIN: "sin({})",
+    Opcode.COS: "cos({})",
+    Opcode.TAN: "tan({})",
+    Opcode.SEC: "(1 / cos({}))",
+    Opcode.CSC: "(1 / sin({}))",
+    Opcode.COT: "(1 / tan({}))",
+    Opcode.FACT: "factorial({})",
+}
+
+_binary = {
+    Opcode.ADD: "({} + {})",
+    Opcode.SUB: "({} - {})",
+    Opcode.MUL: "({} * {})",
+    Opcode.DIV: "({} / {})",
+    Opcode.POW: "power({}, {})",
+}
+
+
+def _literal(value: int | float, index: int) -> str:
+    """Return Python source for the constant VALUE, found at INDEX."""
+
+    if isinstance(value, int) and abs(value) < MAX_LITERAL:
+        return f"({value!r})"
+
+    if isinstance(value, float) and math.isfinite(value):
+        return f"({value!r})"
+
+    return f"consts[{index}]"
+
+
+def translate(code: Code) -> str:
+    """Translate CODE into the source of a Python function.
+
+    The source defines 'make', which takes the list of register
+    addresses used by CODE (see 'Evaluator._link'), a function
+    creating a register, a function running a block, a function
+    printing a line, and then the values of _HELPERS, and returns the
+    translated function itself, 'block'.
+
+    'block' takes the registers and heap to run against, along with
+    CODE's constants, blocks and native functions, and returns either
+    CODE's result or a block to be called in its place.
+
+    Each instruction either becomes part of a Python expression, or,
+    if it has side effects, a statement of its own. Before any such
+    statement, expressions pending on the stack are assigned to
+    temporaries, so that everything is still computed in the same
+    order as the VM would (which matters when a register is read and
+    then assigned to, or when something raises an error.)
+
+    """
+
+    body: list[str] = []
+
+    # Python expressions for the values on the stack, each paired
+    # with whether it's safe to delay computing it (that's the case
+    # for constants and locals that are never reassigned, but not for
+    # register reads or arithmetic) and how deeply nested it is.
+    stack: list[tuple[str, bool, int]] = []
+
+    # Local variables holding the register address of each name used
+    # so far.
+    slots: dict[int, str] = {}
+    temporaries = 0
+
+    def temporary() -> str:
+        nonlocal temporaries
+        temporaries += 1
+
+        return f"t{temporaries}"
+
+    def flush():
+        for i, (expression, stable, _) in enumerate(stack):
+            if not stable:
+                name = temporary()
+                body.append(f"{name} = {expression}")
+                stack[i] = (name, True, 0)
+
+    def push(expression: str, depth: int):
+        """Push an expression which isn't stable, nested DEPTH deep."""
+
+        stack.append((expression, False, depth))
+
+        # Python's parser only allows so much nesting.
+        if depth >= MAX_NESTING:
+            flush()
+
+    def slot(index: int) -> str:
+        # Names are looked up the first time they're used, as in the
+        # VM, so that registers are created in the same order (and not
+        # at all, should something before them raise an error.)
+        if index not in slots:
+            flush()
+            name = slots[index] = f"r{index}"
+            body.extend(
+                [
+                    f"{name} = slots[{index}]",
+                    f"if {name} < 0:",
+                    f"    {name} = slots[{index}] = dealias({code.names[index]!r})",
+                ]
+            )
+
+        return slots[index]
+
+    ops = code.ops
+
+    for pc, (op, arg) in enumerate(ops):
+        tail = pc + 1 < len(ops) and ops[pc + 1].op == Opcode.RETURN
+
+        match op:
+            case Opcode.PUSH:
+                stack.append((_literal(code.consts[arg], arg), True, 0))
+
+            case Opcode.LOAD:
+                stack.append((f"registers[{slot(arg)}].value", False, 1))
+
+            case Opcode.REF:
+                stack.append((slot(arg), True, 0))
+
+            case _ if op in _unary:
+                operand, _, depth = stack.pop()
+                push(_unary[op].format(operand), depth + 1)
+
+            case _ if op in _binary:
+                right, _, right_depth = stack.pop()
+                left, _, left_depth = stack.pop()
+                push(_binary[op].format(left, right), max(left_depth, right_depth) + 1)
+
+            case Opcode.NATIVE:
+                arity = code.natives[arg].arity
+                operands = stack[len(stack) - arity :]
+                del stack[len(stack) - arity :]
+                arguments = ", ".join([expression for expression, _, _ in operands])
+                push(
+                    f"natives[{arg}].function({arguments})",
+                    max([depth for _, _, depth in operands], default=0) + 1,
+                )
+
+            case Opcode.POP:
+                flush()
+                _ = stack.pop()
+
+            case Opcode.STORE:
+                flush()
+                (value, _, _), (address, _, _) = stack.pop(), stack.pop()
+
+                if address not in slots.values():
+                    address = f"int({address})"
+
+                body.append(f"registers[{address}].value = {value}")
+                stack.append((value, True, 0))
+
+            case Opcode.PRINT:
+                flush()
+                address, _, _ = stack.pop()
+                body.append(f"write(heap.string(int({address})))")
+
+            case Opcode.QUOTE:
+                flush()
+                name = temporary()
+                body.append(f"{name} = heap.store_code(blocks[{arg}])")
+                stack.append((name, True, 0))
+
+            case Opcode.STRING:
+                flush()
+                name = temporary()
+                what, length = code.strings[arg]
+                body.append(f"{name} = heap.store_string({what!r}, {length})")
+                stack.append((name, True, 0))
+
+            case Opcode.STRCAST:
+                flush()
+                value, _, _ = stack.pop()
+                name = temporary()
+                body.append(f"{name} = heap.store_string(render({value}), 1)")
+                stack.append((name, True, 0))
+
+            case Opcode.CALL:
+                flush()
+                address, _, _ = stack.pop()
+                callee = f"heap.code(int({address}))"
+
+                if tail:
+                    body.append(f"return {callee}")
+                    break
+
+                name = temporary()
+                body.append(f"{name} = run({callee})")
+                stack.append((name, True, 0))
+
+            case Opcode.COND:
+                flush()
+                condition, _, _ = stack.pop()
+
+                if tail:
+                    body += [
+                        f"if {condition} != 0:",
+                        f"    return blocks[{arg}]",
+                        "return 0",
+                    ]
+                    break
+
+                name = temporary()
+                body += [
+                    f"if {condition} != 0:",
+                    f"    {name} = run(blocks[{arg}])",
+                    "else:",
+                    f"    {name} = 0",
+                ]
+                stack.append((name, True, 0))
+
+            case Opcode.RETURN:
+                value, _, _ = stack.pop()
+                flush()
+                body.append(f"return {value}")
+                break
+
+            case _:
+                raise ValueError(f"Can't translate {op}")
+
+    helpers = ", ".join(_HELPERS)
+    lines = [
+        f"def make(slots, dealias, run, write, {helpers}):",
+        "    def block(registers, heap, consts, blocks, natives):",
+        *(f"        {line}" for line in body),
+        "    return block",
+    ]
+
+    return "\n".join(lines) + "\n"
+
+
+@functools.lru_cache(maxsize=1024)
+def _factory(source: str) -> Callable[..., Function]:
+    """Compile SOURCE, as produced by 'translate', returning 'make'.
+
+    Blocks are often quoted over and over, so this is cached by
+    SOURCE.
+
+    """
+
+    namespace: dict[str, object] = {}
+    exec(compile(source, "<pratt-calc>", "exec"), namespace)
+
+    return cast(Callable[..., Function], namespace["make"])
+
+
+@final
+class Backend:
+    """Run code natively, against REGISTERS and HEAP.
+
+    LINK returns the register addresses used by a Code object, and
+    DEALIAS the address of a register by name, creating it if need
+    be (see 'Evaluator'.) FALLBACK runs a block with the VM, once
+    calls nest too deeply. WRITE prints a line.
+
+    """
+
+    def __init__(
+        self,
+        registers: Sequence[object],
+        heap: Heap,
+        link: Callable[[Code], list[int]],
+        dealias: Callable[[str], int],
+        fallback: Callable[[Code], int | float],
+        write: Callable[[str], None],
+    ):
+        self.registers = registers
+        self.heap = heap
+        self.link = link
+        self.dealias = dealias
+        self.fallback = fallback
+        self.write = write
+
+        # The number of native calls currently running.
+        self.depth = 0
+
+        self.functions: weakref.WeakKeyDictionary[Code, Function] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def function(self, code: Code) -> Function:
+        """Return the native function for CODE, building it if need be."""
+
+        function = self.functions.get(code)
+
+        if function is None:
+            make = _factory(translate(code))
+            function = make(
+                self.link(code),
+                self.dealias,
+                self.run,
+                self.write,
+                *_HELPERS.values(),
+            )
+            self.functions[code] = function
+
+        return function
+
+    def run(self, code: Code) -> int | float:
+        """Run CODE, returning its result."""
+
+        if self.depth >= MAX_DEPTH:
+            return self.fallback(code)
+
+        registers = self.registers
+        heap = self.heap
+
+        self.depth += 1
+
+        try:
+            while True:
+                result = self.function(code)(
+                    registers, heap, code.consts, code.blocks, code.natives
+                )
+
+                if not isinstance(result, Code):
+                    return result
+
+                # A tail call.
+                code = result
+        finally:
+            self.depth -= 1
@@ -0,0 +1,895 @@
+from __future__ import annotations
+
+import enum
+import math
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from typing import NamedTuple, cast, final
+
+from pratt_calc.tokenizer import (
+    Cursor,
+    Op,
+    Span,
+    Token,
+    Type,
+    define,
+    match_braces,
+    scan,
+    snapshot,
+)
+
+
+class Precedence(enum.IntEnum):
+    """Establish the various precedence levels.
+
+    Rather than being associated directly with a token, a given
+    precedence level gets passed in as an argument whenever a given
+    token is dispatched.
+
+    For example, subtraction is dispatched using PLUS_MINUS, while
+    negation is dispatched using UNARY, even though both are
+    associated with the '-' token.
+
+    """
+
+    NONE = enum.auto()
+    SEMICOLON = enum.auto()
+    ASSIGNMENT = enum.auto()
+    PLUS_MINUS = enum.auto()
+    TIMES_DIVIDE = enum.auto()
+    POWER = enum.auto()
+    UNARY = enum.auto()
+    FACTORIAL = enum.auto()
+    IMMEDIATE = enum.auto()
+
+
+class Opcode(enum.Enum):
+    """The instruction set of compiled code.
+
+    Compiled code runs on a simple stack machine: each instruction
+    pops its operands off a value stack and pushes its result back.
+
+    """
+
+    PUSH = enum.auto()
+    LOAD = enum.auto()
+    REF = enum.auto()
+    NEG = enum.auto()
+    SIN = enum.auto()
+    COS = enum.auto()
+    TAN = enum.auto()
+    SEC = enum.auto()
+    CSC = enum.auto()
+    COT = enum.auto()
+    ADD = enum.auto()
+    SUB = enum.auto()
+    MUL = enum.auto()
+    DIV = enum.auto()
+    POW = enum.auto()
+    FACT = enum.auto()
+    POP = enum.auto()
+    STORE = enum.auto()
+    PRINT = enum.auto()
+    QUOTE = enum.auto()
+    CALL = enum.auto()
+    COND = enum.auto()
+    STRING = enum.auto()
+    STRCAST = enum.auto()
+    NATIVE = enum.auto()
+    RETURN = enum.auto()
+
+
+class Text(NamedTuple):
+    """A string literal, rendered ahead of time.
+
+    LENGTH is the number of tokens the string was made from.
+
+    """
+
+    what: str
+    length: int
+
+
+class Instr(NamedTuple):
+    """A single instruction, along with its (optional) argument.
+
+    Where an instruction needs an operand, ARG is an index into the
+    matching table of the enclosing Code object: CONSTS for PUSH,
+    NAMES for LOAD and REF, BLOCKS for QUOTE and COND, STRINGS for
+    STRING, and NATIVES for NATIVE.
+
+    Every Code object ends with a RETURN instruction.
+
+    """
+
+    op: Opcode
+    arg: int = 0
+
+
+# Builds an instruction the way 'Instr._make' does, but without a
+# Python-level call to 'Instr.__new__' for each one.
+new_instr = cast(Callable[[type[Instr], Iterable[object]], Instr], tuple.__new__)
+
+
+@final
+@dataclass(frozen=True)
+class Native:
+    """A function written in Python, callable from Pratt Calc code.
+
+    FUNCTION takes ARITY numbers, and returns a number. See
+    'Registry.function' for how NAME is written in code.
+
+    """
+
+    name: str
+    function: Callable[..., int | float]
+    arity: int = 1
+
+
+@final
+@dataclass(frozen=True, eq=False)
+class Code:
+    """A compiled unit of code.
+
+    This is what 'Evaluator.compile' returns for a whole expression,
+    and also what a quoted block compiles to.
+
+    TOKENS is the source the code was compiled from; in the case of a
+    block, this is what gets stored in the heap, so that heap
+    addresses stay the same as when blocks were stored as raw tokens.
+
+    Code objects are never mutated, and so can be run any number of
+    times.
+
+    BITS is the estimated size of the largest integer computed ahead
+    of time with '!' or '^' (see 'pratt_calc.optimizer'), which the
+    evaluator checks against 'Limits.bits' as the code is entered.
+
+    """
+
+    ops: tuple[Instr, ...]
+    tokens: Sequence[Token]
+    consts: tuple[int | float, ...]
+    names: tuple[str, ...]
+    blocks: tuple[Code, ...]
+    strings: tuple[Text, ...]
+    natives: tuple[Native, ...] = ()
+    bits: float = 0
+
+
+# Compiles a token in nud position, returning the subexpression which
+# has to be compiled next, if any (see 'Compiler.expression'.)
+type Nud = Callable[[Compiler, Token], _Frame | None]
+
+# Likewise for a token in led position, given the frame it's found in.
+type Led = Callable[[Compiler, Token, _Frame], _Frame | None]
+
+
+class Infix(NamedTuple):
+    """A led which applies OP to the left-hand side and an operand at LEVEL."""
+
+    op: Opcode
+    level: int
+
+
+@final
+class Registry:
+    """The operators and functions Pratt Calc code is written with.
+
+    Every operator is registered here, along with how it's compiled
+    in nud position, in led position, or both; a led also gets a
+    precedence level. The tokenizer recognizes exactly the operators
+    registered here (see 'pratt_calc.tokenizer.define'), and the
+    compiler finds how to compile each with a single dict lookup.
+
+    The tables are keyed by spelling, which (unlike a token) hashes
+    without calling back into Python.
+
+    Embedders can add native functions of their own (see 'function'.)
+
+    """
+
+    def __init__(self):
+        self.nuds: dict[str, Nud | Opcode] = {}
+        self.leds: dict[str, Led | Infix] = {}
+        self.precedence: dict[str, int] = {}
+        self.functions: dict[str, Native] = {}
+
+        # Counts changes, so that caches of compiled code can tell
+        # when what they hold is out of date.
+        self.generation = 0
+
+    def nud(self, token: Token, handler: Nud | Opcode, operand: bool | None = None):
+        """Compile TOKEN in nud position with HANDLER.
+
+        A prefix operator's HANDLER is just the opcode it applies to a
+        UNARY-level operand, which the compiler emits without calling
+        out to a handler at all.
+
+        OPERAND tells 'pratt_calc.tokenizer.statements' whether TOKEN
+        takes an operand (True, as '-' does) or is one (False, as 'pi'
+        is.)
+
+        """
+
+        self.nuds[define(token, operand=operand).what] = handler
+        self.generation += 1
+
+    def led(
+        self,
+        token: Token,
+        precedence: Precedence,
+        handler: Led | Infix | None = None,
+        operand: bool | None = None,
+    ):
+        """Compile TOKEN in led position at PRECEDENCE, with HANDLER.
+
+        As with 'nud', an infix operator's HANDLER is just the opcode
+        it applies, along with the level of its right-hand operand
+        (see 'Infix'.) Without HANDLER, TOKEN only ever ends the expression before
+        it, as ')' does. OPERAND tells 'pratt_calc.tokenizer.statements'
+        whether TOKEN takes an operand (True, as '+' does) or ends one
+        (False, as '!' does.)
+
+        """
+
+        what = define(token, operand=operand).what
+
+        self.precedence[what] = precedence
+
+        if handler is not None:
+            self.leds[what] = handler
+
+        self.generation += 1
+
+    def function(self, name: str, function: Callable[..., int | float], arity: int = 1):
+        """Make FUNCTION callable from Pratt Calc code, as NAME.
+
+        How a call is written depends on ARITY. A function of no
+        arguments is written like 'pi', and one of a single argument
+        like 'sin' (so that 'sqrt x + 1' is the square root of 'x',
+        plus 1.) Otherwise, the arguments are given in parentheses,
+        separated by commas: 'max(x, y)'.
+
+        NAME is only recognized as a whole word, so that other
+        identifiers starting with it are still usable. Registering
+        NAME again replaces the function it calls, for code compiled
+        from then on.
+
+        """
+
+        if not name.isidentifier():
+            raise ValueError(f"Invalid function name: '{name}'")
+
+        if arity < 0:
+            raise ValueError(f"Invalid arity for '{name}': {arity}")
+
+        if name in self.nuds and name not in self.functions:
+            raise ValueError(f"Already an operator: '{name}'")
+
+        native = Native(name, function, arity)
+
+        def nud(compiler: Compiler, _: Token) -> _Frame | None:
+            return compiler.native(native)
+
+        self.functions[name] = native
+        token = define(Token(Type.OPERATOR, name), word=True, operand=arity > 0)
+        self.nuds[token.what] = nud
+        self.generation += 1
+
+    def snapshot(self) -> Callable[[], None]:
+        """Note what's registered, returning a function to restore it.
+
+        Calling the function unregisters every operator and function
+        registered since, along with their spellings (see
+        'pratt_calc.tokenizer.snapshot'.)
+
+        """
+
+        nuds = dict(self.nuds)
+        leds = dict(self.leds)
+        precedence = dict(self.precedence)
+        functions = dict(self.functions)
+        restore_tokens = snapshot()
+
+        def restore():
+            self.nuds.clear()
+            self.nuds.update(nuds)
+            self.leds.clear()
+            self.leds.update(leds)
+            self.precedence.clear()
+            self.precedence.update(precedence)
+            self.functions.clear()
+            self.functions.update(functions)
+            self.generation += 1
+            restore_tokens()
+
+        return restore
+
+
+registry = Registry()
+
+
+class _Then(enum.Enum):
+    """What's left to do once a subexpression has been compiled."""
+
+    NOTHING = enum.auto()
+    EMIT = enum.auto()
+    RPAREN = enum.auto()
+    PRINT = enum.auto()
+    CALL = enum.auto()
+    ARGUMENT = enum.auto()
+
+
+@dataclass(slots=True)
+class _Frame:
+    """A pending subexpression.
+
+    In a recursive Pratt parser, each of these would be a call to
+    'expression' at the given LEVEL. THEN (along with OP and ARG, for
+    EMIT) says what the nud or led which asked for the subexpression
+    does once it's been compiled.
+
+    For ARGUMENT, the subexpression is an argument to the native
+    function numbered ARG, which takes REMAINING more.
+
+    """
+
+    level: int
+    then: _Then = _Then.NOTHING
+    op: Opcode | None = None
+    arg: int = 0
+    remaining: int = 0
+
+
+@final
+class Compiler(Cursor):
+    """Compile a stream of tokens into a Code object.
+
+    This is a Pratt parser, except that instead of accumulating a
+    result, each nud and led emits the instructions that will later
+    compute it. See 'Evaluator.execute' for how these instructions
+    are run.
+
+    Rather than recursing into subexpressions, the parser keeps its
+    own stack of pending subexpressions (see '_Frame'), so that long
+    scripts and deeply nested expressions don't run into Python's
+    recursion limit.
+
+    Quoted blocks aren't compiled right away either: they're skipped
+    over, their tokens noted in BLOCK_TOKENS, and compiled afterwards
+    by 'compile_block'.
+
+    Only the tokens in SPAN are compiled, read through the compiler's
+    own cursor (see 'Cursor'.) BRACES maps the position of
+    each '{' in the underlying tokens to that of its '}' (see
+    'match_braces'.)
+
+    OPEN says whether the tokens ran out in the middle of an operand
+    (see 'end'.)
+
+    """
+
+    def __init__(self, span: Span, braces: dict[int, int]):
+        super().__init__(span)
+
+        self.span = span
+        self.braces = braces
+
+        self.ops: list[Instr] = []
+
+        self.consts: list[int | float] = []
+        self.names: dict[str, int] = {}
+        self.blocks: list[Code] = []
+        self.block_tokens: list[Span] = []
+        self.strings: list[Text] = []
+        self.natives: dict[Native, int] = {}
+
+        self.open = False
+
+    def emit(self, op: Opcode, arg: int = 0):
+        self.ops.append(new_instr(Instr, (op, arg)))
+
+    def emit_const(self, value: int | float):
+        self.emit(Opcode.PUSH, len(self.consts))
+        self.consts.append(value)
+
+    def emit_name(self, op: Opcode, name: str):
+        self.emit(op, self.names.setdefault(name, len(self.names)))
+
+    def emit_block(self, op: Opcode):
+        self.emit(op, len(self.block_tokens))
+        self.block_tokens.append(self.block())
+
+    def code(self) -> Code:
+        """Bundle the instructions emitted so far into a Code object.
+
+        Every quoted block must have been compiled by now.
+
+        """
+
+        assert len(self.blocks) == len(self.block_tokens)
+
+        return Code(
+            (*self.ops, Instr(Opcode.RETURN)),
+            self.span,
+            tuple(self.consts),
+            tuple(self.names),
+            tuple(self.blocks),
+            tuple(self.strings),
+            tuple(self.natives),
+        )
+
+    def block(self) -> Span:
+        """Skip over the tokens of a quoted block, returning them.
+
+        The opening '{' is assumed to have already been consumed.
+
+        """
+
+        start = self.pos
+        stop = self.braces.get(start - 1)
+
+        if stop is None or stop >= self.stop:
+            raise ValueError("Unterminated quoted expression")
+
+        self.pos = stop + 1
+
+        return Span(self.tokens, start, stop)
+
+    def expression(self, level: int = Precedence.NONE):
+        """Pratt-parse an arithmetic expression, compiling it.
+
+        This is the compiler's inner loop, run once for every token,
+        and so the commonest nuds and leds are compiled inline rather
+        than by way of a handler.
+
+        """
+
+        nuds = registry.nuds
+        leds = registry.leds
+        precedence = registry.precedence
+        consts = self.consts
+        names = self.names
+        append = self.ops.append
+
+        frames = [_Frame(level)]
+        ended = False
+
+        while True:
+            # NUD
+            current = self.advance()
+            tag = current.tag
+
+            if tag is Type.OPERATOR:
+                handler = nuds.get(current.what)
+
+                if isinstance(handler, Opcode):
+                    frames.append(_Frame(Precedence.UNARY, _Then.EMIT, handler))
+                    continue
+
+                if handler is None:
+                    raise ValueError(f"Invalid nud: '{current}'")
+
+                if (pending := handler(self, current)) is not None:
+                    frames.append(pending)
+                    continue
+
+            elif tag is Type.IDENTIFIER:
+                # We cheat a little here: if the next token is '<-',
+                # this identifier token is in a left-hand-side
+                # position of an assignment operation, and so the
+                # token should evaluate to the register index, just as
+                # it did originally.
+                append(
+                    new_instr(
+                        Instr,
+                        (
+                            Opcode.REF if self.peek() == Op.assign else Opcode.LOAD,
+                            names.setdefault(current.what, len(names)),
+                        ),
+                    )
+                )
+
+            elif tag is Type.INT:
+                append(new_instr(Instr, (Opcode.PUSH, len(consts))))
+                consts.append(int(current.what))
+
+            elif tag is Type.FLOAT:
+                self.emit_const(float(current.what))
+
+            elif tag is Type.EOF:
+                if not ended:
+                    ended = True
+                    self.end(frames, operand=True)
+
+                self.emit_const(0)
+
+            else:
+                raise ValueError(f"Invalid token: '{current}'")
+
+            while True:
+                frame = frames[-1]
+                following = self.peek()
+
+                # The end of the code ends every expression, just as
+                # ')' does.
+                if following.tag is Type.OPERATOR:
+                    binding = precedence.get(following.what)
+
+                    if binding is None:
+                        raise ValueError(f"Led does not exist in table: '{following}'")
+
+                elif following.tag is Type.EOF:
+                    binding = Precedence.NONE
+
+                    if not ended:
+                        ended = True
+                        self.end(frames, operand=False)
+
+                else:
+                    raise ValueError(f"Led does not exist in table: '{following}'")
+
+                # LED
+                if frame.level < binding:
+                    current = self.advance()
+                    handler = leds.get(current.what)
+
+                    if isinstance(handler, Infix):
+                        frames.append(_Frame(handler.level, _Then.EMIT, handler.op))
+                        break
+
+                    if handler is None:
+                        raise ValueError(f"Invalid led: {current}")
+
+                    pending = handler(self, current, frame)
+
+                # The subexpression is complete, so finish off the nud
+                # or led which asked for it.
+                elif len(frames) > 1:
+                    _ = frames.pop()
+
+                    if frame.then is _Then.EMIT:
+                        assert frame.op is not None
+                        append(new_instr(Instr, (frame.op, frame.arg)))
+                        continue
+
+                    pending = self.then(frame, frames[-1])
+
+                else:
+                    return
+
+                if pending is not None:
+                    frames.append(pending)
+                    break
+
+    def end(self, frames: Sequence[_Frame], operand: bool):
+        """Note the tokens running out, with FRAMES pending.
+
+        OPERAND says whether they ran out where an operand was
+        expected, as in '1 +'.
+
+        Calling a block used to splice its tokens back into the token
+        stream, ahead of whatever followed the call. A ';' there was
+        then read as part of the last pending subexpression at the
+        NONE level (or of the operand still expected.) If the nuds and
+        leds waiting on that subexpression do anything with its value,
+        as in 'r <- call g', splicing and calling differ, and the code
+        is open.
+
+        """
+
+        last = len(frames) - 1
+
+        if operand:
+            spliced = last
+        else:
+            # Once compiled, 'call' leaves what it's part of at the
+            # NONE level, and 'print' is followed by an expression at
+            # that level.
+            spliced = max(
+                i
+                for i, frame in enumerate(frames)
+                if frame.level < Precedence.SEMICOLON
+                or (i < last and frames[i + 1].then in (_Then.CALL, _Then.PRINT))
+            )
+
+        if any(frame.then is not _Then.NOTHING for frame in frames[: spliced + 1]):
+            self.open = True
+
+    def native(self, native: Native) -> _Frame | None:
+        """Compile a call to NATIVE, whose name has just been read.
+
+        See 'Registry.function' for how calls are written.
+
+        """
+
+        index = self.natives.setdefault(native, len(self.natives))
+
+        match native.arity:
+            case 0:
+                self.emit(Opcode.NATIVE, index)
+
+            case 1:
+                return _Frame(Precedence.UNARY, _Then.EMIT, Opcode.NATIVE, index)
+
+            case arity:
+                if self.advance() != Op.lparen:
+                    raise ValueError(f"Expected '(' after '{native.name}'")
+
+                return _Frame(
+                    Precedence.NONE, _Then.ARGUMENT, Opcode.NATIVE, index, arity - 1
+                )
+
+        return None
+
+    def nud_pi(self, _: Token) -> _Frame | None:
+        self.emit_const(math.pi)
+
+        return None
+
+    def nud_lparen(self, _: Token) -> _Frame | None:
+        return _Frame(Precedence.NONE, _Then.RPAREN)
+
+    def nud_print(self, _: Token) -> _Frame | None:
+        return _Frame(Precedence.UNARY, _Then.PRINT)
+
+    def nud_quote(self, _: Token) -> _Frame | None:
+        self.emit_block(Opcode.QUOTE)
+
+        return None
+
+    def nud_call(self, _: Token) -> _Frame | None:
+        return _Frame(Precedence.UNARY, _Then.CALL)
+
+    def nud_semicolon(self, _: Token) -> _Frame | None:
+        # As a nud, ';' is a no-op. This lets users input empty
+        # "statements" like ';;'. It also lets a preprocessing step
+        # inject semicolons in place of newlines.
+        return _Frame(Precedence.NONE)
+
+    def nud_string(self, _: Token) -> _Frame | None:
+        string_expr: list[Token] = []
+
+        while (t := self.advance()) != Op.string:
+            if t == Op.eof:
+                raise ValueError("Unterminated string")
+
+            string_expr.append(t)
+
+        text = " ".join([t.what for t in string_expr])
+
+        self.emit(Opcode.STRING, len(self.strings))
+        self.strings.append(Text(text, len(string_expr)))
+
+        return None
+
+    def led_factorial(self, _: Token, _frame: _Frame) -> _Frame | None:
+        self.emit(Opcode.FACT)
+
+        return None
+
+    def led_semicolon(self, _: Token, _frame: _Frame) -> _Frame | None:
+        # Discard the left-hand side, keeping only the right-hand
+        # side.
+        self.emit(Opcode.POP)
+
+        return _Frame(Precedence.SEMICOLON)
+
+    def led_assign(self, _: Token, _frame: _Frame) -> _Frame | None:
+        # Assignment is right-associative.
+        return _Frame(Precedence.ASSIGNMENT - 1, _Then.EMIT, Opcode.STORE)
+
+    def led_quote(self, _: Token, frame: _Frame) -> _Frame | None:
+        # Conditional execution. As with 'call', what follows is
+        # parsed at the NONE level.
+        self.emit_block(Opcode.COND)
+        frame.level = Precedence.NONE
+
+        # A block whose flag was false used to be skipped, and what
+        # followed it parsed as an expression of its own, while a
+        # block whose flag was true was called. Only a ';' or the end
+        # of the code means the same thing either way.
+        if (following := self.peek()) != Op.semicolon and following.tag != Type.EOF:
+            raise ValueError(
+                f"Only ';' can follow a conditional, not '{following.what}'"
+            )
+
+        return None
+
+    def then(self, done: _Frame, frame: _Frame) -> _Frame | None:
+        """Finish compiling the nud or led which asked for DONE.
+
+        FRAME is the subexpression that nud or led belongs to. Return
+        any further subexpression that has to be compiled.
+
+        """
+
+        match done.then:
+            case _Then.EMIT:
+                assert done.op is not None
+                self.emit(done.op, done.arg)
+
+            case _Then.RPAREN:
+                assert self.advance() == Op.rparen
+
+            case _Then.PRINT:
+                self.emit(Opcode.PRINT)
+
+                # The value of a 'print' expression is that of
+                # whatever follows it.
+                return _Frame(Precedence.NONE)
+
+            case _Then.CALL:
+                self.emit(Opcode.CALL)
+
+                # Calling a block used to splice its tokens back into
+                # the token stream, which were then parsed at the NONE
+                # level together with whatever followed the call.
+                # Continue at that same level to keep the old
+                # behavior.
+                frame.level = Precedence.NONE
+
+                # A led after the call would have applied to the last
+                # term of the block, rather than to its value, unless
+                # it ended the block's expression anyway.
+                following = self.peek()
+
+                if (
+                    following.tag == Type.OPERATOR
+                    and following != Op.semicolon
+                    and registry.precedence.get(following.what, Precedence.NONE)
+                    > Precedence.NONE
+                ):
+                    raise ValueError(
+                        f"Ambiguous '{following.what}' after a call;"
+                        + " put the call in parentheses"
+                    )
+
+            case _Then.ARGUMENT:
+                match self.advance():
+                    case Op.comma if done.remaining > 0:
+                        return _Frame(
+                            Precedence.NONE,
+                            _Then.ARGUMENT,
+                            done.op,
+                            done.arg,
+                            done.remaining - 1,
+                        )
+
+                    case Op.rparen if done.remaining == 0:
+                        self.emit(Opcode.NATIVE, done.arg)
+
+                    case _:
+                        native = list(self.natives)[done.arg]
+                        raise ValueError(
+                            f"'{native.name}' takes {native.arity} arguments"
+                        )
+
+            case _Then.NOTHING:
+                pass
+
+        return None
+
+
+def compile_block(tokens: Iterable[Token]) -> Code:
+    """Compile TOKENS, along with any quoted blocks found among them.
+
+    TOKENS may be the body of a quoted block (that is, the tokens
+    found between its braces), or a whole expression.
+
+    Blocks nested within blocks are compiled innermost first, using
+    an explicit stack rather than recursion.
+
+    """
+
+    tokens = tuple(tokens)
+    braces = match_braces(tokens)
+
+    root = Compiler(Span(tokens), braces)
+    root.expression()
+
+    compilers = [root]
+
+    while True:
+        compiler = compilers[-1]
+
+        if len(compiler.blocks) < len(compiler.block_tokens):
+            nested = Compiler(compiler.block_tokens[len(compiler.blocks)], braces)
+            nested.expression()
+
+            # What a ';' after a call to the block meant would depend
+            # on the block (see 'Compiler.end'.)
+            if nested.open:
+                raise ValueError(
+                    "Ambiguous end of block; put its last operand in parentheses"
+                )
+
+            compilers.append(nested)
+            continue
+
+        code = compiler.code()
+        _ = compilers.pop()
+
+        if not compilers:
+            return code
+
+        compilers[-1].blocks.append(code)
+
+
+def compile_expression(raw_expression: str) -> Code:
+    """Compile RAW_EXPRESSION into a Code object."""
+
+    return compile_block(scan(raw_expression))
+
+
+registry.led(Op.rparen, Precedence.NONE)
+registry.led(Op.comma, Precedence.NONE)
+registry.led(
+    Op.plus,
+    Precedence.PLUS_MINUS,
+    Infix(Opcode.ADD, Precedence.PLUS_MINUS),
+    operand=True,
+)
+registry.led(
+    Op.minus,
+    Precedence.PLUS_MINUS,
+    Infix(Opcode.SUB, Precedence.PLUS_MINUS),
+    operand=True,
+)
+registry.led(
+    Op.times,
+    Precedence.TIMES_DIVIDE,
+    Infix(Opcode.MUL, Precedence.TIMES_DIVIDE),
+    operand=True,
+)
+registry.led(
+    Op.divide,
+    Precedence.TIMES_DIVIDE,
+    Infix(Opcode.DIV, Precedence.TIMES_DIVIDE),
+    operand=True,
+)
+# Enforce right-association by subtracting 1 from the precedence
+# argument.
+registry.led(
+    Op.power, Precedence.POWER, Infix(Opcode.POW, Precedence.POWER - 1), operand=True
+)
+registry.led(Op.factorial, Precedence.FACTORIAL, Compiler.led_factorial, operand=False)
+registry.led(Op.semicolon, Precedence.SEMICOLON, Compiler.led_semicolon)
+registry.led(Op.assign, Precedence.ASSIGNMENT, Compiler.led_assign, operand=True)
+registry.led(Op.quote, Precedence.IMMEDIATE, Compiler.led_quote)
+
+registry.nud(Op.minus, Opcode.NEG, operand=True)
+registry.nud(Op.sin, Opcode.SIN, operand=True)
+registry.nud(Op.cos, Opcode.COS, operand=True)
+registry.nud(Op.tan, Opcode.TAN, operand=True)
+registry.nud(Op.sec, Opcode.SEC, operand=True)
+registry.nud(Op.csc, Opcode.CSC, operand=True)
+registry.nud(Op.cot, Opcode.COT, operand=True)
+registry.nud(Op.strcast, Opcode.STRCAST, operand=True)
+registry.nud(Op.pi, Compiler.nud_pi, operand=False)
+registry.nud(Op.lparen, Compiler.nud_lparen)
+registry.nud(Op.prt, Compiler.nud_print, operand=True)
+registry.nud(Op.quote, Compiler.nud_quote)
+registry.nud(Op.call, Compiler.nud_call, operand=True)
+registry.nud(Op.semicolon, Compiler.nud_semicolon)
+registry.nud(Op.string, Compiler.nud_string)
+
+# A '}' is neither a nud nor a led: it's only ever read by
+# 'match_braces'.
+_ = define(Op.endquote)
+
+
+def _abs(value: int | float) -> int | float:
+    # The builtin 'abs' is generic, and so doesn't type check as a
+    # Native function.
+    return abs(value)
+
+
+registry.function("sqrt", math.sqrt)
+registry.function("exp", math.exp)
+registry.function("log", math.log)
+registry.function("floor", math.floor)
+registry.function("abs", _abs)
+registry.function("min", min, 2)
+registry.function("max", max, 2)
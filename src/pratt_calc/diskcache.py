@@ -0,0 +1,361 @@
+"""A cache of compiled scripts on disk, along the lines of __pycache__.
+
+Running 'pratt-calc script.calc' over and over would otherwise compile
+the same script from scratch every time. A DiskCache keeps the
+compiled form of each script in a file of its own, named after a hash
+of the script's text, so that later runs only have to read it back.
+
+Entries are never stale, since anything that could change the
+compiled form of a script is part of its key:
+
+- Editing a script changes its text, and so its hash; the old entry
+  simply stops being found.
+
+- Upgrading Pratt Calc or Python, changing any of the modules which
+  produce compiled code, or switching the optimizer on or off,
+  changes every key (see 'fingerprint'.)
+
+- Registering a native function changes every key too, since a name
+  compiles differently once it names a function (see 'DiskCache.path'.)
+
+Entries which can't be read back are ignored, and replaced. Only the
+MAX_ENTRIES most recently used entries are kept.
+
+Entries are written with 'marshal', which only deals in plain values
+(and so, unlike 'pickle', can't be made to run anything on loading.)
+See 'encode' for the layout.
+
+"""
+
+import contextlib
+import functools
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+from collections import deque
+from collections.abc import Sequence
+from importlib.metadata import PackageNotFoundError, version
+from itertools import repeat
+from pathlib import Path
+from typing import cast, final, overload, override
+
+import pratt_calc.arithmetic as arithmetic
+import pratt_calc.compiler as compiler
+import pratt_calc.optimizer as optimizer
+import pratt_calc.tokenizer as tokenizer
+from pratt_calc.compiler import Code, Instr, Opcode, Text, new_instr
+from pratt_calc.tokenizer import Span, Token, Type
+
+# Bump this whenever the way entries are stored changes.
+FORMAT = 2
+
+MAX_ENTRIES = 1000
+
+# Entries are named after their key, and end with this suffix.
+SUFFIX = ".calcc"
+
+
+def default_directory() -> Path:
+    """Return where compiled scripts are cached by default.
+
+    This is $PRATT_CALC_CACHE if set, and otherwise a 'pratt-calc'
+    directory under the user's cache directory.
+
+    """
+
+    if directory := os.environ.get("PRATT_CALC_CACHE"):
+        return Path(directory)
+
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+
+    return Path(base) / "pratt-calc"
+
+
+@functools.cache
+def fingerprint(optimize: bool) -> str:
+    """Describe everything besides its text that compiled code depends on.
+
+    OPTIMIZE says whether the code is optimized.
+
+    """
+
+    try:
+        package = version("pratt-calc")
+    except PackageNotFoundError:
+        package = "unknown"
+
+    parts = [str(FORMAT), package, sys.version, str(optimize)]
+
+    # Catch changes to the compiler which come without a new version
+    # number, as happens while working on it.
+    for module in (arithmetic, compiler, optimizer, tokenizer):
+        if module.__file__ is not None:
+            stat = os.stat(module.__file__)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+
+    return ":".join(parts)
+
+
+type Record = tuple[
+    bytes,
+    tuple[int, ...],
+    tuple[int | float, ...],
+    tuple[str, ...],
+    tuple[tuple[str, int], ...],
+    tuple[str, ...],
+    tuple[int, ...],
+    int,
+    int,
+    int,
+    float,
+]
+
+_opcodes = {op.value: op for op in Opcode}
+
+_types = {t.value: t for t in Type}
+
+
+@final
+class _Tokens(Sequence[Token]):
+    """A table of tokens, as stored by 'encode'.
+
+    Tokens are only needed to show a block's source, and so they're
+    rebuilt one at a time, as they're asked for.
+
+    """
+
+    def __init__(self, tags: bytes, whats: tuple[str, ...]):
+        self.tags = tags
+        self.whats = whats
+
+    @override
+    def __len__(self) -> int:
+        return len(self.whats)
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Token]: ...
+
+    @override
+    def __getitem__(self, index: int | slice) -> Token | Sequence[Token]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        return Token(_types[self.tags[index]], self.whats[index])
+
+
+def encode(code: Code) -> bytes:
+    """Serialize CODE, along with the blocks within it.
+
+    Every Code object is flattened into a Record of plain values: its
+    opcodes (as bytes) and their arguments, its constant, name and
+    string tables, the names of its native functions, the indices of
+    its blocks' Records, and where its tokens are found (an index into
+    a table of token sequences, which blocks typically share, and a
+    start and stop position.)
+
+    Records are listed breadth first, so that a block's Record always
+    comes after that of the code it's found in.
+
+    """
+
+    sources: list[tuple[bytes, tuple[str, ...]]] = []
+    source_ids: dict[int, int] = {}
+    records: list[Record] = []
+
+    pending = deque([code])
+
+    while pending:
+        current = pending.popleft()
+        tokens = current.tokens
+
+        if not isinstance(tokens, Span):
+            tokens = Span(tuple(tokens))
+
+        source_id = source_ids.get(id(tokens.tokens))
+
+        if source_id is None:
+            source_id = source_ids[id(tokens.tokens)] = len(sources)
+            sources.append(
+                (
+                    bytes([t.tag.value for t in tokens.tokens]),
+                    tuple([t.what for t in tokens.tokens]),
+                )
+            )
+
+        # Blocks are numbered after everything already waiting.
+        first = len(records) + len(pending) + 1
+
+        records.append(
+            (
+                bytes([instr.op.value for instr in current.ops]),
+                tuple([instr.arg for instr in current.ops]),
+                current.consts,
+                current.names,
+                tuple([(text.what, text.length) for text in current.strings]),
+                tuple([native.name for native in current.natives]),
+                tuple(range(first, first + len(current.blocks))),
+                source_id,
+                tokens.start,
+                tokens.stop,
+                current.bits,
+            )
+        )
+
+        pending.extend(current.blocks)
+
+    return marshal.dumps((sources, records))
+
+
+def decode(data: bytes) -> Code:
+    """Rebuild the Code object serialized as DATA by 'encode'.
+
+    Native functions are looked up by name among those currently
+    registered; a KeyError is raised for any that no longer are.
+
+    """
+
+    sources, records = cast(
+        tuple[list[tuple[bytes, tuple[str, ...]]], list[Record]],
+        marshal.loads(data),
+    )
+
+    token_tables = [_Tokens(tags, whats) for tags, whats in sources]
+    functions = compiler.registry.functions
+
+    codes: list[Code | None] = [None] * len(records)
+
+    # Build blocks before the code they're found in.
+    for i in reversed(range(len(records))):
+        (
+            ops,
+            args,
+            consts,
+            names,
+            strings,
+            natives,
+            blocks,
+            source_id,
+            start,
+            stop,
+            bits,
+        ) = records[i]
+
+        codes[i] = Code(
+            tuple(
+                map(
+                    new_instr,
+                    repeat(Instr),
+                    zip(map(_opcodes.__getitem__, ops), args, strict=True),
+                )
+            ),
+            Span(token_tables[source_id], start, stop),
+            consts,
+            names,
+            tuple([cast(Code, codes[j]) for j in blocks]),
+            tuple(map(Text._make, strings)),
+            tuple([functions[name] for name in natives]),
+            bits,
+        )
+
+    return cast(Code, codes[0])
+
+
+@final
+class DiskCache:
+    """Compiled scripts, kept as files in DIRECTORY.
+
+    DIRECTORY defaults to 'default_directory()', and is created when
+    first needed.
+
+    """
+
+    def __init__(
+        self, directory: Path | str | None = None, max_entries: int = MAX_ENTRIES
+    ):
+        self.directory = (
+            Path(directory) if directory is not None else default_directory()
+        )
+        self.max_entries = max_entries
+
+    def path(self, source: str, optimize: bool) -> Path:
+        """Return where SOURCE's compiled form is kept.
+
+        OPTIMIZE says whether it's optimized.
+
+        """
+
+        digest = hashlib.sha256(fingerprint(optimize).encode())
+
+        for name, native in sorted(compiler.registry.functions.items()):
+            digest.update(f"{name}/{native.arity}:".encode())
+
+        digest.update(source.encode())
+
+        return self.directory / (digest.hexdigest() + SUFFIX)
+
+    def load(self, source: str, optimize: bool) -> Code | None:
+        """Return the compiled form of SOURCE, or None if it isn't cached."""
+
+        path = self.path(source, optimize)
+
+        try:
+            code = decode(path.read_bytes())
+
+            # Mark the entry as recently used.
+            os.utime(path)
+        except Exception:
+            # Besides the entry not existing, a damaged entry could
+            # fail to load in any number of ways; it'll be replaced
+            # all the same.
+            return None
+
+        return code
+
+    def store(self, source: str, optimize: bool, code: Code):
+        """Cache CODE as the compiled form of SOURCE.
+
+        Failing to do so isn't an error: the cache is only there to
+        save time.
+
+        """
+
+        path = self.path(source, optimize)
+
+        data = encode(code)
+        temporary: str | None = None
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file first, so that other processes
+            # never see a partly written entry.
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix=".tmp", delete=False
+            ) as f:
+                temporary = f.name
+                _ = f.write(data)
+
+            os.replace(temporary, path)
+            self.prune()
+        except OSError:
+            if temporary is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(temporary)
+
+    def prune(self):
+        """Remove all but the MAX_ENTRIES most recently used entries."""
+
+        entries = list(self.directory.glob("*" + SUFFIX))
+
+        if len(entries) <= self.max_entries:
+            return
+
+        entries.sort(key=lambda path: path.stat().st_mtime_ns)
+
+        for path in entries[: len(entries) - self.max_entries]:
+            path.unlink(missing_ok=True)
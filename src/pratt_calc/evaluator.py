@@ -1,13 +1,37 @@
 from __future__ import annotations
 
-import enum
 import math
 import pathlib
-from collections import UserDict
+import weakref
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
-from typing import final, override
-
-from pratt_calc.tokenizer import Internal, Op, Token, Type, tokenize
+from functools import partial
+from typing import TYPE_CHECKING, final, override
+
+from pratt_calc.arithmetic import (
+    factorial,
+    factorial_bits,
+    power,
+    power_bits,
+    render,
+)
+from pratt_calc.cache import LRUCache
+from pratt_calc.codegen import MAX_DEPTH, Backend
+from pratt_calc.compiler import Code, Opcode
+from pratt_calc.diskcache import DiskCache
+from pratt_calc.heap import Collection, Heap, Kind, KindStats
+from pratt_calc.limits import Limits, Meter
+from pratt_calc.output import BufferedOutput, Output
+from pratt_calc.profiler import Frames, Profiler
+from pratt_calc.programs import Programs
+from pratt_calc.tokenizer import scan_chunks, statements
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import ArrayLike, NDArray
+
+# The number of characters read at a time when streaming a file.
+CHUNK_SIZE = 1 << 16
 
 
 @dataclass
@@ -20,89 +44,119 @@ class Register:
         return f"({self.alias} {self.value})"
 
 
-class Precedence(enum.IntEnum):
-    """Establish the various precedence levels.
+@final
+class Evaluator:
+    """An environment for evaluating expressions.
+
+    Evaluation happens in two steps: an expression is first compiled
+    into a Code object (see 'compile'), which is then run against the
+    registers and heap held here (see 'execute').
 
-    Rather than being associated directly with a token, a given
-    precedence level gets passed in as an argument whenever a given
-    token is dispatched.
+    Compiled expressions are cached by their source text, so that
+    evaluating the same expression again skips straight to running
+    it.
 
-    For example, subtraction is dispatched using PLUS_MINUS, while
-    negation is dispatched using UNARY, even though both are
-    associated with the '-' token.
+    An evaluator should only be used by one thread at a time. To
+    evaluate from several threads, give each thread an evaluator of
+    its own, all sharing the same compiled code (see 'programs'.)
 
     """
 
-    NONE = enum.auto()
-    SEMICOLON = enum.auto()
-    ASSIGNMENT = enum.auto()
-    PLUS_MINUS = enum.auto()
-    TIMES_DIVIDE = enum.auto()
-    POWER = enum.auto()
-    UNARY = enum.auto()
-    FACTORIAL = enum.auto()
-    IMMEDIATE = enum.auto()
+    def __init__(
+        self,
+        cache_size: int = 256,
+        gc_threshold: int | None = None,
+        optimize: bool = True,
+        limits: Limits | None = None,
+        profile: bool = False,
+        disk_cache: DiskCache | None = None,
+        native: bool = False,
+        programs: Programs | None = None,
+        output: Output | None = None,
+    ):
+        """Initialize the evaluator object.
 
+        CACHE_SIZE is the number of compiled expressions to keep
+        around; 0 disables the cache.
 
-class LedPrecedenceTable(UserDict[Token, Precedence]):
-    """Specify precedence of LED-position tokens.
+        GC_THRESHOLD, if given, is the number of heap addresses that
+        may be allocated before the heap is automatically garbage
+        collected (see 'collect'.)
 
-    Not all LED-position tokens are actual LEDs, since, for example,
-    'eof' serves no other function than to report a precedence level
-    of NONE. In most cases though, a LED-position token and a LED
-    token are the same thing.
+        OPTIMIZE says whether compiled code is passed through the
+        peephole optimizer (see 'pratt_calc.optimizer'.) This never
+        changes results, and is mostly useful for measuring what the
+        optimizer buys us.
 
-    """
+        LIMITS, if given, caps the resources each call to 'execute'
+        may use (see 'pratt_calc.limits'.)
 
-    @override
-    def __getitem__(self, token: Token):
-        try:
-            return self.data[token]
-        except KeyError as e:
-            raise ValueError(f"Led does not exist in table: '{token}'") from e
+        With PROFILE set, a Profiler is attached as the 'profiler'
+        attribute (see 'pratt_calc.profiler'.) Setting 'profiler'
+        later works too, as does setting it back to None.
 
+        DISK_CACHE, if given, is where 'evaluate_file' keeps the
+        compiled form of files between runs (see
+        'pratt_calc.diskcache'.)
 
-@final
-class Evaluator:
-    """An environment for evaluating expressions.
+        With NATIVE set, code is translated into Python functions and
+        run as such, rather than by the VM (see 'pratt_calc.codegen'.)
+        The VM still runs code whenever limits are set, a profiler is
+        attached, or register reads are being tracked. Garbage
+        collection is put off while native code is running.
 
-    Encapsulates a stream of Token objects as global state usable
-    across recursive calls to 'expression', freeing us from having to
-    return the stream (or any kind of placeholder state, for that
-    matter) after each such recursive call.
+        PROGRAMS, if given, is where compiled code is cached, in place
+        of a cache of our own made from CACHE_SIZE, OPTIMIZE and
+        DISK_CACHE. Evaluators sharing PROGRAMS (possibly from
+        different threads) share their compiled code (see
+        'pratt_calc.programs'.)
 
-    """
+        OUTPUT is where 'print' writes to, defaulting to buffered
+        standard output (see 'pratt_calc.output'.) Setting 'output'
+        later works too.
 
-    led_precedence = LedPrecedenceTable(
-        {
-            Op.eof: Precedence.NONE,
-            Op.rparen: Precedence.NONE,
-            Op.plus: Precedence.PLUS_MINUS,
-            Op.minus: Precedence.PLUS_MINUS,
-            Op.times: Precedence.TIMES_DIVIDE,
-            Op.divide: Precedence.TIMES_DIVIDE,
-            Op.power: Precedence.POWER,
-            Op.factorial: Precedence.FACTORIAL,
-            Op.semicolon: Precedence.SEMICOLON,
-            Op.assign: Precedence.ASSIGNMENT,
-            Op.quote: Precedence.IMMEDIATE,
-        }
-    )
-
-    def __init__(self):
-        """Initialize the evaluator object.
+        """
 
-        In particular initialize an empty token stream, to which
-        EVALUATE will later append tokens comprising the expression to
-        be evaluated.
+        self.programs = (
+            programs
+            if programs is not None
+            else Programs(cache_size, optimize, disk_cache)
+        )
+        self.limits = limits if limits is not None else Limits()
+        self.profiler = Profiler() if profile else None
+        self.output = output if output is not None else BufferedOutput()
+
+        # Registers are kept in definition order, so that a
+        # register's index in REGISTERS doubles as its address.
+        # SYMBOLS maps each alias to that address.
+        self.registers: list[Register] = []
+        self.symbols: dict[str, int] = {}
 
-        """
+        # For each Code object run so far, the register addresses of
+        # the names it uses, in the order of its NAMES table. An entry
+        # is -1 until that name is first used, so that registers are
+        # still created in the order they're first run into.
+        self.links: weakref.WeakKeyDictionary[Code, list[int]] = (
+            weakref.WeakKeyDictionary()
+        )
 
-        # Initialize an empty token stream.
-        self.stream = tokenize("")
+        self.heap = Heap()
 
-        self.registers: list[Register] = []
-        self.heap: list[Token] = []
+        # Code objects currently being run, along with their value
+        # stacks. These are roots for the garbage collector.
+        self.active: list[tuple[Code, list[int | float]]] = []
+
+        self.gc_threshold = gc_threshold
+        self.gc_size = 0
+        self.last_collection: Collection | None = None
+
+        self.backend = self._backend() if native else None
+
+    @property
+    def cache(self) -> LRUCache[str, Code]:
+        """The cache of compiled code, keyed by source text."""
+
+        return self.programs.cache
 
     def evaluate(self, raw_expression: str) -> int | float:
         """Evaluate RAW_EXPRESSION.
@@ -110,285 +164,504 @@ class Evaluator:
         Note that each call to EVALUATE per object will peristently
         grow both the registers and the heap.
 
+        Anything printed is flushed by the time this returns.
+
         """
 
-        tokens = tokenize(raw_expression)
-        self.stream.prepend(*tokens)
+        try:
+            return self.execute(self.compile(raw_expression))
+        finally:
+            self.output.flush()
 
-        return self.expression()
+    def compile(self, raw_expression: str, persist: bool = False) -> Code:
+        """Compile RAW_EXPRESSION, reusing a cached result if possible.
 
-    def evaluate_file(self, filename: str) -> int | float:
-        """Execute code in FILENAME."""
+        The returned Code object can be passed to 'execute' any
+        number of times.
 
-        path = pathlib.Path(filename)
+        With PERSIST set, the disk cache (if there is one) is used as
+        well.
 
-        if not path.exists():
-            raise FileNotFoundError(f"Fatal: '{path}' doesn't exist")
+        """
 
-        if path.is_dir():
-            raise IsADirectoryError(f"Fatal: '{path}' is a directory")
+        return self.programs.compile(raw_expression, persist, self.profiler)
 
-        with path.open(encoding="utf-8") as f:
-            code = f.read()
+    def evaluate_batch(
+        self, raw_expression: str, bindings: Mapping[str, ArrayLike]
+    ) -> NDArray[np.generic]:
+        """Evaluate RAW_EXPRESSION over columns of register values.
 
-            return self.evaluate(code)
+        BINDINGS maps register names to equal-length arrays; the
+        result is an array holding the value of RAW_EXPRESSION for
+        each row. For example:
 
-    def dealias(self, alias: str) -> int:
-        """Return address associated with locals alias.
+            ev.evaluate_batch("a * sin(b)", {"a": [1, 2], "b": [0, pi]})
 
-        If alias doesn't exist yet, create it.
+        The expression is compiled once and, where possible, run just
+        once over whole columns using NumPy. Expressions that use the
+        heap (strings, blocks, 'print', 'call') are evaluated row by
+        row instead, with a warning.
+
+        Registers aren't modified: assignments only last for the
+        duration of the batch.
+
+        This requires NumPy to be installed.
+
+        """
+
+        try:
+            from pratt_calc.batch import evaluate_batch
+        except ImportError as e:
+            raise ImportError("Batch evaluation requires NumPy") from e
+
+        try:
+            return evaluate_batch(self, self.compile(raw_expression), bindings)
+        finally:
+            self.output.flush()
+
+    def evaluate_stream(self, chunks: Iterable[str]) -> int | float:
+        """Evaluate source text arriving in CHUNKS.
+
+        Rather than waiting for all of the source text, each top-level
+        statement is compiled and run as soon as it's complete, so
+        that only the current statement has to be held in memory.
+
+        The result is the same as that of evaluating the concatenation
+        of CHUNKS, except that statements preceding a syntax error
+        will already have been run by the time it's reported.
+
+        Output is only flushed once every statement has run, as with
+        'evaluate'.
 
         """
 
-        for i, register in enumerate(self.registers):
-            if register.alias == alias:
-                return i
+        value: int | float = 0
 
-        self.registers.append(Register(alias, 0))
+        try:
+            for statement in statements(scan_chunks(chunks)):
+                # Statements often repeat, so look them up in the
+                # cache, using source text which scans back into the
+                # same tokens.
+                value = self.execute(
+                    self.compile(" ".join([t.what for t in statement]))
+                )
+        finally:
+            self.output.flush()
 
-        return len(self.registers) - 1
+        return value
 
-    def _call(self, type_addr: int) -> int | float:
-        """Logic corresponding to 'call' token."""
+    def evaluate_file(self, filename: str, stream: bool = False) -> int | float:
+        """Execute code in FILENAME.
 
-        type_t = self.heap[type_addr]
+        With STREAM set, the file is read and evaluated a chunk at a
+        time (see 'evaluate_stream'), rather than all at once.
 
-        if type_t != Internal.code:
-            raise ValueError(f"Illegal call-address: {type_addr}")
+        """
 
-        # Get the length address.
-        len_addr = type_addr + 1
-        code_len = int(self.heap[len_addr].what)
+        path = pathlib.Path(filename)
 
-        # Get the code address.
-        code_addr = len_addr + 1
-        code = self.heap[code_addr : code_addr + code_len]
-        self.stream.prepend(*code)
+        if not path.exists():
+            raise FileNotFoundError(f"Fatal: '{path}' doesn't exist")
 
-        return self.expression(Precedence.NONE)
+        if path.is_dir():
+            raise IsADirectoryError(f"Fatal: '{path}' is a directory")
 
-    def _quote(self, ignore: bool = False) -> int | float:
-        """Logic corresponding to 'quote' token."""
+        with path.open(encoding="utf-8") as f:
+            if stream:
+                return self.evaluate_stream(iter(partial(f.read, CHUNK_SIZE), ""))
 
-        # Note that this case doesn't call
-        # 'expression': it flatly consumes the next
-        # series of tokens until '}' is seen.
-        start = len(self.heap)
-        code_expr: list[Token] = []
+            code = self.compile(f.read(), persist=True)
 
-        quote_stack = 1
+        try:
+            return self.execute(code)
+        finally:
+            self.output.flush()
 
-        while True:
-            t = next(self.stream)
+    def reset(self):
+        """Forget every register and heap object.
 
-            if t == Op.quote:
-                quote_stack += 1
-                code_expr.append(t)
-            elif t == Op.endquote:
-                quote_stack -= 1
+        Compiled code is kept, so that an evaluator can be reused for
+        unrelated evaluations without having to compile everything
+        anew.
 
-                if quote_stack == 0:
-                    break
-                else:
-                    code_expr.append(t)
-            else:
-                code_expr.append(t)
+        """
 
-        if ignore:
-            return self.expression()
-        else:
-            self.heap.append(Internal.code)
-            self.heap.append(Token(Type.INT, str(len(code_expr))))
-            self.heap.extend(code_expr)
+        self.registers = []
+        self.symbols = {}
+        self.links = weakref.WeakKeyDictionary()
+        self.heap = Heap()
+        self.gc_size = 0
+        self.last_collection = None
 
-            return start
+        if self.backend is not None:
+            self.backend = self._backend()
 
-    def expression(self, level: int = Precedence.NONE) -> int | float:
-        """Pratt-parse an arithmetic expression, evaluating it."""
+    def _backend(self) -> Backend:
+        """Return a Backend running native code against our state."""
 
-        # NUD
-        current = next(self.stream)
+        return Backend(
+            self.registers,
+            self.heap,
+            self._link,
+            self.dealias,
+            self.execute,
+            self._write,
+        )
 
-        match current.tag:
-            case Type.INT:
-                acc = int(current.what)
+    def _write(self, line: str):
+        """Print LINE to our output, whatever it currently is."""
 
-            case Type.FLOAT:
-                acc = float(current.what)
+        self.output.write(line)
 
-            case Type.IDENTIFIER:
-                rindex = self.dealias(current.what)
+    def dealias(self, alias: str) -> int:
+        """Return address associated with locals alias.
 
-                # We cheat a little here: if the next token is '<-',
-                # this identifier token is in a left-hand-side
-                # position of an assignment operation, and so the
-                # token should evaluate to the register index, just as
-                # it did originally.
-                if (t := self.stream.peek()) == Op.assign:
-                    acc = rindex
-                else:
-                    acc = self.registers[rindex].value
+        If alias doesn't exist yet, create it.
+
+        """
+
+        try:
+            return self.symbols[alias]
+        except KeyError:
+            rindex = len(self.registers)
 
-            case Type.EOF:
-                acc = 0
+            self.registers.append(Register(alias, 0))
+            self.symbols[alias] = rindex
 
-            case Type.OPERATOR:
-                match current:
-                    case Op.pi:
-                        acc = math.pi
+            return rindex
 
-                    case Op.sin:
-                        acc = math.sin(self.expression(Precedence.UNARY))
+    def _link(self, code: Code) -> list[int]:
+        """Return the register addresses used by CODE.
 
-                    case Op.cos:
-                        acc = math.cos(self.expression(Precedence.UNARY))
+        See the 'links' attribute.
 
-                    case Op.tan:
-                        acc = math.tan(self.expression(Precedence.UNARY))
+        """
 
-                    case Op.sec:
-                        acc = 1 / math.cos(self.expression(Precedence.UNARY))
+        try:
+            return self.links[code]
+        except KeyError:
+            slots = self.links[code] = [-1] * len(code.names)
 
-                    case Op.csc:
-                        acc = 1 / math.sin(self.expression(Precedence.UNARY))
+            return slots
 
-                    case Op.cot:
-                        acc = 1 / math.tan(self.expression(Precedence.UNARY))
+    def heap_stats(self) -> dict[Kind, KindStats]:
+        """Report how much memory each kind of heap object is using.
 
-                    case Op.minus:
-                        acc = -self.expression(Precedence.UNARY)
+        See 'Heap.stats'.
 
-                    case Op.lparen:
-                        acc = self.expression(Precedence.NONE)
+        """
 
-                        # We don't drive parsing/evaluation with right-paren,
-                        # so we skip it as we read it.
-                        assert next(self.stream) == Op.rparen
+        return self.heap.stats()
 
-                    case Op.prt:
-                        type_addr = int(self.expression(Precedence.UNARY))
-                        type_t = self.heap[type_addr]
+    def collect(self) -> Collection:
+        """Garbage-collect the heap.
 
-                        if type_t != Internal.string:
-                            raise ValueError(f"Illegal string-address: {type_addr}")
+        Objects whose addresses can't be found in any register, on the
+        value stack of running code, or as a literal inside live code
+        are freed. The addresses of freed objects become invalid.
 
-                        len_addr = type_addr + 1
-                        string_len = int(self.heap[len_addr].what)
+        See 'Heap.collect'.
+
+        """
 
-                        # Get the address of the string itself.
-                        string_addr = len_addr + 1
-                        string = self.heap[string_addr : string_addr + string_len]
+        roots = [r.value for r in self.registers]
+        codes: list[Code] = []
 
-                        print(" ".join([s.what for s in string]))
+        for code, stack in self.active:
+            roots.extend(stack)
+            codes.append(code)
 
-                        acc = self.expression(Precedence.NONE)
+        self.last_collection = self.heap.collect(roots, codes)
+        self.gc_size = self.heap.size
 
-                    case Op.quote:
-                        acc = self._quote()
+        return self.last_collection
 
-                    case Op.call:
-                        type_addr = int(self.expression(Precedence.UNARY))
-                        acc = self._call(type_addr)
+    def _maybe_collect(self):
+        """Collect the heap if GC_THRESHOLD has been reached."""
 
-                    case Op.semicolon:
-                        # As a nud, ';' is a no-op. This lets users
-                        # input empty "statements" like ';;'. It also
-                        # lets a preprocessing step inject semicolons
-                        # in place of newlines.
-                        acc = self.expression(Precedence.NONE)
+        # Native code keeps values where the collector can't see them.
+        if self.backend is not None and self.backend.depth:
+            return
 
-                    case Op.string:
-                        start = len(self.heap)
-                        string_expr: list[Token] = []
+        if (
+            self.gc_threshold is not None
+            and self.heap.size - self.gc_size >= self.gc_threshold
+        ):
+            _ = self.collect()
 
-                        while (t := next(self.stream)) != Op.string:
-                            string_expr.append(t)
+    def execute(self, code: Code, reads: set[int] | None = None) -> int | float:
+        """Run compiled CODE, returning its result.
 
-                        self.heap.append(Internal.string)
-                        self.heap.append(Token(Type.INT, str(len(string_expr))))
-                        self.heap.extend(string_expr)
+        If READS is given, the address of every register read while
+        running CODE (including any blocks it calls) is added to it.
 
-                        acc = start
+        Calling a block doesn't recurse into another call to EXECUTE:
+        instead, the caller's state is saved on a stack of frames, and
+        restored once the block returns. Deeply recursive blocks are
+        therefore only limited by memory, and not by Python's
+        recursion limit.
 
-                    case Op.strcast:
-                        value = self.expression(Precedence.UNARY)
-                        acc = len(self.heap)
+        A call which is the last thing a block does (such as the
+        'call f' in 'f <- {n <- n - 1; n { call f }}') doesn't save
+        the caller's state at all, so that such loops run in constant
+        space.
 
-                        self.heap.append(Internal.string)
-                        self.heap.append(Token(Type.INT, "1"))
-                        self.heap.append(Token(Type.INT, f"{value}"))
+        Raises LimitExceeded if running CODE exceeds any of the
+        evaluator's limits.
+
+        Unlike 'evaluate', this doesn't flush what CODE prints (see
+        'pratt_calc.output'.)
+
+        """
+
+        backend = self.backend
+
+        if (
+            backend is not None
+            and backend.depth < MAX_DEPTH
+            and reads is None
+            and self.profiler is None
+            and self.limits == Limits()
+        ):
+            # Native code doesn't collect garbage as it goes, so catch
+            # up before it starts, keeping CODE's own literals.
+            self.active.append((code, []))
+            try:
+                self._maybe_collect()
+            finally:
+                _ = self.active.pop()
+
+            return backend.run(code)
+
+        registers = self.registers
+        heap = self.heap
+        active = self.active
+
+        # Steps are counted a block at a time, and only checked
+        # against the limits once they pass CHECKPOINT.
+        meter = Meter(self.limits, heap)
+        steps = len(code.ops)
+        checkpoint = meter.check(steps)
+        heap_ceiling = meter.heap_ceiling
+        int_ceiling = meter.int_ceiling
+
+        # Integers the optimizer computed ahead of time are checked
+        # as the code computing them is entered.
+        max_bits = meter.max_bits
+        meter.check_bits(code.bits, steps)
+
+        # When profiling, every block entry takes the slow path past
+        # CHECKPOINT, and returns are noticed by FRAMES.
+        profiler = self.profiler
+        depth = 0
+
+        # The callers of the code currently being run.
+        frames: list[tuple[Code, int, list[int | float], list[int]]]
+
+        if profiler is not None:
+            checkpoint = -1
+            frames = Frames(profiler)
+            depth = profiler.run(code, heap)
+        else:
+            frames = []
+
+        stack: list[int | float] = []
+        slots = self._link(code)
+        pc = 0
+
+        base = len(active)
+        active.append((code, stack))
+
+        try:
+            while True:
+                op, arg = code.ops[pc]
+                pc += 1
 
-                    case _ as nonexistent:
-                        raise ValueError(f"Invalid nud: '{nonexistent}'")
+                match op:
+                    case Opcode.PUSH:
+                        stack.append(code.consts[arg])
 
-            case _:
-                raise ValueError(f"Invalid token: '{current}'")
+                    case Opcode.LOAD:
+                        rindex = slots[arg]
 
-        while level < self.led_precedence[self.stream.peek()]:
-            current = next(self.stream)
+                        if rindex < 0:
+                            rindex = slots[arg] = self.dealias(code.names[arg])
 
-            # LED
-            match current:
-                case Op.plus:
-                    acc += self.expression(Precedence.PLUS_MINUS)
+                        stack.append(registers[rindex].value)
 
-                case Op.minus:
-                    acc -= self.expression(Precedence.PLUS_MINUS)
+                        if reads is not None:
+                            reads.add(rindex)
 
-                case Op.times:
-                    acc *= self.expression(Precedence.TIMES_DIVIDE)
+                    case Opcode.REF:
+                        rindex = slots[arg]
 
-                case Op.divide:
-                    acc /= self.expression(Precedence.TIMES_DIVIDE)
+                        if rindex < 0:
+                            rindex = slots[arg] = self.dealias(code.names[arg])
 
-                case Op.power:
-                    # Enforce right-association by subtracting 1 from
-                    # the precedence argument.
-                    acc = math.pow(acc, self.expression(Precedence.POWER - 1))
+                        stack.append(rindex)
 
-                case Op.factorial:
-                    # Compute factorial by hand.
-                    #
-                    # If ACC is a float, truncate it first to an int.
-                    prod = 1
+                    case Opcode.NEG:
+                        stack[-1] = -stack[-1]
 
-                    acc = int(acc)
+                    case Opcode.SIN:
+                        stack[-1] = math.sin(stack[-1])
 
-                    for j in range(1, acc + 1):
-                        prod *= j
+                    case Opcode.COS:
+                        stack[-1] = math.cos(stack[-1])
 
-                        acc = prod
+                    case Opcode.TAN:
+                        stack[-1] = math.tan(stack[-1])
 
-                case Op.semicolon:
-                    # Discard the left-hand side, keeping only the
-                    # right-hand side. This will hopefully be useful
-                    # for side-effects later.
-                    acc = self.expression(Precedence.SEMICOLON)
+                    case Opcode.SEC:
+                        stack[-1] = 1 / math.cos(stack[-1])
 
-                case Op.assign:
-                    # Assignment is right-associative.
-                    right_hand_side = self.expression(Precedence.ASSIGNMENT - 1)
+                    case Opcode.CSC:
+                        stack[-1] = 1 / math.sin(stack[-1])
+
+                    case Opcode.COT:
+                        stack[-1] = 1 / math.tan(stack[-1])
+
+                    case Opcode.ADD:
+                        right = stack.pop()
+                        stack[-1] += right
+
+                    case Opcode.SUB:
+                        right = stack.pop()
+                        stack[-1] -= right
 
-                    # Truncate 'acc' so that we can use it as an index
-                    # into our registers.
-                    self.registers[int(acc)].value = right_hand_side
+                    case Opcode.MUL:
+                        right = stack.pop()
+                        stack[-1] *= right
+
+                    case Opcode.DIV:
+                        right = stack.pop()
+                        stack[-1] /= right
 
-                    # Set the current result to 'right_hand_side',
-                    # like with Lisp's 'setq'.
-                    acc = right_hand_side
+                    case Opcode.POW:
+                        right = stack.pop()
+                        meter.check_bits(power_bits(stack[-1], right), steps)
+                        stack[-1] = power(stack[-1], right)
 
-                case Op.quote:
-                    # Conditional execution.
-                    flag = acc
+                    case Opcode.FACT:
+                        meter.check_bits(factorial_bits(stack[-1]), steps)
+                        stack[-1] = factorial(stack[-1])
+
+                    case Opcode.POP:
+                        _ = stack.pop()
+
+                    case Opcode.STORE:
+                        right_hand_side = stack.pop()
 
-                    if flag != 0:
-                        type_addr = int(self._quote())
-                        acc = self._call(type_addr)
+                        if (
+                            abs(right_hand_side) > int_ceiling
+                            and type(right_hand_side) is int
+                        ):
+                            raise meter.exceeded("bits", steps)
 
-                    else:
-                        acc = self._quote(ignore=True)
+                        registers[int(stack[-1])].value = right_hand_side
+                        stack[-1] = right_hand_side
+
+                    case Opcode.PRINT:
+                        self.output.write(heap.string(int(stack.pop())))
 
-                case _ as token:
-                    raise ValueError(f"Invalid led: {token}")
+                    case Opcode.QUOTE:
+                        stack.append(heap.store_code(code.blocks[arg]))
+                        self._maybe_collect()
+
+                        if heap.size > heap_ceiling:
+                            raise meter.exceeded("heap", steps)
+
+                    case Opcode.CALL | Opcode.COND:
+                        if op == Opcode.CALL:
+                            callee = heap.code(int(stack[-1]))
+                        elif stack[-1] != 0:
+                            # The block is run straight from our own
+                            # code, without a copy of it being stored
+                            # in the heap first.
+                            callee = code.blocks[arg]
+                        else:
+                            # Like a skipped block followed by an empty
+                            # expression.
+                            stack[-1] = 0
+                            continue
+
+                        steps += len(callee.ops)
 
-        return acc
+                        if callee.bits > max_bits:
+                            raise meter.exceeded("bits", steps)
+
+                        if steps > checkpoint:
+                            checkpoint = meter.check(steps)
+
+                            if profiler is not None:
+                                checkpoint = -1
+                                profiler.enter(
+                                    callee,
+                                    int(stack[-1]) if op == Opcode.CALL else None,
+                                    code.ops[pc].op == Opcode.RETURN,
+                                )
+
+                        if code.ops[pc].op == Opcode.RETURN:
+                            # A tail call: the callee's result will be
+                            # ours too, so there's no need to come
+                            # back here. The callee takes the place of
+                            # the current frame, so that a block
+                            # calling itself in tail position loops
+                            # rather than growing the frame stack.
+                            _ = active.pop()
+                        else:
+                            # The callee's result will take the place
+                            # of the block's address on top of the
+                            # stack.
+                            frames.append((code, pc, stack, slots))
+
+                        code = callee
+                        stack = []
+                        slots = self._link(code)
+                        pc = 0
+
+                        active.append((code, stack))
+
+                    case Opcode.STRING:
+                        stack.append(heap.store_string(*code.strings[arg]))
+                        self._maybe_collect()
+
+                        if heap.size > heap_ceiling:
+                            raise meter.exceeded("heap", steps)
+
+                    case Opcode.STRCAST:
+                        value = stack[-1]
+                        stack[-1] = heap.store_string(render(value), 1)
+                        self._maybe_collect()
+
+                        if heap.size > heap_ceiling:
+                            raise meter.exceeded("heap", steps)
+
+                    case Opcode.NATIVE:
+                        native = code.natives[arg]
+
+                        if native.arity == 1:
+                            stack[-1] = native.function(stack[-1])
+                        else:
+                            first = len(stack) - native.arity
+                            result = native.function(*stack[first:])
+                            del stack[first:]
+                            stack.append(result)
+
+                    case Opcode.RETURN:
+                        result = stack.pop()
+
+                        if abs(result) > int_ceiling and type(result) is int:
+                            raise meter.exceeded("bits", steps)
+
+                        if not frames:
+                            return result
+
+                        _ = active.pop()
+                        code, pc, stack, slots = frames.pop()
+                        stack[-1] = result
+        finally:
+            del active[base:]
+
+            if profiler is not None:
+                profiler.finish(depth)
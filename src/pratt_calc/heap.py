@@ -0,0 +1,354 @@
+import enum
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Generator, Iterable
+from typing import NamedTuple, final, override
+
+from pratt_calc.compiler import Code
+
+
+class Kind(enum.IntEnum):
+    """A type tag for heap objects."""
+
+    CODE = enum.auto()
+    STRING = enum.auto()
+
+
+class HeapObject(NamedTuple):
+    """A heap object, as reported by 'Heap.objects'."""
+
+    address: int
+    kind: Kind
+    length: int
+    payload: Code | str
+
+    @override
+    def __str__(self):
+        if isinstance(self.payload, Code):
+            what = " ".join([t.what for t in self.payload.tokens])
+        else:
+            what = self.payload
+
+        return f"({self.address} {self.kind.name.lower()} {what})"
+
+
+class KindStats(NamedTuple):
+    """Memory used by the heap objects of a given kind.
+
+    CELLS is the number of addresses the objects take up, and BYTES
+    the memory actually used to store them.
+
+    """
+
+    objects: int
+    cells: int
+    bytes: int
+
+
+class Collection(NamedTuple):
+    """The outcome of a garbage collection.
+
+    OBJECTS and BYTES are what was reclaimed, and SECONDS is how long
+    the collection took.
+
+    """
+
+    objects: int
+    bytes: int
+    seconds: float
+
+    @override
+    def __str__(self):
+        return (
+            f"reclaimed {self.objects} objects ({self.bytes} bytes) "
+            f"in {self.seconds * 1000:.3f} ms"
+        )
+
+
+def literal_addresses(code: Code) -> Generator[int]:
+    """Yield every integer literal found in CODE and its blocks.
+
+    Since user code refers to heap objects by number, any of these
+    could be the address of an object that CODE uses.
+
+    """
+
+    # Blocks can be nested arbitrarily deep, so walk them with an
+    # explicit stack rather than recursing.
+    pending = [code]
+
+    while pending:
+        code = pending.pop()
+
+        for value in code.consts:
+            if isinstance(value, int):
+                yield value
+
+        pending.extend(code.blocks)
+
+
+# The bytes needed to store a single object's header: one entry in
+# each of the ADDRESSES, KINDS, LENGTHS and OFFSETS arrays.
+_HEADER_BYTES = sum(array(typecode).itemsize for typecode in "qBqq")
+
+# The most strings kept in 'Heap.rendered' at once.
+RENDERED_LIMIT = 1024
+
+# Code payloads are shared with the compiled program they came from,
+# so each code object only costs us a reference to it.
+_REFERENCE_BYTES = struct.calcsize("P")
+
+
+@final
+class Heap:
+    """A linear buffer of code and string objects.
+
+    User code sees heap objects only through their numeric addresses.
+    As when each object was stored as a tag token, a length token and
+    then one token per element, an object of length N takes up N + 2
+    addresses, and so objects are found at the same addresses as
+    before.
+
+    Internally though, objects are described by a compact header
+    spread across a few typed arrays: its address, its kind, its
+    length and the offset of its payload. The text of every string is
+    kept in a single UTF-8 buffer, while code objects refer to their
+    compiled Code object directly.
+
+    """
+
+    def __init__(self):
+        # The address at which the next object will be stored.
+        self.size = 0
+
+        self.addresses = array("q")
+        self.kinds = array("B")
+        self.lengths = array("q")
+        self.offsets = array("q")
+
+        self.text = bytearray()
+        self.codes: list[Code] = []
+
+        # Recently stored or read strings, by address, so that
+        # printing the same string over and over doesn't decode it
+        # every time. This only ever holds live strings: it's emptied
+        # whenever the heap is collected.
+        self.rendered: dict[int, str] = {}
+
+    def __len__(self):
+        return self.size
+
+    def _store(self, kind: Kind, length: int, offset: int) -> int:
+        start = self.size
+
+        self.addresses.append(start)
+        self.kinds.append(kind)
+        self.lengths.append(length)
+        self.offsets.append(offset)
+
+        self.size += length + 2
+
+        return start
+
+    def store_code(self, code: Code) -> int:
+        """Store CODE, returning its address."""
+
+        offset = len(self.codes)
+        self.codes.append(code)
+
+        return self._store(Kind.CODE, len(code.tokens), offset)
+
+    def store_string(self, string: str, length: int) -> int:
+        """Store STRING, returning its address.
+
+        LENGTH is the number of tokens STRING was made from.
+
+        """
+
+        offset = len(self.text)
+        self.text += string.encode()
+        self.text += b"\0"
+
+        addr = self._store(Kind.STRING, length, offset)
+        self._render(addr, string)
+
+        return addr
+
+    def _render(self, addr: int, string: str):
+        if len(self.rendered) >= RENDERED_LIMIT:
+            self.rendered.clear()
+
+        self.rendered[addr] = string
+
+    def _find(self, addr: int, kind: Kind) -> int | None:
+        """Return the index of the KIND object found at ADDR."""
+
+        if (i := self._index(addr)) is not None and self.kinds[i] == kind:
+            return i
+
+        return None
+
+    def _index(self, addr: int) -> int | None:
+        """Return the index of the object found at ADDR, if any."""
+
+        i = bisect_left(self.addresses, addr)
+
+        if i < len(self.addresses) and self.addresses[i] == addr:
+            return i
+
+        return None
+
+    def code(self, addr: int) -> Code:
+        """Return the code object stored at ADDR."""
+
+        i = self._find(addr, Kind.CODE)
+
+        if i is None:
+            raise ValueError(f"Illegal call-address: {addr}")
+
+        return self.codes[self.offsets[i]]
+
+    def string(self, addr: int) -> str:
+        """Return the string stored at ADDR."""
+
+        if (string := self.rendered.get(addr)) is not None:
+            return string
+
+        i = self._find(addr, Kind.STRING)
+
+        if i is None:
+            raise ValueError(f"Illegal string-address: {addr}")
+
+        string = self._string(self.offsets[i])
+        self._render(addr, string)
+
+        return string
+
+    def _string(self, offset: int) -> str:
+        end = self.text.index(0, offset)
+
+        return self.text[offset:end].decode()
+
+    def objects(self) -> Generator[HeapObject]:
+        """Yield every object in the heap, in address order."""
+
+        for i, addr in enumerate(self.addresses):
+            kind = Kind(self.kinds[i])
+            offset = self.offsets[i]
+
+            payload = self.codes[offset] if kind == Kind.CODE else self._string(offset)
+
+            yield HeapObject(addr, kind, self.lengths[i], payload)
+
+    def stats(self) -> dict[Kind, KindStats]:
+        """Report how much memory each kind of object is using."""
+
+        objects = dict.fromkeys(Kind, 0)
+        cells = dict.fromkeys(Kind, 0)
+        payload_bytes = dict.fromkeys(Kind, 0)
+
+        for kind, length in zip(self.kinds, self.lengths, strict=True):
+            objects[Kind(kind)] += 1
+            cells[Kind(kind)] += length + 2
+
+        payload_bytes[Kind.CODE] = len(self.codes) * _REFERENCE_BYTES
+        payload_bytes[Kind.STRING] = len(self.text)
+
+        return {
+            kind: KindStats(
+                objects[kind],
+                cells[kind],
+                objects[kind] * _HEADER_BYTES + payload_bytes[kind],
+            )
+            for kind in Kind
+        }
+
+    def collect(
+        self, roots: Iterable[int | float], codes: Iterable[Code]
+    ) -> Collection:
+        """Free every object that can't be reached from ROOTS.
+
+        ROOTS are values which may be addresses of live objects (for
+        example, the values of registers), and CODES are code objects
+        which are still running. Both are treated conservatively: any
+        number that happens to be the address of an object keeps that
+        object alive, as does any integer literal in a live code
+        object.
+
+        Objects never move, so the addresses of surviving objects
+        stay the same. Freed addresses aren't reused either; only the
+        memory backing them is.
+
+        """
+
+        start = time.perf_counter()
+        before = sum(stats.bytes for stats in self.stats().values())
+
+        pending = [*roots]
+
+        for code in codes:
+            pending.extend(literal_addresses(code))
+
+        live: set[int] = set()
+
+        while pending:
+            value = pending.pop()
+
+            if isinstance(value, float) and not value.is_integer():
+                continue
+
+            i = self._index(int(value))
+
+            if i is None or i in live:
+                continue
+
+            live.add(i)
+
+            if self.kinds[i] == Kind.CODE:
+                pending.extend(literal_addresses(self.codes[self.offsets[i]]))
+
+        freed = len(self.addresses) - len(live)
+        self._compact(sorted(live))
+
+        after = sum(stats.bytes for stats in self.stats().values())
+
+        return Collection(freed, before - after, time.perf_counter() - start)
+
+    def _compact(self, live: list[int]):
+        """Keep only the objects at the indices in LIVE."""
+
+        addresses = array("q")
+        kinds = array("B")
+        lengths = array("q")
+        offsets = array("q")
+
+        text = bytearray()
+        codes: list[Code] = []
+
+        for i in live:
+            offset = self.offsets[i]
+
+            if self.kinds[i] == Kind.CODE:
+                offsets.append(len(codes))
+                codes.append(self.codes[offset])
+            else:
+                end = self.text.index(0, offset)
+
+                offsets.append(len(text))
+                text += self.text[offset : end + 1]
+
+            addresses.append(self.addresses[i])
+            kinds.append(self.kinds[i])
+            lengths.append(self.lengths[i])
+
+        self.addresses = addresses
+        self.kinds = kinds
+        self.lengths = lengths
+        self.offsets = offsets
+
+        self.text = text
+        self.codes = codes
+
+        self.rendered = {}
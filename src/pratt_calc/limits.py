@@ -0,0 +1,147 @@
+"""Limits on the resources a single evaluation may use.
+
+A script like '100000000!', or a block which calls itself forever,
+would otherwise tie up the evaluator indefinitely. Limits are checked
+as code runs, and exceeding one raises LimitExceeded.
+
+The checks are kept out of the way of the instructions that run most
+often:
+
+- Steps are counted a whole block body at a time: running a block
+  costs as many steps as it has instructions, charged as the block is
+  entered. Since blocks are straight-line code, this is (give or take
+  a RETURN) the number of instructions actually dispatched.
+
+- The clock is only read every CLOCK_STEPS steps.
+
+- Integer sizes are estimated before '!' and '^' compute anything,
+  and checked whenever an integer is stored in a register or returned
+  from a block. (Code can only build on its own results by way of
+  registers or of blocks returning them, and so can't otherwise grow
+  integers by more than its own length allows.)
+
+"""
+
+import math
+import time
+from typing import NamedTuple, final
+
+from pratt_calc.heap import Heap
+
+# The number of steps run between reads of the clock.
+CLOCK_STEPS = 10_000
+
+
+class Limits(NamedTuple):
+    """Per-evaluation limits. None means no limit.
+
+    STEPS is the number of instructions that may be run, and HEAP the
+    number of heap addresses that may be allocated. (Addresses aren't
+    reused, so garbage collection doesn't give any back.) BITS is the
+    size of the largest integer that may be computed, and SECONDS the
+    time an evaluation may take.
+
+    Note that SECONDS is only checked between steps, so that a single
+    huge '!' or '^' can still overrun it; BITS guards against those.
+
+    """
+
+    steps: int | None = None
+    heap: int | None = None
+    bits: int | None = None
+    seconds: float | None = None
+
+
+class Usage(NamedTuple):
+    """The resources an evaluation has used so far."""
+
+    steps: int
+    heap: int
+    seconds: float
+
+
+_units = {
+    "steps": "steps",
+    "heap": "heap addresses",
+    "bits": "bits per integer",
+    "seconds": "seconds",
+}
+
+
+class LimitExceeded(Exception):
+    """Raised when an evaluation exceeds one of its limits.
+
+    LIMIT names the limit exceeded (one of the fields of Limits), and
+    USAGE holds what had been used up to that point.
+
+    """
+
+    def __init__(self, limit: str, limits: Limits, usage: Usage):
+        super().__init__(
+            f"Exceeded the limit of {getattr(limits, limit)} {_units[limit]}"
+        )
+
+        self.limit: str = limit
+        self.usage: Usage = usage
+
+
+@final
+class Meter:
+    """Measure an evaluation's use of HEAP against LIMITS."""
+
+    def __init__(self, limits: Limits, heap: Heap):
+        self.limits = limits
+        self.heap = heap
+        self.start = time.perf_counter()
+        self.heap_start = heap.size
+
+        # The largest heap size, the largest integer magnitude, and
+        # the largest integer size in bits, allowed.
+        self.heap_ceiling = math.inf if limits.heap is None else heap.size + limits.heap
+        self.int_ceiling = math.inf if limits.bits is None else 1 << limits.bits
+        self.max_bits = math.inf if limits.bits is None else limits.bits
+
+    def usage(self, steps: int) -> Usage:
+        """Return the usage so far, after STEPS steps."""
+
+        return Usage(
+            steps,
+            self.heap.size - self.heap_start,
+            time.perf_counter() - self.start,
+        )
+
+    def exceeded(self, limit: str, steps: int) -> LimitExceeded:
+        """Return the exception for exceeding LIMIT after STEPS steps."""
+
+        return LimitExceeded(limit, self.limits, self.usage(steps))
+
+    def check(self, steps: int) -> float:
+        """Check the step and time limits, after STEPS steps.
+
+        Return the number of steps after which they should next be
+        checked.
+
+        """
+
+        max_steps = self.limits.steps
+        seconds = self.limits.seconds
+
+        if max_steps is not None and steps > max_steps:
+            raise self.exceeded("steps", steps)
+
+        if seconds is None:
+            return math.inf if max_steps is None else max_steps
+
+        if time.perf_counter() - self.start > seconds:
+            raise self.exceeded("seconds", steps)
+
+        if max_steps is None:
+            return steps + CLOCK_STEPS
+
+        return min(max_steps, steps + CLOCK_STEPS)
+
+    def check_bits(self, bits: float, steps: int):
+        """Check that an integer of BITS bits is allowed."""
+
+        if self.limits.bits is not None and bits > self.limits.bits:
+            raise self.exceeded("bits", steps)
@@ -0,0 +1,206 @@
+"""A peephole optimizer for compiled code.
+
+Since compiled code has no jumps, a subexpression built only from
+constants always compiles to a run of PUSH instructions directly
+followed by the instructions combining them. Such runs can be
+computed once, ahead of time, and replaced by a single PUSH of the
+result.
+
+Only rewrites which give bit-for-bit the same results as running the
+original instructions are made. In particular, nothing is
+reassociated: '2 * pi * r' folds '2 * pi', but 'r * 2 * pi' is left
+alone.
+
+Folding '!' and '^' also skips the checks against 'Limits.bits' they
+would get at run time. The largest size these would have been checked
+against is kept as the code's BITS, to be checked instead whenever the
+code is entered.
+
+"""
+
+import math
+from collections.abc import Callable
+
+from pratt_calc.arithmetic import (
+    Number,
+    factorial,
+    factorial_bits,
+    power,
+    power_bits,
+)
+from pratt_calc.compiler import Code, Instr, Opcode
+
+# Limits on what's computed ahead of time, so that compiling stays
+# cheap even when running the code wouldn't be: the largest factorial,
+# and the rough size in bits of the largest integer power.
+FOLD_FACTORIAL_LIMIT = 1000
+FOLD_POWER_BITS = 1 << 16
+
+
+def _costly(op: Opcode, *operands: Number) -> bool:
+    """Whether applying OP to OPERANDS could take a long while."""
+
+    match op, operands:
+        case Opcode.FACT, (value,):
+            return not value <= FOLD_FACTORIAL_LIMIT
+
+        case Opcode.POW, (int() as base, int() as exponent):
+            return base.bit_length() * exponent > FOLD_POWER_BITS
+
+        case _:
+            return False
+
+
+# These must compute exactly what the corresponding cases of
+# 'Evaluator.execute' do.
+_unary: dict[Opcode, Callable[[Number], Number]] = {
+    Opcode.NEG: lambda x: -x,
+    Opcode.SIN: math.sin,
+    Opcode.COS: math.cos,
+    Opcode.TAN: math.tan,
+    Opcode.SEC: lambda x: 1 / math.cos(x),
+    Opcode.CSC: lambda x: 1 / math.sin(x),
+    Opcode.COT: lambda x: 1 / math.tan(x),
+    Opcode.FACT: factorial,
+}
+
+_binary: dict[Opcode, Callable[[Number, Number], Number]] = {
+    Opcode.ADD: lambda x, y: x + y,
+    Opcode.SUB: lambda x, y: x - y,
+    Opcode.MUL: lambda x, y: x * y,
+    Opcode.DIV: lambda x, y: x / y,
+    Opcode.POW: power,
+}
+
+# Binary operations which leave their left operand unchanged when the
+# right operand is the given integer. An integer is needed, since,
+# for example, '3 * 1.0' is 3.0 rather than 3. Note that 'x + 0'
+# isn't here, since '-0.0 + 0' is 0.0.
+_identities = {
+    Opcode.MUL: 1,
+    Opcode.SUB: 0,
+}
+
+
+def optimize(code: Code) -> Code:
+    """Return CODE with constant subexpressions folded.
+
+    CODE's quoted blocks (and theirs, and so on) are optimized too.
+
+    """
+
+    # Blocks are optimized before the code containing them, using an
+    # explicit stack (as in 'compile_block'.)
+    done: list[Code] = []
+    pending = [(code, False)]
+
+    while pending:
+        code, expanded = pending.pop()
+
+        if expanded:
+            count = len(code.blocks)
+            blocks = tuple(done[len(done) - count :])
+            del done[len(done) - count :]
+
+            done.append(_fold(code, blocks))
+        else:
+            pending.append((code, True))
+            pending.extend((block, False) for block in reversed(code.blocks))
+
+    return done[0]
+
+
+def _fold(code: Code, blocks: tuple[Code, ...]) -> Code:
+    """Fold the constant subexpressions of CODE, giving it BLOCKS."""
+
+    # The original constants are all kept, since the garbage collector
+    # treats any integer literal as the potential address of a heap
+    # object (see 'literal_addresses'.)
+    consts = list(code.consts)
+    ops: list[Instr] = []
+    bits = code.bits
+
+    def constant(index: int) -> Number | None:
+        """Return the value pushed by the instruction at INDEX in OPS."""
+
+        if -len(ops) <= index and ops[index].op == Opcode.PUSH:
+            return consts[ops[index].arg]
+
+        return None
+
+    def push(value: Number) -> Instr:
+        consts.append(value)
+
+        return Instr(Opcode.PUSH, len(consts) - 1)
+
+    def cancels(op: Opcode) -> bool:
+        """Whether OP, together with the last instruction in OPS, does nothing."""
+
+        match op:
+            case Opcode.MUL | Opcode.SUB:
+                right = constant(-1)
+
+                return type(right) is int and right == _identities[op]
+
+            case Opcode.NEG:
+                return bool(ops) and ops[-1].op == Opcode.NEG
+
+            case Opcode.POP:
+                # A constant whose value is discarded, such as the '1'
+                # in '1; 2'.
+                return constant(-1) is not None
+
+            case _:
+                return False
+
+    for instr in code.ops:
+        op = instr.op
+
+        if (
+            op in _unary
+            and (value := constant(-1)) is not None
+            and not _costly(op, value)
+        ):
+            # Errors (for example, from '1 / 0') are left to happen at
+            # run time, if at all.
+            try:
+                ops[-1] = push(_unary[op](value))
+            except (ArithmeticError, ValueError):
+                ops.append(instr)
+            else:
+                if op == Opcode.FACT:
+                    bits = max(bits, factorial_bits(value))
+
+        elif (
+            op in _binary
+            and (right := constant(-1)) is not None
+            and (left := constant(-2)) is not None
+            and not _costly(op, left, right)
+        ):
+            try:
+                result = _binary[op](left, right)
+            except (ArithmeticError, ValueError):
+                ops.append(instr)
+            else:
+                del ops[-1]
+                ops[-1] = push(result)
+
+                if op == Opcode.POW:
+                    bits = max(bits, power_bits(left, right))
+
+        elif cancels(op):
+            del ops[-1]
+
+        else:
+            ops.append(instr)
+
+    return Code(
+        tuple(ops),
+        code.tokens,
+        tuple(consts),
+        code.names,
+        blocks,
+        code.strings,
+        code.natives,
+        bits,
+    )
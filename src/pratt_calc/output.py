@@ -0,0 +1,154 @@
+"""Where the output of 'print' goes.
+
+Running code doesn't write to standard output directly: each line
+printed is handed to the evaluator's Output (see 'Evaluator.output'),
+which decides what to do with it.
+
+- BufferedOutput, the default, collects lines and writes them to
+  standard output (or another stream) in one go, rather than a line
+  at a time.
+
+- FileOutput does the same, except that it appends to a file.
+
+- ListOutput keeps the lines, so that embedders can read them back
+  without capturing standard output.
+
+- CallbackOutput hands each line to a function as soon as it's
+  printed.
+
+Buffered lines are written out once THRESHOLD characters have piled
+up, and whenever the output is flushed. Evaluators flush their output
+once 'evaluate', 'evaluate_file' (and so on) are done, even if an
+error was raised; after running code with 'Evaluator.execute', call
+'flush' yourself.
+
+"""
+
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Protocol, TextIO, final
+
+# The number of characters a buffered output holds on to by default.
+THRESHOLD = 1 << 16
+
+
+class Output(Protocol):
+    """Where an evaluator's printed lines go."""
+
+    def write(self, line: str):
+        """Print LINE, which doesn't include a trailing newline."""
+        ...
+
+    def flush(self):
+        """Write out any lines still being held on to."""
+        ...
+
+
+class _Buffered:
+    """Lines waiting to be written out by EMIT, THRESHOLD characters at a time.
+
+    EMIT is given all the lines at once, as a single string. A
+    THRESHOLD of 0 writes every line out as soon as it's printed.
+
+    """
+
+    def __init__(self, emit: Callable[[str], None], threshold: int):
+        if threshold < 0:
+            raise ValueError(f"Threshold can't be negative: {threshold}")
+
+        self.emit: Callable[[str], None] = emit
+        self.threshold: int = threshold
+        self.lines: list[str] = []
+
+        # The number of characters in LINES, newlines included.
+        self.size: int = 0
+
+    def write(self, line: str):
+        self.lines.append(line)
+        self.size += len(line) + 1
+
+        if self.size >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+
+        text = "\n".join(self.lines) + "\n"
+        self.lines = []
+        self.size = 0
+
+        self.emit(text)
+
+
+@final
+class BufferedOutput(_Buffered):
+    """Print to STREAM, buffering lines up to THRESHOLD characters.
+
+    STREAM defaults to whatever 'sys.stdout' is at the time lines are
+    written out, so that redirecting standard output still works.
+
+    """
+
+    def __init__(self, stream: TextIO | None = None, threshold: int = THRESHOLD):
+        super().__init__(self._emit, threshold)
+
+        self.stream = stream
+
+    def _emit(self, text: str):
+        stream: TextIO = self.stream if self.stream is not None else sys.stdout
+
+        _ = stream.write(text)
+        stream.flush()
+
+
+@final
+class FileOutput(_Buffered):
+    """Append to the file at PATH, buffering lines up to THRESHOLD characters.
+
+    The file is only open while lines are being written out.
+
+    """
+
+    def __init__(self, path: Path | str, threshold: int = THRESHOLD):
+        super().__init__(self._emit, threshold)
+
+        self.path = Path(path)
+
+    def _emit(self, text: str):
+        with self.path.open("a", encoding="utf-8") as f:
+            _ = f.write(text)
+
+
+@final
+class ListOutput:
+    """Keep every line printed, in LINES."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def write(self, line: str):
+        self.lines.append(line)
+
+    def flush(self):
+        pass
+
+    def text(self) -> str:
+        """Return the lines printed so far, as they'd have been printed."""
+
+        return "".join([line + "\n" for line in self.lines])
+
+
+@final
+class CallbackOutput:
+    """Pass every line printed to CALLBACK, as soon as it's printed."""
+
+    def __init__(self, callback: Callable[[str], object]):
+        self.callback = callback
+
+    def write(self, line: str):
+        _ = self.callback(line)
+
+    def flush(self):
+        pass
@@ -0,0 +1,125 @@
+"""Evaluate many independent source files at once."""
+
+import glob
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import NamedTuple, override
+
+from pratt_calc.arithmetic import render
+from pratt_calc.diskcache import DiskCache
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.output import ListOutput
+
+
+class FileResult(NamedTuple):
+    """The outcome of evaluating a single source file.
+
+    OUTPUT is whatever the file printed. If evaluation failed, VALUE
+    is None and ERROR describes what went wrong.
+
+    """
+
+    filename: str
+    value: int | float | None
+    output: str
+    error: str | None = None
+
+    @override
+    def __str__(self):
+        if self.value is None:
+            return f"{self.output}{self.filename}: {self.error}"
+
+        return f"{self.output}{render(self.value)}"
+
+
+def evaluate_one(
+    filename: str, stream: bool = False, disk_cache: DiskCache | None = None
+) -> FileResult:
+    """Evaluate FILENAME with a fresh evaluator, capturing its output.
+
+    See 'Evaluator.evaluate_file' for STREAM, and 'Evaluator' for
+    DISK_CACHE.
+
+    """
+
+    output = ListOutput()
+    ev = Evaluator(disk_cache=disk_cache, output=output)
+
+    try:
+        value = ev.evaluate_file(filename, stream)
+    except Exception as e:
+        return FileResult(filename, None, output.text(), str(e))
+
+    return FileResult(filename, value, output.text())
+
+
+def evaluate_files(
+    filenames: Iterable[str],
+    jobs: int | None = None,
+    stream: bool = False,
+    disk_cache: DiskCache | None = None,
+) -> list[FileResult]:
+    """Evaluate each of FILENAMES independently, in a process pool.
+
+    Every file gets an evaluator of its own, so files can't see each
+    other's registers or heap. Results come back in the same order as
+    FILENAMES, regardless of which file finishes first, and an error
+    in one file doesn't prevent the others from being evaluated.
+
+    JOBS is the number of worker processes to use, defaulting to the
+    number of CPUs. With JOBS set to 1, files are evaluated in the
+    current process instead.
+
+    See 'Evaluator.evaluate_file' for STREAM, and 'Evaluator' for
+    DISK_CACHE.
+
+    """
+
+    filenames = list(filenames)
+
+    if jobs is None:
+        jobs = os.process_cpu_count() or 1
+
+    if jobs < 1:
+        raise ValueError(f"Number of jobs must be positive: {jobs}")
+
+    if jobs == 1 or len(filenames) <= 1:
+        return [evaluate_one(filename, stream, disk_cache) for filename in filenames]
+
+    # Hand out files in batches, so that the cost of talking to a
+    # worker is shared among several (typically small) files.
+    chunksize = max(1, len(filenames) // (jobs * 4))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(
+            pool.map(
+                partial(evaluate_one, stream=stream, disk_cache=disk_cache),
+                filenames,
+                chunksize=chunksize,
+            )
+        )
+
+
+def expand(patterns: Iterable[str]) -> list[str]:
+    """Expand any glob patterns found among PATTERNS.
+
+    Matches are sorted, so that the same files always come out in the
+    same order. Patterns without wildcards, and patterns which match
+    nothing, are kept as they are, so that they're reported as
+    missing files later on.
+
+    """
+
+    filenames: list[str] = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+
+        if matches and any(c in pattern for c in "*?["):
+            filenames.extend(matches)
+        else:
+            filenames.append(pattern)
+
+    return filenames
@@ -0,0 +1,259 @@
+"""Find out where an evaluator spends its time.
+
+A Profiler attached to an evaluator (see 'Evaluator.profiler')
+records:
+
+- how often each instruction was run;
+- how often each block was run, and for how long, with blocks run by
+  'call' told apart by heap address;
+- how long was spent tokenizing and compiling source text;
+- how the heap grew over time.
+
+Profiling hooks into the evaluator only where one block is entered
+or left, so that the instructions within a block run as usual. In
+particular, instruction counts aren't kept as instructions run: since
+blocks are straight-line code, they're worked out afterwards from the
+number of times each block was run.
+
+"""
+
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import ClassVar, SupportsIndex, final, override
+
+from pratt_calc.compiler import Code, Opcode
+from pratt_calc.heap import Heap
+from pratt_calc.tokenizer import Type
+
+# The least time between two samples of the heap size, in seconds.
+SAMPLE_SECONDS = 0.001
+
+# How much of a block's source the report shows.
+SOURCE_WIDTH = 40
+
+
+@dataclass
+class BlockStats:
+    """How often a block was run, and the total time spent running it.
+
+    SECONDS doesn't include time spent in the blocks it calls.
+
+    """
+
+    code: Code
+    calls: int = 0
+    seconds: float = 0.0
+
+
+@final
+class Profiler:
+    """Statistics gathered while profiling an evaluator."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+        # Blocks run by 'call', by heap address, and blocks run by
+        # conditionals. Top-level code counts as a block of its own.
+        self.calls: dict[int, BlockStats] = {}
+        self.conditionals: dict[Code, BlockStats] = {}
+        self.toplevel: dict[Code, BlockStats] = {}
+
+        # The number of calls made in tail position, each of which
+        # skips its caller's RETURN.
+        self.tail_calls = 0
+
+        self.tokenizer_seconds = 0.0
+        self.compiler_seconds = 0.0
+
+        # Samples of the heap size, each paired with the time since
+        # profiling started.
+        self.heap_sizes: list[tuple[float, int]] = []
+
+        # The blocks being run, innermost last, and when time was last
+        # charged to the innermost one.
+        self.running: list[BlockStats] = []
+        self.last = self.start
+
+        self.heap: Heap | None = None
+        self.sampled = -SAMPLE_SECONDS
+
+    def compiled(self, tokenizer_seconds: float, compiler_seconds: float):
+        """Record the time taken to tokenize and compile some code."""
+
+        self.tokenizer_seconds += tokenizer_seconds
+        self.compiler_seconds += compiler_seconds
+
+    def run(self, code: Code, heap: Heap) -> int:
+        """Start running top-level CODE, against HEAP.
+
+        Return the depth to pass to 'finish' once CODE is done.
+
+        """
+
+        depth = len(self.running)
+        stats = self.toplevel.setdefault(code, BlockStats(code))
+        stats.calls += 1
+
+        self.heap = heap
+        self._charge(stats, False)
+        self._sample(self.last)
+
+        return depth
+
+    def enter(self, code: Code, address: int | None, tail: bool):
+        """Start running the block CODE.
+
+        ADDRESS is the heap address of a block run by 'call', and None
+        for a block run by a conditional. TAIL says whether the block
+        takes the place of the block running now.
+
+        """
+
+        if address is None:
+            stats = self.conditionals.setdefault(code, BlockStats(code))
+        else:
+            stats = self.calls.get(address)
+
+            # Addresses start over when the evaluator is reset.
+            if stats is None or stats.code is not code:
+                stats = self.calls[address] = BlockStats(code)
+
+        stats.calls += 1
+        self.tail_calls += tail
+
+        self._charge(stats, tail)
+
+        if self.last - self.sampled >= SAMPLE_SECONDS:
+            self._sample(self.last)
+
+    def leave(self):
+        """Stop running the innermost block."""
+
+        self._charge(None, True)
+
+    def finish(self, depth: int):
+        """Stop running top-level code, begun when DEPTH blocks were running."""
+
+        self._charge(None, True)
+        del self.running[depth:]
+
+        self._sample(self.last)
+
+    def _charge(self, stats: BlockStats | None, replace: bool):
+        """Charge the time so far to the innermost block.
+
+        STATS, if given, then becomes the innermost block, either in
+        place of the current one (if REPLACE is set) or on top of it.
+        Otherwise, with REPLACE set, the innermost block is done.
+
+        """
+
+        now = time.perf_counter()
+
+        if self.running:
+            self.running[-1].seconds += now - self.last
+
+            if replace:
+                _ = self.running.pop()
+
+        if stats is not None:
+            self.running.append(stats)
+
+        self.last = now
+
+    def _sample(self, now: float):
+        if self.heap is not None:
+            self.heap_sizes.append((now - self.start, self.heap.size))
+            self.sampled = now
+
+    def op_counts(self) -> Counter[Opcode]:
+        """Return the number of times each instruction was run.
+
+        The counts for code which raised an error partway through are
+        too high, since such code is counted as having run to the end.
+
+        """
+
+        counts: Counter[Opcode] = Counter()
+
+        for table in (self.toplevel, self.calls, self.conditionals):
+            for stats in table.values():
+                for instr in stats.code.ops:
+                    counts[instr.op] += stats.calls
+
+        counts[Opcode.RETURN] -= self.tail_calls
+
+        return counts
+
+    def blocks(self) -> list[tuple[str, BlockStats]]:
+        """Return every block run, with a label, slowest first.
+
+        Blocks run by 'call' are labelled with their heap address.
+
+        """
+
+        labelled = [
+            *((f"@{address}", stats) for address, stats in self.calls.items()),
+            *(("cond", stats) for stats in self.conditionals.values()),
+            *(("top", stats) for stats in self.toplevel.values()),
+        ]
+
+        return sorted(labelled, key=lambda pair: pair[1].seconds, reverse=True)
+
+    def report(self) -> str:
+        """Summarize the profile as a table, busiest entries first."""
+
+        lines = [
+            f"tokenizing: {self.tokenizer_seconds * 1000:.3f} ms",
+            f"compiling:  {self.compiler_seconds * 1000:.3f} ms",
+        ]
+
+        if self.heap_sizes:
+            (first, start), (last, end) = self.heap_sizes[0], self.heap_sizes[-1]
+            ms = (last - first) * 1000
+            lines.append(f"heap:       {start} -> {end} addresses in {ms:.3f} ms")
+
+        lines += ["", f"{'instruction':<12}{'count':>12}"]
+
+        for op, count in self.op_counts().most_common():
+            lines.append(f"{op.name:<12}{count:>12}")
+
+        lines += ["", f"{'block':<12}{'calls':>12}{'ms':>12}  source"]
+
+        for label, stats in self.blocks():
+            source = " ".join([t.what for t in stats.code.tokens if t.tag != Type.EOF])
+
+            if len(source) > SOURCE_WIDTH:
+                source = source[: SOURCE_WIDTH - 3] + "..."
+
+            lines.append(
+                f"{label:<12}{stats.calls:>12}{stats.seconds * 1000:>12.3f}  {source}"
+            )
+
+        return "\n".join(lines)
+
+
+@final
+class Frames[T](list[T]):
+    """A stack of frames which tells PROFILER whenever one is popped.
+
+    When profiling, this stands in for the evaluator's plain list of
+    frames, so that blocks returning are noticed without the
+    evaluator having to check for a profiler on every RETURN.
+
+    """
+
+    # Like any list, a stack of frames is unhashable.
+    __hash__: ClassVar[None] = None
+
+    def __init__(self, profiler: Profiler):
+        super().__init__()
+
+        self.profiler = profiler
+
+    @override
+    def pop(self, index: SupportsIndex = -1) -> T:
+        self.profiler.leave()
+
+        return super().pop(index)
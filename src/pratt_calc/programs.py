@@ -0,0 +1,122 @@
+"""Compiled code, shared between evaluators.
+
+A Code object holds nothing that running it changes: registers, the
+heap and everything else a running program touches belong to an
+Evaluator. One Code object can therefore be run by any number of
+evaluators at once, including from different threads.
+
+A Programs object is a cache of compiled code which evaluators can
+share, so that an evaluator made for a single thread or request
+still finds everything the others have compiled already:
+
+    programs = Programs()
+
+    def handle(raw_expression):
+        return Evaluator(programs=programs).evaluate(raw_expression)
+
+Evaluators are cheap to make, but aren't themselves thread-safe: each
+should only be used by one thread at a time.
+
+"""
+
+import threading
+import time
+from typing import final
+
+from pratt_calc.cache import LRUCache
+from pratt_calc.compiler import Code, compile_block, registry
+from pratt_calc.diskcache import DiskCache
+from pratt_calc.optimizer import optimize as optimize_code
+from pratt_calc.profiler import Profiler
+from pratt_calc.tokenizer import scan
+
+
+@final
+class Programs:
+    """A thread-safe cache of compiled code, keyed by source text.
+
+    CACHE_SIZE is the number of compiled expressions to keep around;
+    0 disables the cache.
+
+    OPTIMIZE says whether compiled code is passed through the peephole
+    optimizer (see 'pratt_calc.optimizer'.)
+
+    DISK_CACHE, if given, is where the compiled form of files is kept
+    between runs (see 'pratt_calc.diskcache'.)
+
+    Registering operators or functions (see 'Registry' in
+    'pratt_calc.compiler') changes what source text compiles to, and
+    so empties the cache.
+
+    """
+
+    def __init__(
+        self,
+        cache_size: int = 256,
+        optimize: bool = True,
+        disk_cache: DiskCache | None = None,
+    ):
+        self.cache: LRUCache[str, Code] = LRUCache(cache_size)
+        self.optimize = optimize
+        self.disk_cache = disk_cache
+
+        # Guards the cache. Compiling happens outside of it, so that
+        # threads can compile different code at the same time; two
+        # threads compiling the same code just do so twice.
+        self.lock = threading.Lock()
+
+        # The registry's generation when the cache was last emptied.
+        self.generation = registry.generation
+
+    def compile(
+        self,
+        raw_expression: str,
+        persist: bool = False,
+        profiler: Profiler | None = None,
+    ) -> Code:
+        """Compile RAW_EXPRESSION, reusing a cached result if possible.
+
+        With PERSIST set, the disk cache (if there is one) is used as
+        well. Time spent compiling is recorded in PROFILER, if given.
+
+        """
+
+        generation = registry.generation
+
+        with self.lock:
+            if self.generation != generation:
+                self.cache.clear()
+                self.generation = generation
+
+            code = self.cache.get(raw_expression)
+
+        if code is not None:
+            return code
+
+        disk_cache = self.disk_cache if persist else None
+
+        if disk_cache is not None:
+            code = disk_cache.load(raw_expression, self.optimize)
+
+        if code is None:
+            start = time.perf_counter() if profiler is not None else 0
+            tokens = scan(raw_expression)
+            scanned = time.perf_counter() if profiler is not None else 0
+            code = compile_block(tokens)
+
+            if self.optimize:
+                code = optimize_code(code)
+
+            if profiler is not None:
+                profiler.compiled(scanned - start, time.perf_counter() - scanned)
+
+            if disk_cache is not None:
+                disk_cache.store(raw_expression, self.optimize, code)
+
+        with self.lock:
+            # Code compiled against a registry which has since changed
+            # isn't kept.
+            if self.generation == registry.generation == generation:
+                self.cache.put(raw_expression, code)
+
+        return code
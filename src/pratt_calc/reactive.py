@@ -0,0 +1,188 @@
+"""Keep registers up to date as the registers they depend on change.
+
+A script like
+
+    total <- price * qty; tax <- total * rate
+
+is a small model: change 'price', and both 'total' and 'tax' need
+recomputing, but nothing else does. A Model remembers each top-level
+assignment it evaluates, along with the registers its right-hand side
+read, so that 'Model.set' can rerun just the assignments affected by
+a change.
+
+"""
+
+from collections import defaultdict
+from graphlib import TopologicalSorter
+from typing import NamedTuple, final
+
+from pratt_calc.compiler import Code
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.tokenizer import Op, Type, scan, statements
+
+
+class Formula(NamedTuple):
+    """A top-level assignment, as last run.
+
+    READS holds the addresses of the registers its right-hand side
+    read, other than the register being assigned.
+
+    """
+
+    code: Code
+    reads: frozenset[int]
+
+
+class Update(NamedTuple):
+    """The outcome of 'Model.set'.
+
+    RECOMPUTED lists the registers whose assignments were rerun, in
+    the order they were rerun in, and SKIPPED is the number of
+    assignments which didn't need to be.
+
+    """
+
+    recomputed: tuple[str, ...]
+    skipped: int
+
+
+@final
+class Model:
+    """An evaluator which tracks the dependencies between registers.
+
+    Only assignments at the top level of a script (such as the two in
+    'total <- price * qty; tax <- total * rate') are tracked. Other
+    statements, including assignments inside blocks, are evaluated
+    as usual but aren't remembered.
+
+    """
+
+    def __init__(self, ev: Evaluator | None = None):
+        """Initialize the model, evaluating with EV if given."""
+
+        self.ev = ev if ev is not None else Evaluator()
+
+        # The most recent assignment to each register, by address, in
+        # the order they were made.
+        self.formulas: dict[int, Formula] = {}
+
+        # For each register, the registers whose formulas read it.
+        self.dependents: defaultdict[int, set[int]] = defaultdict(set)
+
+    def evaluate(self, raw_expression: str) -> int | float:
+        """Evaluate RAW_EXPRESSION, recording its assignments.
+
+        The result is the same as that of 'Evaluator.evaluate', except
+        that (as with 'Evaluator.evaluate_stream') statements preceding
+        a syntax error will already have been run.
+
+        """
+
+        value: int | float = 0
+
+        for statement in statements(scan(raw_expression)):
+            match statement:
+                case [target, assign, *rhs] if (
+                    target.tag == Type.IDENTIFIER and assign == Op.assign
+                ):
+                    rindex = self.ev.dealias(target.what)
+                    rhs_code = self.ev.compile(" ".join([t.what for t in rhs]))
+
+                    # A new assignment goes to the back of the queue.
+                    self.forget(rindex)
+                    value = self.assign(rindex, rhs_code)
+
+                case _:
+                    value = self.ev.evaluate(" ".join([t.what for t in statement]))
+
+        return value
+
+    def assign(self, rindex: int, code: Code) -> int | float:
+        """Assign the result of running CODE to register RINDEX.
+
+        CODE becomes RINDEX's formula, replacing any earlier one.
+
+        """
+
+        reads: set[int] = set()
+
+        try:
+            value = self.ev.execute(code, reads)
+        finally:
+            self.ev.output.flush()
+
+        self.ev.registers[rindex].value = value
+
+        # A formula like 'x <- x + 1' reads the register's previous
+        # value, rather than depending on itself.
+        reads.discard(rindex)
+
+        # Rerunning a formula keeps its place in FORMULAS.
+        if (old := self.formulas.get(rindex)) is not None:
+            for read in old.reads:
+                self.dependents[read].discard(rindex)
+
+        self.formulas[rindex] = Formula(code, frozenset(reads))
+
+        for read in reads:
+            self.dependents[read].add(rindex)
+
+        return value
+
+    def forget(self, rindex: int):
+        """Stop tracking register RINDEX's formula, if it has one."""
+
+        formula = self.formulas.pop(rindex, None)
+
+        if formula is not None:
+            for read in formula.reads:
+                self.dependents[read].discard(rindex)
+
+    def get(self, name: str) -> int | float:
+        """Return the value of the register NAME."""
+
+        return self.ev.registers[self.ev.dealias(name)].value
+
+    def set(self, name: str, value: int | float) -> Update:
+        """Set the register NAME to VALUE, updating its dependents.
+
+        Every formula which (directly or not) depends on NAME is
+        rerun, each after the formulas it depends on. NAME becomes an
+        input: any formula of its own is forgotten.
+
+        Raises ValueError if the affected formulas depend on each
+        other in a cycle.
+
+        """
+
+        rindex = self.ev.dealias(name)
+        self.ev.registers[rindex].value = value
+        self.forget(rindex)
+
+        affected: set[int] = set()
+        pending = [rindex]
+
+        while pending:
+            for dependent in self.dependents[pending.pop()]:
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+
+        # Keep the order in which formulas were defined, so that
+        # formulas which don't depend on each other are rerun in the
+        # order they'd run in the script.
+        graph = {
+            target: formula.reads & affected
+            for target, formula in self.formulas.items()
+            if target in affected
+        }
+
+        order = list(TopologicalSorter(graph).static_order())
+
+        for target in order:
+            _ = self.assign(target, self.formulas[target].code)
+
+        return Update(
+            tuple(self.ev.registers[target].alias for target in order),
+            len(self.formulas) - len(order),
+        )
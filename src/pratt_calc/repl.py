@@ -1,7 +1,9 @@
 import cmd
 from typing import final, override
 
+from pratt_calc.arithmetic import render
 from pratt_calc.evaluator import Evaluator
+from pratt_calc.profiler import Profiler
 
 
 @final
@@ -24,7 +26,7 @@ Type 'help' or '?' to list all commands."""
     def default(self, line: str):
         """Read, evaluate and print the provided expression."""
 
-        print(self.ev.evaluate(line))
+        print(render(self.ev.evaluate(line)))
 
     @override
     def precmd(self, line: str):
@@ -44,9 +46,38 @@ Type 'help' or '?' to list all commands."""
     def do_heap(self, _):
         """Print the current heap."""
 
-        print([str(t) for t in self.ev.heap])
+        print([str(obj) for obj in self.ev.heap.objects()])
+
+    def do_gc(self, _):
+        """Garbage-collect the heap, reporting what was reclaimed."""
+
+        print(self.ev.collect())
 
     def do_locals(self, _):
         """Print all locals."""
 
         print([str(r) for r in self.ev.registers])
+
+    def do_profile(self, arg: str):
+        """Print a profile of evaluations so far.
+
+        Use 'profile on' to start profiling (afresh), and 'profile off'
+        to stop.
+
+        """
+
+        match arg:
+            case "on":
+                self.ev.profiler = Profiler()
+
+            case "off":
+                self.ev.profiler = None
+
+            case "" if self.ev.profiler is not None:
+                print(self.ev.profiler.report())
+
+            case "":
+                print("Profiling is off; use 'profile on' to start.")
+
+            case _:
+                print(f"Unknown argument: '{arg}'")
@@ -0,0 +1,449 @@
+"""A local evaluation server.
+
+Clients connect over TCP or a Unix socket, and send requests as lines
+of JSON, such as
+
+    {"id": 1, "expr": "x <- 3; x * 2"}
+
+Each request gets back a line of JSON once it's been evaluated:
+
+    {"id": 1, "value": 6, "output": "", "error": null}
+
+Integers too long for Python's 'json' module to write out (see
+'sys.set_int_max_str_digits') are sent as strings of digits instead.
+A request which can't be answered for any other reason still gets a
+reply, with just its ID and an error.
+
+Requests may be pipelined: a client doesn't have to wait for one
+reply before sending the next request. Replies are sent as soon as
+they're ready, which may not be the order the requests were sent in,
+and so each reply carries the ID of its request.
+
+Every request is evaluated from scratch, with no registers or heap
+objects left over from earlier requests. The evaluators doing the
+work live in a pool of worker processes, and are reused from one
+request to the next, so that compiled code stays cached.
+
+A '{"op": "stats"}' request returns latency percentiles and
+throughput instead.
+
+"""
+
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import statistics
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import NamedTuple, cast, final
+
+from pratt_calc.arithmetic import render
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.output import ListOutput
+
+# Worker processes are started afresh rather than forked, since the
+# server runs threads (see 'Pool.evaluate'.)
+_context = multiprocessing.get_context("spawn")
+
+
+class Outcome(NamedTuple):
+    """The outcome of a single evaluation, as sent back by a worker.
+
+    OUTPUT is whatever the evaluation printed. If evaluation failed,
+    VALUE is None and ERROR describes what went wrong.
+
+    """
+
+    value: int | float | None
+    output: str
+    error: str | None = None
+
+
+def _work(conn: Connection):
+    """Evaluate expressions arriving over CONN, until it's closed."""
+
+    # Ctrl+C reaches the workers too, but it's up to the server to
+    # shut them down.
+    _ = signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    ev = Evaluator()
+
+    while True:
+        try:
+            raw_expression = cast(str, conn.recv())
+        except EOFError:
+            return
+
+        ev.reset()
+        output = ev.output = ListOutput()
+
+        try:
+            value = ev.evaluate(raw_expression)
+        except Exception as e:
+            conn.send(Outcome(None, output.text(), str(e)))
+        else:
+            conn.send(Outcome(value, output.text()))
+
+
+@final
+class Worker:
+    """A process with an evaluator of its own."""
+
+    def __init__(self):
+        self.conn, child = _context.Pipe()
+        self.process = _context.Process(target=_work, args=(child,), daemon=True)
+        self.process.start()
+
+        child.close()
+
+    def evaluate(self, raw_expression: str) -> Outcome:
+        """Evaluate RAW_EXPRESSION, blocking until it's done."""
+
+        self.conn.send(raw_expression)
+
+        return cast(Outcome, self.conn.recv())
+
+    def close(self):
+        """Stop the worker, giving it a moment to finish what it's doing."""
+
+        self.conn.close()
+        self.process.join(1)
+
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        """Stop the worker right away."""
+
+        self.process.kill()
+        self.process.join()
+
+
+@final
+class Pool:
+    """A fixed number of worker processes."""
+
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError(f"Need at least one worker, not {workers}")
+
+        self.workers = [Worker() for _ in range(workers)]
+        self.idle: asyncio.Queue[Worker] = asyncio.Queue()
+
+        # Workers being replaced, which aren't idle until they're
+        # started.
+        self.replacing: set[asyncio.Task[Worker]] = set()
+
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+
+    async def evaluate(self, raw_expression: str, timeout: float | None) -> Outcome:
+        """Evaluate RAW_EXPRESSION on the next idle worker.
+
+        Raises TimeoutError if that takes longer than TIMEOUT seconds.
+
+        """
+
+        worker = await self.idle.get()
+
+        try:
+            # Waiting for the worker blocks, so do it in a thread.
+            outcome = await asyncio.wait_for(
+                asyncio.to_thread(worker.evaluate, raw_expression), timeout
+            )
+        except BaseException:
+            # There's no telling what state the worker has been left
+            # in (it may still be busy, or gone), so replace it.
+            self.replace(worker)
+
+            raise
+
+        self.idle.put_nowait(worker)
+
+        return outcome
+
+    def replace(self, worker: Worker):
+        """Replace WORKER with a fresh one, which becomes idle once started.
+
+        Stopping and starting processes blocks, so it's done in a
+        thread.
+
+        """
+
+        def replaced(task: asyncio.Task[Worker]):
+            self.replacing.discard(task)
+            self.workers.remove(worker)
+
+            if not task.cancelled() and task.exception() is None:
+                self.workers.append(task.result())
+                self.idle.put_nowait(task.result())
+
+        def restart() -> Worker:
+            worker.kill()
+
+            return Worker()
+
+        task = asyncio.create_task(asyncio.to_thread(restart))
+        task.add_done_callback(replaced)
+        self.replacing.add(task)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+@final
+class Stats:
+    """Running statistics on the requests served so far.
+
+    Latencies and throughput are worked out from the most recent
+    WINDOW requests only.
+
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.finished: deque[float] = deque(maxlen=window)
+
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.pending = 0
+
+    def record(self, start: float, outcome: Outcome | None):
+        """Record a request which started at START, ending in OUTCOME.
+
+        START is a 'time.perf_counter' reading. An OUTCOME of None
+        means the request timed out.
+
+        """
+
+        now = time.perf_counter()
+
+        self.latencies.append(now - start)
+        self.finished.append(now)
+        self.completed += 1
+
+        if outcome is None:
+            self.timeouts += 1
+        elif outcome.error is not None:
+            self.errors += 1
+
+    def report(self) -> dict[str, float]:
+        """Summarize the statistics, with latencies in milliseconds.
+
+        Throughput is in requests per second.
+
+        """
+
+        report: dict[str, float] = {
+            "completed": self.completed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "pending": self.pending,
+        }
+
+        if len(self.latencies) >= 2:
+            cuts = statistics.quantiles(self.latencies, n=100)
+
+            for p in (50, 90, 99):
+                report[f"p{p}"] = cuts[p - 1] * 1000
+
+            # Measured from when the earliest of these requests
+            # started, to when the latest finished.
+            elapsed = self.finished[-1] - (self.finished[0] - self.latencies[0])
+            report["throughput"] = len(self.finished) / elapsed
+
+        return report
+
+
+@final
+class Server:
+    """Serve evaluation requests, using a pool of worker processes.
+
+    WORKERS is the number of worker processes, defaulting to the
+    number of CPUs. Evaluations taking longer than TIMEOUT seconds
+    are abandoned (and their worker replaced.)
+
+    At most MAX_PENDING requests are handled at any one time. Beyond
+    that, no more requests are read until some finish, so that
+    clients sending requests faster than they can be served are
+    slowed down instead of piling up requests in memory.
+
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        timeout: float | None = 10.0,
+        max_pending: int = 64,
+    ):
+        self.pool = Pool(workers or os.process_cpu_count() or 1)
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(max_pending)
+        self.stats = Stats()
+
+    async def start(self, address: str) -> asyncio.Server:
+        """Start listening on ADDRESS.
+
+        ADDRESS is either 'HOST:PORT', or 'unix:PATH' for a Unix
+        socket.
+
+        """
+
+        if address.startswith("unix:"):
+            return await asyncio.start_unix_server(self.handle, address[5:])
+
+        host, _, port = address.rpartition(":")
+
+        return await asyncio.start_server(self.handle, host or None, int(port))
+
+    def close(self):
+        self.pool.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of a single client."""
+
+        lock = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+
+        try:
+            while line := await reader.readline():
+                _ = await self.slots.acquire()
+
+                task = asyncio.create_task(self.respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            _ = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                _ = task.cancel()
+
+            writer.close()
+
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def respond(
+        self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock
+    ):
+        """Answer the request in LINE, writing the reply to WRITER."""
+
+        try:
+            try:
+                request = cast(object, json.loads(line))
+            except ValueError:
+                request = None
+
+            match request:
+                case {"id": str() | int() as ident}:
+                    pass
+                case _:
+                    ident = None
+
+            try:
+                data = _encode(await self.reply(request, ident))
+            except Exception as e:
+                data = _encode({"id": ident, "error": str(e) or type(e).__name__})
+
+            async with lock:
+                writer.write(data)
+                await writer.drain()
+        finally:
+            self.slots.release()
+
+    async def reply(
+        self, request: object, ident: str | int | None
+    ) -> dict[str, object]:
+        """Return the reply to REQUEST, whose ID is IDENT.
+
+        REQUEST is None if it wasn't valid JSON.
+
+        """
+
+        match request:
+            case None:
+                return {"id": None, "error": "Malformed request"}
+
+            case {"op": "stats"}:
+                return {"id": ident, **self.stats.report()}
+
+            case {"expr": str() as raw_expression}:
+                outcome = await self.evaluate(raw_expression)
+
+                if outcome is None:
+                    return {"id": ident, "error": f"Timed out after {self.timeout} s"}
+
+                return {"id": ident, **outcome._asdict()}
+
+            case _:
+                return {"id": ident, "error": "Unknown request"}
+
+    async def evaluate(self, raw_expression: str) -> Outcome | None:
+        """Evaluate RAW_EXPRESSION, returning None if it timed out."""
+
+        self.stats.pending += 1
+        start = time.perf_counter()
+        outcome = None
+
+        try:
+            outcome = await self.pool.evaluate(raw_expression, self.timeout)
+        except TimeoutError:
+            pass
+        except Exception as e:
+            # For example, the worker died.
+            outcome = Outcome(None, "", f"Worker failed: {str(e) or type(e).__name__}")
+        finally:
+            self.stats.pending -= 1
+
+        self.stats.record(start, outcome)
+
+        return outcome
+
+
+def _encode(reply: dict[str, object]) -> bytes:
+    """Return REPLY as a line of JSON."""
+
+    if type(value := reply.get("value")) is int:
+        try:
+            _ = str(value)
+        except ValueError:
+            reply = {**reply, "value": render(value)}
+
+    return json.dumps(reply).encode() + b"\n"
+
+
+def serve(
+    address: str,
+    workers: int | None = None,
+    timeout: float | None = 10.0,
+    max_pending: int = 64,
+):
+    """Serve requests on ADDRESS until interrupted.
+
+    See 'Server' for the other arguments. Statistics are printed to
+    stderr on the way out.
+
+    """
+
+    async def main():
+        server = Server(workers, timeout, max_pending)
+
+        try:
+            listener = await server.start(address)
+            print(f"Serving on {address}", file=sys.stderr)
+
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            server.close()
+            print(json.dumps(server.stats.report()), file=sys.stderr)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main())
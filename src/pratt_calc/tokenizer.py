@@ -1,11 +1,11 @@
 import enum
 import re
-from collections.abc import Callable, Generator
-from functools import wraps
+from bisect import bisect_right
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
 from types import SimpleNamespace
-from typing import NamedTuple, final, override
+from typing import NamedTuple, final, overload, override
 
-from more_itertools import peekable
+from more_itertools import consume
 
 
 class Type(enum.Enum):
@@ -16,7 +16,6 @@ class Type(enum.Enum):
     OPERATOR = enum.auto()
     IDENTIFIER = enum.auto()
     ERROR = enum.auto()
-    HEAP = enum.auto()
     EOF = enum.auto()
 
 
@@ -65,44 +64,136 @@ class Op(SimpleNamespace):
     call = Token(Type.OPERATOR, "call")
     string = Token(Type.OPERATOR, '"')
     strcast = Token(Type.OPERATOR, "str")
+    comma = Token(Type.OPERATOR, ",")
 
 
-@final
-class Internal(SimpleNamespace):
-    """Tokens used to distinguish various kinds of data that live
-    inside the heap.
+# The operators 'scan' recognizes, by spelling. Rather than building a
+# new token each time one is found, the same token is reused.
+#
+# This starts out empty: every operator is put here by the compiler as
+# it's registered (see 'pratt_calc.compiler.Registry'.)
+_operators: dict[str, Token] = {}
+
+# Operators which are only recognized as whole words. Otherwise, an
+# identifier starting with an operator's spelling is split in two, so
+# that 'sinx' scans as 'sin x'.
+_words: set[str] = set()
+
+# What 'statements' makes of operators, by spelling: True for those
+# which take an operand in the position they're registered for (such
+# as '+' or 'sin'), and False for those which end one (such as '!' or
+# 'pi').
+_operands: dict[str, bool] = {}
+
+
+def _build_pattern() -> re.Pattern[str]:
+    """Build the pattern source text is scanned with.
+
+    Comments and runs of spaces are matched without a capturing group,
+    and so are skipped. Every other alternative captures its own
+    group, telling 'scan' which kind of token it found.
+
+    A run of newlines (along with any comments between them) stands in
+    for a single semicolon. This frees the programmer from having to
+    use semicolons explicitly if two statements are separated by a
+    newline. :)
+
+    Operators are tried longest first, so that no operator is cut
+    short by another which happens to be a prefix of it.
+
+    """
+
+    symbols = [what for what in _operators if len(what) == 1 and not what.isalnum()]
+    spellings = sorted(
+        (what for what in _operators if what not in symbols), key=len, reverse=True
+    )
+
+    alternatives = [
+        re.escape(what) + (r"\b" if what in _words else "") for what in spellings
+    ]
+
+    if symbols:
+        alternatives.append(f"[{''.join(map(re.escape, sorted(symbols)))}]")
 
-    User code is not allowed to produce these tokens.
+    operators = "|".join(alternatives) or "(?!)"
+
+    return re.compile(
+        rf"""
+        /\*.*?\*/
+        | [ \t]+
+        | (\n(?:(?>/\*.*?\*/)*\n)*)
+        | (\d+\.\d*)
+        | (\d+)
+        | ({operators})
+        | ([a-zA-Z_]\w*)
+        | (.)
+        """,
+        re.DOTALL | re.VERBOSE,
+    )
+
+
+_pattern = _build_pattern()
+
+
+def define(token: Token, word: bool = False, operand: bool | None = None) -> Token:
+    """Make 'scan' recognize the operator TOKEN, returning it.
+
+    With WORD set, TOKEN is only recognized as a whole word (see
+    '_words'.) Unless OPERAND is None, it says whether TOKEN takes an
+    operand or ends one (see '_operands'.) Defining an operator which
+    is already defined returns the existing token.
 
     """
 
-    code = Token(Type.HEAP, "code")
-    string = Token(Type.HEAP, "string")
+    global _pattern
+
+    if operand is not None:
+        _operands[token.what] = operand
 
+    if (existing := _operators.get(token.what)) is not None:
+        return existing
 
-# See docstring for 'tokenize'.
-type Stream = peekable[Token]
-type tokenizer = Callable[[str], Generator[Token]]
+    _operators[token.what] = token
 
+    if word:
+        _words.add(token.what)
+
+    _pattern = _build_pattern()
+
+    return token
+
+
+def snapshot() -> Callable[[], None]:
+    """Note which operators are defined, returning a function to restore them.
+
+    Calling the function forgets every operator defined since, as
+    tests registering operators of their own do once they're done.
+
+    """
 
-def _stream(fn: tokenizer) -> Callable[[str], Stream]:
-    """Convert the tokenizer's generator into a peekable."""
+    operators = dict(_operators)
+    words = set(_words)
+    operands = dict(_operands)
+    pattern = _pattern
 
-    @wraps(fn)
-    def wrapper(raw_expression: str) -> Stream:
-        gen = fn(raw_expression)
+    def restore():
+        global _pattern
 
-        return peekable(gen)
+        _operators.clear()
+        _operators.update(operators)
+        _words.clear()
+        _words.update(words)
+        _operands.clear()
+        _operands.update(operands)
+        _pattern = pattern
 
-    return wrapper
+    return restore
 
 
-@_stream
-def tokenize(raw_expression: str) -> Generator[Token]:
-    """Tokenize RAW_EXPRESSION.
+def scan(raw_expression: str) -> list[Token]:
+    """Tokenize RAW_EXPRESSION, returning a list of tokens.
 
-    Integers are yielded as Python ints; everything else is yielded as
-    its original string representation.
+    The list always ends with an 'eof' token.
 
     Inspiration taken from
 
@@ -110,52 +201,332 @@ def tokenize(raw_expression: str) -> Generator[Token]:
 
     """
 
-    # First remove comments from source text.
-    raw_expression = re.sub(r"/\*.*?\*/", "", raw_expression, flags=re.DOTALL)
-
-    # Next, replace newlines with semicolons. This frees the
-    # programmer from having to use semicolons explicitly if two
-    # statements are separated by a newline. :)
-    raw_expression = re.sub(r"\n+", ";", raw_expression)
-
-    token_specification = [
-        ("NUMBER", r"\d+(\.\d*)?"),
-        (
-            "OPERATOR",
-            r"pi|sin|cos|tan|sec|csc|cot|print|call|str|<-|[-+*/!()^;{}\"]",
-        ),
-        ("IDENTIFIER", r"[a-zA-Z_][\w]*"),
-        ("SKIP", r"[ \t]+"),
-        ("ERROR", r"."),
-    ]
+    tokens: list[Token] = []
+    append = tokens.append
+
+    matches: list[tuple[str, str, str, str, str, str]] = _pattern.findall(
+        raw_expression
+    )
+
+    for newline, floating, integer, operator, identifier, error in matches:
+        if operator:
+            append(_operators[operator])
+        elif identifier:
+            append(Token(Type.IDENTIFIER, identifier))
+        elif integer:
+            append(Token(Type.INT, integer))
+        elif floating:
+            append(Token(Type.FLOAT, floating))
+        elif newline:
+            append(Op.semicolon)
+        elif error:
+            raise ValueError(f"Bad token: '{error}'")
+
+    append(Op.eof)
+
+    return tokens
+
+
+def match_braces(tokens: Sequence[Token]) -> dict[int, int]:
+    """Map the position of each '{' in TOKENS to that of its '}'.
+
+    Unmatched braces are left out. This lets a quoted block be skipped
+    over in one go, rather than a token at a time.
+
+    """
+
+    matches: dict[int, int] = {}
+    opened: list[int] = []
+
+    for i, t in enumerate(tokens):
+        if t == Op.quote:
+            opened.append(i)
+        elif t == Op.endquote and opened:
+            matches[opened.pop()] = i
+
+    return matches
+
+
+@final
+class Span(Sequence[Token]):
+    """The tokens TOKENS[START:STOP], without copying them."""
+
+    __slots__ = ("start", "stop", "tokens")
+
+    def __init__(
+        self, tokens: Sequence[Token], start: int = 0, stop: int | None = None
+    ):
+        self.tokens = tokens
+        self.start = start
+        self.stop = len(tokens) if stop is None else stop
+
+    @override
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Token]: ...
+
+    @override
+    def __getitem__(self, index: int | slice) -> Token | Sequence[Token]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+
+            return Span(self.tokens, self.start + start, self.start + max(start, stop))
+
+        if not -len(self) <= index < len(self):
+            raise IndexError("Span index out of range")
 
-    token_regex = "|".join(f"(?P<{pair[0]}>{pair[1]})" for pair in token_specification)
-    pattern = re.compile(token_regex)
+        return self.tokens[self.start + index % len(self)]
 
-    for mo in re.finditer(pattern, raw_expression):
-        what = mo.lastgroup
-        value = mo.group()
+    @override
+    def __iter__(self) -> Iterator[Token]:
+        return map(self.tokens.__getitem__, range(self.start, self.stop))
+
+
+class Cursor(Iterator[Token]):
+    """A position within SPAN, from which tokens are read one by one.
+
+    A cursor is no more than an index into tokens that are already
+    stored elsewhere, so that it costs the same however many tokens
+    are read through it, and reading a token never copies or buffers
+    anything. Each compilation gets a cursor of its own, which goes
+    away along with it.
+
+    """
+
+    def __init__(self, span: Span):
+        self.tokens: Sequence[Token] = span.tokens
+        self.stop: int = span.stop
+
+        # The position of the next token.
+        self.pos: int = span.start
+
+    def advance(self) -> Token:
+        """Consume the next token, returning it.
+
+        An 'eof' nud is consumed like any other token, so past the end
+        of the span, keep supplying them for as long as we're asked
+        to.
+
+        """
+
+        pos = self.pos
+
+        if pos < self.stop:
+            self.pos = pos + 1
+
+            return self.tokens[pos]
 
-        match what:
-            case "NUMBER":
-                if "." in value:
-                    yield Token(Type.FLOAT, value)
-                else:
-                    yield Token(Type.INT, value)
+        return Op.eof
 
-            case "OPERATOR":
-                yield Token(Type.OPERATOR, value)
+    def peek(self) -> Token:
+        """Return the next token, without consuming it."""
 
-            case "IDENTIFIER":
-                yield Token(Type.IDENTIFIER, value)
+        if self.pos < self.stop:
+            return self.tokens[self.pos]
 
-            case "SKIP":
-                continue
+        return Op.eof
+
+    @override
+    def __next__(self) -> Token:
+        if self.pos < self.stop:
+            return self.advance()
+
+        raise StopIteration
+
+
+def tokenize(raw_expression: str) -> Cursor:
+    """Tokenize RAW_EXPRESSION, returning a cursor over its tokens.
+
+    See 'scan'.
+
+    """
+
+    return Cursor(Span(scan(raw_expression)))
+
+
+def _safe_cut(buffer: str) -> int:
+    """Return how much of BUFFER can be tokenized on its own.
+
+    This is the position of a space or newline, found outside any
+    comment, at which no token (or run of newlines) could straddle the
+    cut, however BUFFER goes on to be continued. If there's no such
+    place, return 0.
+
+    """
 
-            case "ERROR":
-                raise ValueError(f"Bad token: '{value}'")
+    # Find where comments start and end. Outside of a comment, '/*'
+    # always starts one; an unterminated comment limits how much of
+    # BUFFER can be used.
+    starts: list[int] = []
+    ends: list[int] = []
+    limit = len(buffer)
+    i = 0
 
-            case _:
-                raise ValueError(f"Fatal: unknown category '{what}:{value}'")
+    while (i := buffer.find("/*", i)) >= 0:
+        end = buffer.find("*/", i + 2)
+
+        if end < 0:
+            limit = i
+            break
+
+        starts.append(i)
+        ends.append(i := end + 2)
+
+    def comment_at(p: int) -> int | None:
+        j = bisect_right(starts, p) - 1
+
+        return starts[j] if j >= 0 and p < ends[j] else None
+
+    # A space or tab ends whatever came before it.
+    p = limit
+
+    while (p := max(buffer.rfind(" ", 0, p), buffer.rfind("\t", 0, p))) > 0:
+        if (start := comment_at(p)) is None:
+            return p
+
+        p = start
+
+    # So does a newline, unless it might belong to a run of newlines
+    # (and comments) beginning further back.
+    p = limit
+
+    while (p := buffer.rfind("\n", 0, p)) > 0:
+        if (start := comment_at(p)) is not None:
+            p = start
+        elif buffer[p - 1] != "\n" and p not in ends:
+            return p
+
+    return 0
+
+
+def scan_chunks(chunks: Iterable[str]) -> Generator[Token]:
+    """Tokenize source text arriving in CHUNKS.
+
+    This yields the same tokens as 'scan' would for the concatenation
+    of CHUNKS, but only holds on to what's left over of each chunk
+    after its last complete token (or comment), rather than to all of
+    the text.
+
+    As with 'scan', the last token is always 'eof'.
+
+    """
+
+    buffer = ""
+
+    for chunk in chunks:
+        buffer += chunk
+
+        if (cut := _safe_cut(buffer)) > 0:
+            yield from scan(buffer[:cut])[:-1]
+            buffer = buffer[cut:]
+
+    yield from scan(buffer)
+
+
+def statements(tokens: Iterable[Token]) -> Generator[list[Token]]:
+    """Split TOKENS into top-level statements.
+
+    A statement ends at a ';' (or a newline) which isn't inside
+    parentheses, a quoted block or a string, so that evaluating the
+    statements one after another has the same effect as evaluating
+    all of TOKENS at once.
+
+    There's a catch, though: 'print', 'call', a conditional '{' and a
+    ';' nud all parse whatever follows them at the NONE level. When
+    one of these turns up inside the operand of some other operator
+    (as in 'x <- call f'), everything up to the end of TOKENS is part
+    of that operand, and so the rest of TOKENS is a single statement.
+
+    Stops at the first 'eof' token, or after an unmatched ')'; the last
+    statement (which may be empty) is always yielded.
+
+    """
 
-    yield Token(Type.EOF, "eof")
+    tokens = iter(tokens)
+    statement: list[Token] = []
+    braces = 0
+    parens = 0
+    in_string = False
+
+    # Whether the last top-level token ended an operand, and whether
+    # an operator is still waiting for the rest of its operand.
+    after_operand = False
+    opened = False
+
+    # Whether the rest of TOKENS belongs to the current statement.
+    rest = False
+
+    for t in tokens:
+        if t == Op.eof:
+            break
+
+        statement.append(t)
+
+        # Most tokens are numbers and identifiers, which never end a
+        # statement.
+        if t.tag != Type.OPERATOR:
+            after_operand = True
+            continue
+
+        # Like the 'string' nud, only a closing '"' means anything
+        # inside a top-level string. Inside a quoted block, though,
+        # braces are always counted, just as 'Compiler.block' does.
+        if rest:
+            continue
+        elif t == Op.string and braces == 0:
+            in_string = not in_string
+            after_operand = not in_string
+        elif in_string:
+            continue
+        elif t == Op.quote:
+            if braces == 0 and parens == 0 and after_operand:
+                rest = opened
+
+            braces += 1
+        elif t == Op.endquote:
+            braces = max(0, braces - 1)
+            after_operand = True
+        elif braces > 0:
+            continue
+        elif t == Op.lparen:
+            parens += 1
+            after_operand = False
+        elif t == Op.rparen and parens == 0:
+            # The expression ends at an unmatched ')', and anything
+            # after it is ignored.
+            yield statement
+
+            consume(tokens)
+
+            return
+        elif t == Op.rparen:
+            parens -= 1
+            after_operand = True
+        elif parens > 0:
+            continue
+        elif t == Op.semicolon and after_operand:
+            _ = statement.pop()
+            yield statement
+
+            statement = []
+            after_operand = opened = False
+        else:
+            if t in (Op.prt, Op.call, Op.semicolon):
+                rest = opened
+
+            operand = _operands.get(t.what)
+
+            if operand:
+                opened = True
+
+            after_operand = operand is False
+
+    yield statement
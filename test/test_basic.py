@@ -1,6 +1,11 @@
+import math
+from decimal import Decimal
+
 import pytest
 
+from pratt_calc.arithmetic import render
 from pratt_calc.evaluator import Evaluator
+from pratt_calc.repl import Repl
 
 # The original set of examples, before floats were introduced.
 basic = [
@@ -21,8 +26,46 @@ basic = [
 
 
 @pytest.mark.parametrize("raw_expression, value", basic)
-def test_basic(raw_expression: str, value: int):
-    ev = Evaluator()
+@pytest.mark.parametrize("native", [False, True])
+def test_basic(raw_expression: str, value: int, native: bool):
+    # Native code is run unoptimized, so that the arithmetic is left
+    # for it to do.
+    ev = Evaluator(optimize=not native, native=native)
     result = ev.evaluate(raw_expression)
 
     assert result == value
+
+
+exact = [
+    ("25!", 15511210043330985984000000),
+    ("2^100", 2**100),
+    ("(-3)^3", -27),
+    ("0^0", 1),
+    ("2^-1", 0.5),
+    ("2.0^3", 8.0),
+    ("2^0.5", math.sqrt(2)),
+]
+
+
+@pytest.mark.parametrize("raw_expression, value", exact)
+@pytest.mark.parametrize("native", [False, True])
+def test_exact(raw_expression: str, value: int | float, native: bool):
+    ev = Evaluator(optimize=not native, native=native)
+    result = ev.evaluate(raw_expression)
+
+    assert type(result) is type(value)
+    assert result == value
+
+
+@pytest.mark.parametrize("native", [False, True])
+def test_long_integers(native: bool, capsys: pytest.CaptureFixture[str]):
+    # Too many digits for Python's 'str' to convert by default.
+    ev = Evaluator(optimize=not native, native=native)
+    _ = ev.evaluate("print(str(2 ^ 20000))")
+    Repl(ev).default("-(2 ^ 20000)")
+
+    printed, negated = capsys.readouterr().out.splitlines()
+
+    assert Decimal(printed) == Decimal(2**20000)
+    assert negated == "-" + printed
+    assert render(2.5) == "2.5"
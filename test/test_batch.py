@@ -0,0 +1,172 @@
+import importlib.util
+import math
+import warnings
+
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("numpy") is None, reason="requires NumPy"
+)
+
+rows = {
+    "a": [1, 2, 3, 0.5],
+    "b": [0.0, 1.5, -2, 7],
+    "c": [4, -1, 0, 2.5],
+}
+
+examples = [
+    "a * sin(b) + c ^ 2",
+    "-a + cos(b) - tan(c) * pi",
+    "sec(a) + csc(b + 1) + cot(c + 2)",
+    "a / 3 ^ 2 ^ 0.5",
+    "(a + b)! + c!",
+    "x <- a * 2; y <- x + b; x * y",
+    "a + unbound",
+    "3 + 4",
+    "sqrt abs b + exp(a) * log a - floor c",
+    "max(a, b) * min(floor b, c) + abs -c",
+]
+
+
+def expected(raw_expression: str) -> list[float]:
+    values: list[float] = []
+
+    for i in range(4):
+        ev = Evaluator()
+
+        for name, column in rows.items():
+            _ = ev.evaluate(f"{name} <- {column[i]}")
+
+        values.append(ev.evaluate(raw_expression))
+
+    return values
+
+
+@pytest.mark.parametrize("raw_expression", examples)
+def test_matches_scalar(raw_expression: str):
+    ev = Evaluator()
+    result = ev.evaluate_batch(raw_expression, rows)
+
+    assert result.shape == (4,)
+    assert result.tolist() == pytest.approx(expected(raw_expression))
+
+
+def test_registers_unchanged():
+    ev = Evaluator()
+    _ = ev.evaluate("k <- 10")
+
+    result = ev.evaluate_batch("k <- k + a", {"a": [0, 1, 2]})
+
+    assert result.tolist() == [10, 11, 12]
+    assert ev.evaluate("k") == 10
+
+
+def test_errors_become_inf():
+    ev = Evaluator()
+    result = ev.evaluate_batch("1 / a", {"a": [0, 2]})
+
+    assert result.tolist() == [math.inf, 0.5]
+
+
+def test_heap_fallback(capsys: pytest.CaptureFixture[str]):
+    from pratt_calc.batch import BatchFallbackWarning
+
+    ev = Evaluator()
+    _ = ev.evaluate("f <- {a * 10}")
+
+    with pytest.warns(BatchFallbackWarning):
+        result = ev.evaluate_batch("print(str a); call f", {"a": [1, 2]})
+
+    assert result.tolist() == [10, 20]
+    assert capsys.readouterr().out == "1\n2\n"
+    assert ev.evaluate("a") == 0
+
+
+def test_native_functions():
+    from pratt_calc.batch import BatchFallbackWarning
+
+    ev = Evaluator()
+
+    # Built-in functions have NumPy equivalents.
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", BatchFallbackWarning)
+        result = ev.evaluate_batch("floor(a / 2) + max(a, 3)", {"a": [1, 7, -3]})
+
+    assert result.tolist() == [3, 10, 1]
+    assert result.dtype.kind == "i"
+
+    # Outside of their domain, they're evaluated row by row, just as
+    # scalars are.
+    with pytest.warns(BatchFallbackWarning), pytest.raises(ValueError, match="domain"):
+        _ = ev.evaluate_batch("sqrt a", {"a": [4, -1]})
+
+
+def test_errors_raised():
+    from pratt_calc.batch import BatchFallbackWarning
+
+    ev = Evaluator()
+
+    # Only failed arithmetic yields nan.
+    with (
+        pytest.warns(BatchFallbackWarning),
+        pytest.raises(ValueError, match="Illegal call-address"),
+    ):
+        _ = ev.evaluate_batch("call a", {"a": [999, 1000]})
+
+
+def test_mismatched_columns():
+    ev = Evaluator()
+
+    with pytest.raises(ValueError):
+        _ = ev.evaluate_batch("a + b", {"a": [1, 2], "b": [1]})
+
+
+def test_integer_power():
+    ev = Evaluator()
+    result = ev.evaluate_batch("a ^ b", {"a": [2, 3, -2], "b": [10, 0, 3]})
+
+    assert result.tolist() == [1024, 1, -8]
+    assert result.dtype.kind == "i"
+
+
+def test_big_integer_power():
+    from pratt_calc.batch import BatchFallbackWarning
+
+    ev = Evaluator()
+
+    with pytest.warns(BatchFallbackWarning):
+        result = ev.evaluate_batch("a ^ 70", {"a": [2, 3]})
+
+    assert result.tolist() == [2**70, 3**70]
+
+
+overflows = [
+    ("a * a", [10**10, 3]),
+    ("a + 1", [2**63 - 1, 0]),
+    ("-a", [-(2**63), 1]),
+    ("a! * a!", [20, 3]),
+    ("a!", [21, 2]),
+    ("2 ^ 100 + a", [1, 2]),
+    ("a + 1", [10**20, 1]),
+]
+
+
+@pytest.mark.parametrize("raw_expression, column", overflows)
+def test_integer_overflow(raw_expression: str, column: list[int]):
+    from pratt_calc.batch import BatchFallbackWarning
+
+    ev = Evaluator()
+
+    # Integers are exact, whether or not they fit in an int64.
+    with pytest.warns(BatchFallbackWarning):
+        result = ev.evaluate_batch(raw_expression, {"a": column})
+
+    scalar: list[int | float] = []
+
+    for value in column:
+        _ = ev.evaluate(f"a <- {value}")
+        scalar.append(ev.evaluate(raw_expression))
+
+    assert result.tolist() == scalar
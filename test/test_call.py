@@ -1,3 +1,5 @@
+import tracemalloc
+
 import pytest
 
 from pratt_calc.evaluator import Evaluator
@@ -6,6 +8,8 @@ examples = [
     ("x <- {2} ; x", 0),
     ("x <- {2 + 3}; y <- {3}; y", 5),
     ("x <- {2 + 3} ; y <- {foo <- 12 ; 10}; call y; foo", 12),
+    ("b <- {x <- x + 1}; call b; call b; call b; x", 3),
+    ("f <- {n <- n - 1; a <- a * 2; n { call f }}; n <- 10; a <- 1; call f; a", 1024),
 ]
 
 
@@ -15,3 +19,88 @@ def test_examples(raw_expression: str, value: int | float):
     result = ev.evaluate(raw_expression)
 
     assert result == value
+
+
+# Calls and conditionals followed by ';', ')' or the end of the code,
+# which mean what they did when a block's tokens were spliced in
+# where it was run.
+spliced = [
+    ("f <- {1 + 2}; 2 * call f", 6),
+    ("f <- {1 + 2}; (call f) * 2", 6),
+    ("f <- {1 + 2}; max(call f, 4)", 4),
+    ("f <- {1; 2}; - call f; 5", -5),
+    ("f <- {2}; g <- {r <- (call f)}; call g; r", 2),
+    ("1 {1 + 2}", 3),
+    ("0 {2}", 0),
+    ("0 {2}; 3", 3),
+    ("1 {0 {5}; 6}", 6),
+    ("2 * 0 {2}; 3", 6),
+    ("2 * 1 {2}; 3", 6),
+]
+
+
+@pytest.mark.parametrize("raw_expression, value", spliced)
+@pytest.mark.parametrize("native", [False, True])
+def test_spliced(raw_expression: str, value: int, native: bool):
+    ev = Evaluator(native=native)
+
+    assert ev.evaluate(raw_expression) == value
+
+
+# Code whose meaning depended on what a block was, or on whether a
+# conditional's flag was true.
+ambiguous = [
+    ("f <- {1 + 2}; call f * 2", "Ambiguous '\\*' after a call"),
+    ("f <- {1 + 2}; call f ^ 2", "Ambiguous '\\^' after a call"),
+    ("f <- {x}; call f <- 3", "Ambiguous '<-' after a call"),
+    ("1 {2 + 3} * 4", "Only ';' can follow a conditional"),
+    ("0 {2} * 4", "Only ';' can follow a conditional"),
+    ("x <- 0; x {9} 4 + 1", "Only ';' can follow a conditional"),
+    ("(1 {2})", "Only ';' can follow a conditional"),
+    ("f <- {r <- call g}", "Ambiguous end of block"),
+    ("f <- {-x {3}}", "Ambiguous end of block"),
+    ("f <- {1 +}", "Ambiguous end of block"),
+]
+
+
+@pytest.mark.parametrize("raw_expression, message", ambiguous)
+def test_ambiguous(raw_expression: str, message: str):
+    with pytest.raises(ValueError, match=message):
+        _ = Evaluator().evaluate(raw_expression)
+
+
+def test_compiled_once():
+    ev = Evaluator()
+    addr = int(ev.evaluate("b <- {x <- x + 1}"))
+    code = ev.heap.code(addr)
+
+    _ = ev.evaluate("call b; call b")
+
+    assert ev.heap.code(addr) is code
+
+
+def test_tail_calls_run_in_constant_space():
+    ev = Evaluator()
+    _ = ev.evaluate("f <- {n <- n - 1; k <- k + 2; n { call f }}")
+    size = ev.heap.size
+
+    tracemalloc.start()
+
+    try:
+        result = ev.evaluate("n <- 20000; call f; k")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert result == 40000
+    assert ev.heap.size == size
+    assert peak < 50_000
+
+
+def test_calls_in_tail_position_only():
+    ev = Evaluator()
+    result = ev.evaluate(
+        "f <- {n <- n - 1; n { call f; k <- k + 1 }}; n <- 5; call f; k"
+    )
+
+    assert result == 4
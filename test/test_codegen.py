@@ -0,0 +1,127 @@
+import sys
+
+import pytest
+
+from pratt_calc.codegen import MAX_DEPTH, translate
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.limits import Limits
+
+programs = [
+    "x <- 3; f <- {x * x + 1}; call f",
+    "f <- {n <- n - 1; total <- total + n * 2; n { call f }}; n <- 100; call f; total",
+    "x <- 2; y <- (x <- x + 1) * x; y",
+    "x <- 5; (x - 5) { x <- 100 }; x",
+    "a <- 1; b <- 2; c <- 3; d <- 4; (3) <- 7; d",
+    "f <- {print(str(x)); x <- x + 1}; call f; call f; call f; x",
+    's <- "a b"; print(s); t <- str(1.5); print(t); 1',
+    "2 ^ 200 + 10 ^ 120",
+]
+
+
+@pytest.mark.parametrize("raw_expression", programs)
+def test_matches_vm(raw_expression: str, capsys: pytest.CaptureFixture[str]):
+    vm = Evaluator(optimize=False)
+    native = Evaluator(optimize=False, native=True)
+
+    assert native.evaluate(raw_expression) == vm.evaluate(raw_expression)
+    assert [str(r) for r in native.registers] == [str(r) for r in vm.registers]
+    assert len(native.heap) == len(vm.heap)
+
+    out = capsys.readouterr().out
+    half = len(out) // 2
+    assert out[:half] == out[half:]
+
+
+errors = [
+    ("1 / 0; x <- 1", ZeroDivisionError),
+    ("1 / 0 + z", ZeroDivisionError),
+    ("call 12345", ValueError),
+    ("print(3)", ValueError),
+]
+
+
+@pytest.mark.parametrize("raw_expression, error", errors)
+def test_errors(raw_expression: str, error: type[Exception]):
+    ev = Evaluator(native=True)
+
+    with pytest.raises(error):
+        _ = ev.evaluate(raw_expression)
+
+    # Nothing past the error has run.
+    assert ev.symbols == {}
+    assert ev.backend is not None
+    assert ev.backend.depth == 0
+
+
+def test_native_code():
+    ev = Evaluator(native=True)
+    source = translate(ev.compile("{x * x + 1}").blocks[0])
+
+    assert "return ((registers[r0].value * registers[r0].value) + (1))" in source
+
+
+def test_deep_recursion():
+    depth = 2 * sys.getrecursionlimit()
+    ev = Evaluator(native=True)
+    _ = ev.evaluate("f <- {n <- n - 1; n { call f; k <- k + 1 }}")
+
+    # Past MAX_DEPTH, the VM takes over.
+    assert depth > MAX_DEPTH
+    assert ev.evaluate(f"n <- {depth}; call f; k") == depth - 1
+
+
+@pytest.mark.parametrize(
+    "raw_expression, expected",
+    [
+        ("x <- 1; " + " + ".join(["x"] * 500), 500),
+        ("x <- 1; f <- {" + " + ".join(["x"] * 500) + "}; call f", 500),
+        ("x <- 2; " + "-" * 501 + "x", -2),
+        ("x <- 1; " + "(" * 90 + "x" + " * 2)" * 90, 2**90),
+        ("x <- 0; " + " + ".join(["x + 1"] * 300), 300),
+    ],
+    ids=["sum", "block", "negation", "parentheses", "pairs"],
+)
+def test_long_expressions(raw_expression: str, expected: int):
+    # Python refuses expressions nested too deeply.
+    assert Evaluator(native=True).evaluate(raw_expression) == expected
+
+
+def test_vm_fallback():
+    ev = Evaluator(native=True, limits=Limits(steps=100))
+
+    with pytest.raises(Exception, match="steps"):
+        _ = ev.evaluate("f <- {call f}; call f")
+
+    ev.limits = Limits()
+    assert ev.evaluate("g <- {3}; call g") == 3
+
+
+def test_garbage_collection(capsys: pytest.CaptureFixture[str]):
+    ev = Evaluator(native=True, gc_threshold=100)
+    _ = ev.evaluate('s <- "keep me"')
+    _ = ev.evaluate('f <- {n <- n - 1; "garbage"; n { call f }}; n <- 200; call f')
+    _ = ev.evaluate('t <- "more"; print(s)')
+
+    assert ev.last_collection is not None
+    assert capsys.readouterr().out == "keep me\n"
+
+
+@pytest.mark.parametrize("native", [False, True])
+def test_collection_keeps_literals(native: bool, capsys: pytest.CaptureFixture[str]):
+    # Collecting before running 'call 0' mustn't free what 0 refers to.
+    ev = Evaluator(native=native, gc_threshold=1)
+    assert ev.evaluate("{5}") == 0
+    assert ev.evaluate("call 0") == 5
+
+    ev = Evaluator(native=native, gc_threshold=1)
+    assert ev.evaluate('"hi"') == 0
+    _ = ev.evaluate("print 0")
+    assert capsys.readouterr().out == "hi\n"
+
+
+def test_reset():
+    ev = Evaluator(native=True)
+    _ = ev.evaluate("x <- 3; f <- {x}")
+    ev.reset()
+
+    assert ev.evaluate("y <- 4; f <- {y}; call f") == 4
@@ -0,0 +1,43 @@
+from pratt_calc.evaluator import Evaluator
+
+
+def test_compiled_program_is_reusable():
+    ev = Evaluator()
+    program = ev.compile("x <- x + 2; x * 10")
+
+    results = [ev.execute(program) for _ in range(3)]
+
+    assert results == [20, 40, 60]
+
+
+def test_cache_counters():
+    ev = Evaluator()
+
+    for _ in range(3):
+        _ = ev.evaluate("1 + 2")
+
+    _ = ev.evaluate("3 + 4")
+
+    assert ev.cache.hits == 2
+    assert ev.cache.misses == 2
+    assert len(ev.cache) == 2
+
+
+def test_cache_eviction():
+    ev = Evaluator(cache_size=2)
+
+    first = ev.compile("1")
+    _ = ev.compile("2")
+    _ = ev.compile("1")
+    _ = ev.compile("3")
+
+    assert ev.cache.evictions == 1
+    assert "2" not in ev.cache
+    assert ev.compile("1") is first
+
+
+def test_cache_disabled():
+    ev = Evaluator(cache_size=0)
+
+    assert ev.compile("1") is not ev.compile("1")
+    assert len(ev.cache) == 0
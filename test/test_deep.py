@@ -0,0 +1,51 @@
+import contextlib
+import io
+import sys
+
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+
+# Comfortably past Python's default recursion limit.
+DEPTH = 20 * sys.getrecursionlimit()
+
+examples = [
+    ("(" * DEPTH + "1" + ")" * DEPTH, 1),
+    ("-" * DEPTH + "1", 1),
+    ("x <- " * DEPTH + "7; x", 7),
+    ("{" * DEPTH + "}" * DEPTH, 0),
+    ("1 + " * DEPTH + "1", DEPTH + 1),
+]
+
+
+@pytest.mark.parametrize("raw_expression, value", examples)
+def test_deep_expressions(raw_expression: str, value: int | float):
+    ev = Evaluator()
+    result = ev.evaluate(raw_expression)
+
+    assert result == value
+
+
+def test_deep_recursion():
+    ev = Evaluator()
+    result = ev.evaluate(
+        f"f <- {{n <- n - 1; k <- k + 1; n {{ call f }}}}; n <- {DEPTH}; call f; k"
+    )
+
+    assert result == DEPTH
+
+
+def test_many_prints():
+    ev = Evaluator()
+
+    with contextlib.redirect_stdout(io.StringIO()) as f:
+        _ = ev.evaluate('print "hi"; ' * DEPTH + "3")
+
+    assert f.getvalue() == "hi\n" * DEPTH
+
+
+def test_collect_deep_blocks():
+    ev = Evaluator()
+    _ = ev.evaluate("b <- " + "{" * DEPTH + "}" * DEPTH)
+
+    assert ev.collect().objects == 0
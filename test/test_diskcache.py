@@ -0,0 +1,111 @@
+import sys
+from pathlib import Path
+
+from pratt_calc.compiler import compile_expression
+from pratt_calc.diskcache import SUFFIX, DiskCache, decode, encode
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.optimizer import optimize
+
+SCRIPT = 'f <- {n <- n - 1; n { call f }}; n <- 3; call f; s <- "abc"; 1.5 * 4'
+
+
+def run(cache: DiskCache, source: str) -> tuple[int | float, Evaluator]:
+    ev = Evaluator(disk_cache=cache, profile=True)
+
+    return ev.execute(ev.compile(source, persist=True)), ev
+
+
+def test_round_trip(tmp_path: Path):
+    cache = DiskCache(tmp_path)
+    value, ev = run(cache, SCRIPT)
+
+    assert ev.profiler is not None
+    assert ev.profiler.tokenizer_seconds > 0
+    assert len(list(tmp_path.glob("*" + SUFFIX))) == 1
+
+    # A fresh evaluator loads the script instead of compiling it.
+    cached, ev = run(cache, SCRIPT)
+
+    assert cached == value == 6.0
+    assert ev.profiler is not None
+    assert ev.profiler.tokenizer_seconds == 0
+
+
+def test_edited(tmp_path: Path):
+    cache = DiskCache(tmp_path)
+    _ = run(cache, SCRIPT)
+
+    value, ev = run(cache, SCRIPT.replace("4", "5"))
+
+    assert value == 7.5
+    assert ev.profiler is not None
+    assert ev.profiler.tokenizer_seconds > 0
+    assert len(list(tmp_path.glob("*" + SUFFIX))) == 2
+
+
+def test_optimize(tmp_path: Path):
+    cache = DiskCache(tmp_path)
+
+    assert cache.path(SCRIPT, True) != cache.path(SCRIPT, False)
+
+
+def test_corrupt(tmp_path: Path):
+    cache = DiskCache(tmp_path)
+    _ = run(cache, SCRIPT)
+
+    path = cache.path(SCRIPT, True)
+    _ = path.write_bytes(b"not marshal data")
+
+    assert cache.load(SCRIPT, True) is None
+
+    # The damaged entry is replaced.
+    value, _ = run(cache, SCRIPT)
+
+    assert value == 6.0
+    assert cache.load(SCRIPT, True) is not None
+
+
+def test_prune(tmp_path: Path):
+    cache = DiskCache(tmp_path, max_entries=3)
+
+    for i in range(5):
+        _ = run(cache, f"{i} + 1")
+
+    assert len(list(tmp_path.glob("*" + SUFFIX))) == 3
+    assert cache.load("4 + 1", True) is not None
+
+
+def test_deep():
+    depth = 20 * sys.getrecursionlimit()
+    code = decode(encode(compile_expression("{" * depth + "1" + "}" * depth)))
+
+    for _ in range(depth):
+        code = code.blocks[0]
+
+    assert not code.blocks
+    assert [t.what for t in code.tokens] == ["1"]
+
+
+def test_source():
+    code = compile_expression("f <- {1 + 2}; call f")
+    decoded = decode(encode(code))
+
+    assert list(decoded.tokens) == list(code.tokens)
+    assert list(decoded.blocks[0].tokens) == list(code.blocks[0].tokens)
+    assert list(decoded.blocks[0].tokens[1:]) == list(code.blocks[0].tokens[1:])
+
+
+def test_natives():
+    code = compile_expression("max(sqrt 16, {min(1, 2)})")
+    decoded = decode(encode(code))
+
+    assert decoded.natives == code.natives
+    assert decoded.blocks[0].natives == code.blocks[0].natives
+
+
+def test_folded_bits():
+    code = optimize(compile_expression("{2 ^ 100}; 30!"))
+    decoded = decode(encode(code))
+
+    assert decoded.bits == code.bits > 100
+    assert decoded.blocks[0].bits == code.blocks[0].bits == 100
@@ -24,8 +24,11 @@ float_examples = [
 
 
 @pytest.mark.parametrize("raw_expression, value", float_examples)
-def test_float_examples(raw_expression: str, value: int | float):
-    ev = Evaluator()
+@pytest.mark.parametrize("native", [False, True])
+def test_float_examples(raw_expression: str, value: int | float, native: bool):
+    # Native code is run unoptimized, so that the arithmetic is left
+    # for it to do.
+    ev = Evaluator(optimize=not native, native=native)
     result = ev.evaluate(raw_expression)
 
     assert math.isclose(result, value, abs_tol=1e-10)
@@ -0,0 +1,144 @@
+import math
+from collections.abc import Generator
+
+import pytest
+
+from pratt_calc.compiler import Opcode, compile_expression, registry
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.tokenizer import Token, Type, define, scan, statements
+
+
+@pytest.fixture(autouse=True)
+def restore_registry() -> Generator[None]:
+    # Functions and operators registered by a test aren't seen by any
+    # other.
+    restore = registry.snapshot()
+    yield
+    restore()
+
+
+examples = [
+    ("sqrt 16 + 9", 13.0),
+    ("sqrt(16 + 9)", 5.0),
+    ("log exp 2", 2.0),
+    ("abs -3", 3),
+    ("floor 2.7", 2),
+    ("floor -2.5 * 2", -6),
+    ("max(3, 4) * 2", 8),
+    ("min(2 ^ 3, 5)", 5),
+    ("max(1, max(min(5, 9), 2)) - 1", 4),
+    ("x <- 7; f <- {max(x, 2) + abs(-x)}; call f", 14),
+    ("max(x <- 3, x + 1)", 4),
+]
+
+
+@pytest.mark.parametrize("raw_expression, value", examples)
+@pytest.mark.parametrize("native", [False, True])
+def test_functions(raw_expression: str, value: int | float, native: bool):
+    ev = Evaluator(optimize=not native, native=native)
+    result = ev.evaluate(raw_expression)
+
+    assert result == value
+    assert type(result) is type(value)
+
+
+bad_examples = [
+    ("max 3", "Expected '\\('"),
+    ("max(3)", "takes 2 arguments"),
+    ("min(1, 2, 3)", "takes 2 arguments"),
+    ("sqrt -1", "math domain error"),
+    ("(1, 2)", None),
+]
+
+
+@pytest.mark.parametrize("raw_expression, message", bad_examples)
+def test_bad_calls(raw_expression: str, message: str | None):
+    with pytest.raises((ValueError, AssertionError), match=message):
+        _ = Evaluator().evaluate(raw_expression)
+
+
+def test_whole_words():
+    # Function names aren't split off identifiers, as operators are.
+    assert Evaluator().evaluate("minutes <- 3; maximum <- 4; minutes * maximum") == 12
+    assert [t.what for t in scan("sinx sqrtx")] == ["sin", "x", "sqrtx", "eof"]
+
+
+def test_register():
+    registry.function("hypot", math.hypot, 2)
+    registry.function("answer", lambda: 42, 0)
+
+    code = compile_expression("hypot(3, 4) + answer")
+
+    assert [instr.op for instr in code.ops].count(Opcode.NATIVE) == 2
+    assert Evaluator().evaluate("hypot(3, 4) + answer") == 47.0
+    assert Evaluator(native=True).evaluate("f <- {hypot(answer, 0)}; call f") == 42.0
+
+    with pytest.raises(ValueError, match="Already an operator"):
+        registry.function("sin", math.sinh)
+
+    with pytest.raises(ValueError, match="Invalid function name"):
+        registry.function("2x", math.sinh)
+
+
+def test_statements():
+    registry.function("seven", lambda: 7, 0)
+
+    def split(raw_expression: str) -> list[str]:
+        return [" ".join([t.what for t in s]) for s in statements(scan(raw_expression))]
+
+    # A function's operand runs on to the end, just like an operator's.
+    assert split("f <- {4}; sqrt call f; 9") == ["f <- { 4 }", "sqrt call f ; 9"]
+    assert split("x <- seven; call f; 9") == ["x <- seven", "call f", "9"]
+
+    source = "f <- {4}; sqrt call f; 9"
+    assert Evaluator().evaluate_stream([source]) == Evaluator().evaluate(source) == 3.0
+
+
+def test_define():
+    tilde = define(Token(Type.OPERATOR, "~~"))
+
+    assert scan("1 ~~ 2")[1] is tilde
+    assert define(Token(Type.OPERATOR, "~~")) is tilde
+
+    # Registered, but with no nud or led to compile it.
+    with pytest.raises(ValueError, match="Invalid nud"):
+        _ = compile_expression("~~")
+
+
+@pytest.mark.parametrize("native", [False, True])
+def test_reregister(native: bool):
+    ev = Evaluator(native=native)
+
+    def double(x: int | float) -> int | float:
+        return 2 * x
+
+    def triple(x: int | float) -> int | float:
+        return 3 * x
+
+    registry.function("half", lambda: 0, 0)
+    registry.function("dbl", double)
+
+    assert ev.evaluate("half") == 0
+    assert ev.evaluate("dbl 4") == 8
+
+    # Code cached before the functions were registered again is
+    # compiled afresh.
+    registry.function("half", lambda: 0.5, 0)
+    registry.function("dbl", triple)
+
+    assert ev.evaluate("half") == 0.5
+    assert ev.evaluate("dbl 4") == 12
+
+
+def test_snapshot():
+    restore = registry.snapshot()
+    registry.function("twice", lambda: 2, 0)
+
+    assert scan("twice")[0].tag == Type.OPERATOR
+    assert Evaluator().evaluate("twice") == 2
+
+    restore()
+
+    assert scan("twice")[0].tag == Type.IDENTIFIER
+    assert "twice" not in registry.functions
+    assert Evaluator().evaluate("twice <- 3; twice") == 3
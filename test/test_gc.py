@@ -0,0 +1,53 @@
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.heap import Kind
+
+
+def test_collect_garbage(capsys: pytest.CaptureFixture[str]):
+    ev = Evaluator()
+    _ = ev.evaluate('s <- "keep me"')
+
+    for _ in range(10):
+        _ = ev.evaluate('"garbage"; str 42; {1 + 2}; 0')
+
+    collection = ev.collect()
+
+    assert collection.objects == 30
+    assert collection.bytes > 0
+    assert ev.heap_stats()[Kind.STRING].objects == 1
+
+    # Surviving objects keep their addresses.
+    _ = ev.evaluate("print(s)")
+    assert capsys.readouterr().out == "keep me\n"
+
+
+def test_literal_addresses_are_roots(capsys: pytest.CaptureFixture[str]):
+    ev = Evaluator()
+    _ = ev.evaluate('"hello"; b <- {print(0)}; "garbage"')
+
+    assert ev.collect().objects == 1
+
+    _ = ev.evaluate("call b")
+    assert capsys.readouterr().out == "hello\n"
+
+
+def test_freed_addresses_are_invalid():
+    ev = Evaluator()
+    _ = ev.evaluate('"garbage"; 1')
+    _ = ev.collect()
+
+    with pytest.raises(ValueError):
+        _ = ev.evaluate("print(0)")
+
+
+def test_automatic_collection():
+    ev = Evaluator(gc_threshold=100)
+    _ = ev.evaluate("b <- {x <- x + 1; s <- str x}")
+
+    for _ in range(1000):
+        _ = ev.evaluate("call b")
+
+    assert ev.last_collection is not None
+    assert ev.heap_stats()[Kind.STRING].objects < 50
+    assert ev.evaluate("x") == 1000
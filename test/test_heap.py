@@ -0,0 +1,35 @@
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.heap import Kind, KindStats
+
+
+def test_addresses():
+    ev = Evaluator()
+
+    # Each object takes up its length plus two addresses.
+    assert ev.evaluate('"a b c"') == 0
+    assert ev.evaluate("{1 + 2}") == 5
+    assert ev.evaluate("str 42") == 10
+    assert len(ev.heap) == 13
+
+
+def test_heap_stats():
+    ev = Evaluator()
+    _ = ev.evaluate('s <- "hello world"; b <- {1 + 2}; print(str 7)')
+
+    stats = ev.heap_stats()
+
+    assert stats[Kind.STRING].objects == 2
+    assert stats[Kind.STRING].cells == 7
+    assert stats[Kind.CODE] == KindStats(1, 5, stats[Kind.CODE].bytes)
+    assert stats[Kind.STRING].bytes > len("hello world7")
+
+
+@pytest.mark.parametrize("raw_expression", ["print(1)", "call 0", "call 42"])
+def test_illegal_addresses(raw_expression: str):
+    ev = Evaluator()
+    _ = ev.evaluate('"a b"')
+
+    with pytest.raises(ValueError):
+        _ = ev.evaluate(raw_expression)
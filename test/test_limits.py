@@ -0,0 +1,95 @@
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.limits import LimitExceeded, Limits
+
+FOREVER = "f <- {call f}; call f"
+
+exceeded = [
+    (FOREVER, Limits(steps=1000), "steps"),
+    (FOREVER, Limits(seconds=0.1), "seconds"),
+    ("100000000!", Limits(bits=10_000), "bits"),
+    ("2 ^ 100000", Limits(bits=10_000), "bits"),
+    ("x <- 3; f <- {x <- x * x; call f}; call f", Limits(bits=10_000), "bits"),
+    (
+        "h <- {0}; f <- {n <- n - 1; b <- h; n {b <- f}; "
+        + "((call b) + 1) * 4294967296}; n <- 1000; call f",
+        Limits(bits=64),
+        "bits",
+    ),
+    ("x <- 4294967296; x*x*x*x*x*x*x*x", Limits(bits=64), "bits"),
+    ('f <- {s <- "abc"; call f}; call f', Limits(heap=1000), "heap"),
+]
+
+
+@pytest.mark.parametrize("raw_expression, limits, limit", exceeded)
+def test_exceeded(raw_expression: str, limits: Limits, limit: str):
+    ev = Evaluator(limits=limits)
+
+    with pytest.raises(LimitExceeded) as e:
+        _ = ev.evaluate(raw_expression)
+
+    assert e.value.limit == limit
+
+    # The evaluator is still usable afterwards.
+    assert ev.evaluate("1 + 2") == 3
+    assert not ev.active
+
+
+# Integers computed ahead of time by the optimizer are held to the
+# same limit as those computed as the code runs.
+folded = [
+    "2 ^ 100",
+    "30! + 1",
+    "1 {2 ^ 100}",
+    "f <- {2 ^ 100}; call f",
+]
+
+
+@pytest.mark.parametrize("raw_expression", folded)
+@pytest.mark.parametrize("optimize", [False, True])
+def test_folded(raw_expression: str, optimize: bool):
+    ev = Evaluator(limits=Limits(bits=64), optimize=optimize)
+
+    with pytest.raises(LimitExceeded, match="64 bits"):
+        _ = ev.evaluate(raw_expression)
+
+    # Blocks are checked when they're run, so that limits set later
+    # still apply.
+    ev = Evaluator(optimize=optimize)
+    _ = ev.evaluate("f <- {2 ^ 100}; 0 {2 ^ 100}")
+    ev.limits = Limits(bits=64)
+
+    with pytest.raises(LimitExceeded, match="64 bits"):
+        _ = ev.evaluate("call f")
+
+
+within = [
+    ("f <- {n <- n - 1; n { call f }}; n <- 50; call f; n", 0),
+    ("x <- 2 ^ 1000; y <- 1.5 ^ 1000; z <- 10.0 ^ 300; 1", 1),
+    ("20!", 2432902008176640000),
+]
+
+
+@pytest.mark.parametrize("raw_expression, value", within)
+def test_within(raw_expression: str, value: int | float):
+    ev = Evaluator(limits=Limits(steps=1000, heap=100, bits=1024, seconds=10))
+
+    assert ev.evaluate(raw_expression) == value
+
+
+def test_usage():
+    ev = Evaluator(limits=Limits(steps=100))
+    _ = ev.evaluate('f <- {"abc"; call f}')
+    size = len(ev.compile("call f").ops)
+    step = len(ev.heap.code(int(ev.evaluate("f"))).ops)
+
+    with pytest.raises(LimitExceeded) as e:
+        _ = ev.evaluate("call f")
+
+    usage = e.value.usage
+
+    assert str(e.value) == "Exceeded the limit of 100 steps"
+    assert usage.steps == size + step * ((100 - size) // step + 1)
+    assert usage.heap > 0
+    assert usage.seconds >= 0
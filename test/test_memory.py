@@ -0,0 +1,42 @@
+import gc
+import tracemalloc
+
+from pratt_calc.evaluator import Evaluator
+
+STATEMENTS = [
+    "f <- {n <- n - 1; n { call f }}",
+    "n <- 5; call f",
+    's <- "abc"; t <- str 42',
+    "q <- {1 + 2}; call q",
+]
+
+
+def run(ev: Evaluator, start: int, count: int):
+    for i in range(start, start + count):
+        _ = ev.evaluate(STATEMENTS[i % len(STATEMENTS)])
+
+        # Enough distinct expressions to keep the cache churning.
+        _ = ev.evaluate(f"{i % 1000} + 1")
+
+
+def test_flat_memory():
+    ev = Evaluator(gc_threshold=1000)
+    run(ev, 0, 2000)
+
+    tracemalloc.start()
+
+    try:
+        # By now, the cache and every other table have reached their
+        # working size, so that further evaluations only replace what's
+        # in them.
+        run(ev, 2000, 2000)
+        _ = gc.collect()
+        before, _ = tracemalloc.get_traced_memory()
+
+        run(ev, 4000, 4000)
+        _ = gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert after - before < 16 * 1024
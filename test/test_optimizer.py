@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from pratt_calc.compiler import Opcode
+from pratt_calc.evaluator import Evaluator
+
+examples: list[tuple[str, list[Opcode]]] = [
+    ("2 * pi", []),
+    ("sin(0.5) + cos(0.5) ^ 2", []),
+    ("(2 + 3)!", []),
+    ("-(-3)", []),
+    ("1; 2; 3", []),
+    ("2 * pi * r", [Opcode.LOAD, Opcode.MUL]),
+    ("r * 2 * pi", [Opcode.LOAD, Opcode.MUL, Opcode.MUL]),
+    ("x * 1 - 0", [Opcode.LOAD]),
+    ("--x", [Opcode.LOAD]),
+    ("x + 0", [Opcode.LOAD, Opcode.ADD]),
+    ("x * 1.0", [Opcode.LOAD, Opcode.MUL]),
+    ("1 / 0", [Opcode.DIV]),
+    ("10 ^ 400", []),
+    ("10.0 ^ 400", [Opcode.POW]),
+    ("3 ^ 100000", [Opcode.POW]),
+    ("2000!", [Opcode.FACT]),
+]
+
+
+@pytest.mark.parametrize("raw_expression, ops", examples)
+def test_folding(raw_expression: str, ops: list[Opcode]):
+    ev = Evaluator()
+    code = ev.compile(raw_expression)
+
+    remaining = [
+        instr.op for instr in code.ops if instr.op not in (Opcode.PUSH, Opcode.RETURN)
+    ]
+
+    assert remaining == ops
+
+
+@pytest.mark.parametrize(
+    "raw_expression",
+    [
+        "-0.0 * 1 - 0",
+        "x <- -0.0; x + 0",
+        "2 * pi * 3 / 7 ^ 0.5",
+        "sec(1) + csc(1) + cot(1)",
+        "(3 + 0.5)! + 4! * 1.5",
+        "x <- 3; x * 1; x / 1",
+        "f <- {2 * pi * r}; r <- 1.5; call f",
+        "0 {1 / 0}; 2 ^ 0.5",
+    ],
+)
+def test_same_results(raw_expression: str):
+    plain = Evaluator(optimize=False).evaluate(raw_expression)
+    optimized = Evaluator().evaluate(raw_expression)
+
+    assert type(optimized) is type(plain)
+    assert math.copysign(1, optimized) == math.copysign(1, plain)
+    assert optimized == plain
+
+
+def test_blocks_are_optimized():
+    ev = Evaluator()
+    code = ev.compile("f <- {g <- {2 * 3}}")
+
+    inner = code.blocks[0].blocks[0]
+
+    assert [instr.op for instr in inner.ops] == [Opcode.PUSH, Opcode.RETURN]
+
+
+def test_errors_still_raised():
+    ev = Evaluator()
+
+    with pytest.raises(ZeroDivisionError):
+        _ = ev.evaluate("1 / 0")
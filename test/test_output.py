@@ -0,0 +1,94 @@
+import io
+import pathlib
+
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.output import BufferedOutput, CallbackOutput, FileOutput, ListOutput
+
+SCRIPT = 'f <- {n <- n - 1; print(str n); n { call f }}; n <- 3; call f; print("done")'
+
+
+@pytest.mark.parametrize("native", [False, True])
+def test_list(native: bool):
+    output = ListOutput()
+    ev = Evaluator(native=native, output=output)
+    _ = ev.evaluate(SCRIPT)
+
+    assert output.lines == ["2", "1", "0", "done"]
+    assert output.text() == "2\n1\n0\ndone\n"
+
+
+def test_callback():
+    seen: list[str] = []
+    ev = Evaluator(output=CallbackOutput(seen.append))
+
+    with pytest.raises(ZeroDivisionError):
+        _ = ev.evaluate('print("a"); print("b"); 1 / 0')
+
+    assert seen == ["a", "b"]
+
+
+def test_threshold():
+    stream = io.StringIO()
+    output = BufferedOutput(stream, threshold=7)
+
+    output.write("ab")
+    output.write("cd")
+    assert stream.getvalue() == ""
+
+    # Written out once the threshold is reached.
+    output.write("e")
+    assert stream.getvalue() == "ab\ncd\ne\n"
+
+    output.write("f")
+    output.flush()
+    assert stream.getvalue() == "ab\ncd\ne\nf\n"
+
+    with pytest.raises(ValueError):
+        _ = BufferedOutput(stream, threshold=-1)
+
+
+def test_flushed_on_error():
+    stream = io.StringIO()
+    ev = Evaluator(output=BufferedOutput(stream))
+
+    with pytest.raises(ZeroDivisionError):
+        _ = ev.evaluate('print("before"); 1 / 0')
+
+    assert stream.getvalue() == "before\n"
+
+
+def test_execute():
+    stream = io.StringIO()
+    ev = Evaluator(output=BufferedOutput(stream))
+    _ = ev.execute(ev.compile('print("held")'))
+
+    # Only 'evaluate' and friends flush.
+    assert stream.getvalue() == ""
+
+    ev.output.flush()
+    assert stream.getvalue() == "held\n"
+
+
+def test_file(tmp_path: pathlib.Path):
+    path = tmp_path / "out.txt"
+    source = tmp_path / "script.calc"
+    _ = source.write_text(SCRIPT)
+
+    ev = Evaluator(output=FileOutput(path))
+    _ = ev.evaluate_file(str(source))
+    _ = ev.evaluate('print("again")')
+
+    assert path.read_text() == "2\n1\n0\ndone\nagain\n"
+
+
+def test_set_later(capsys: pytest.CaptureFixture[str]):
+    ev = Evaluator(native=True)
+    _ = ev.evaluate('print("stdout")')
+
+    ev.output = ListOutput()
+    _ = ev.evaluate('print("list")')
+
+    assert capsys.readouterr().out == "stdout\n"
+    assert ev.output.lines == ["list"]
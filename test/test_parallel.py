@@ -0,0 +1,50 @@
+import pathlib
+
+import pytest
+
+from pratt_calc.parallel import FileResult, evaluate_files, expand
+
+
+def write_sources(directory: pathlib.Path, count: int) -> list[str]:
+    filenames: list[str] = []
+
+    for n in range(count):
+        path = directory / f"{n:02}.calc"
+        _ = path.write_text(f"x <- x + {n}; print(str x); x * 2")
+        filenames.append(str(path))
+
+    return filenames
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_evaluate_files(jobs: int, tmp_path: pathlib.Path):
+    filenames = write_sources(tmp_path, 20)
+    results = evaluate_files(filenames, jobs)
+
+    # Each file starts out with fresh registers.
+    assert results == [
+        FileResult(filename, n * 2, f"{n}\n") for n, filename in enumerate(filenames)
+    ]
+
+
+def test_errors_are_isolated(tmp_path: pathlib.Path):
+    bad = tmp_path / "bad.calc"
+    _ = bad.write_text('print("oops"); 1 +* 2')
+
+    filenames = write_sources(tmp_path, 2)
+    results = evaluate_files([filenames[0], str(bad), "missing.calc", filenames[1]], 2)
+
+    assert [r.value for r in results] == [0, None, None, 2]
+    assert [r.error is None for r in results] == [True, False, False, True]
+
+
+def test_expand(tmp_path: pathlib.Path):
+    filenames = write_sources(tmp_path, 3)
+    pattern = str(tmp_path / "*.calc")
+    missing = str(tmp_path / "*.txt")
+
+    assert expand([pattern, missing, "README.md"]) == [
+        *filenames,
+        missing,
+        "README.md",
+    ]
@@ -0,0 +1,120 @@
+import sys
+
+import pytest
+
+from pratt_calc.compiler import Opcode
+from pratt_calc.evaluator import Evaluator
+
+LOOP = "f <- {n <- n - 1; n { call f }}; n <- 3; call f"
+
+
+def test_op_counts():
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate(LOOP)
+
+    assert ev.profiler is not None
+
+    counts = ev.profiler.op_counts()
+
+    # 'f' runs three times, and the conditional block twice.
+    assert counts[Opcode.CALL] == 3
+    assert counts[Opcode.COND] == 3
+    assert counts[Opcode.SUB] == 3
+
+    # Every call is in tail position (even the top level's), so only
+    # the last run of 'f' returns.
+    assert counts[Opcode.RETURN] == 1
+
+
+def test_blocks():
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate(LOOP + "; g <- {1}; call g; call g")
+    f, g = int(ev.evaluate("f")), int(ev.evaluate("g"))
+
+    assert ev.profiler is not None
+    assert ev.profiler.calls[f].calls == 3
+    assert ev.profiler.calls[g].calls == 2
+    assert [stats.calls for stats in ev.profiler.conditionals.values()] == [2]
+
+    labels = [label for label, _ in ev.profiler.blocks()]
+
+    assert sorted(labels) == sorted([f"@{f}", f"@{g}", "cond", "top", "top", "top"])
+    assert all(stats.seconds >= 0 for _, stats in ev.profiler.blocks())
+
+
+def test_time_after_return():
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate("f <- {1}; call f; " + "x <- x + 1; " * 20000)
+    f = int(ev.evaluate("f"))
+
+    assert ev.profiler is not None
+
+    # Once 'f' returns, the rest of the time is the top level's.
+    top = max(stats.seconds for stats in ev.profiler.toplevel.values())
+
+    assert ev.profiler.calls[f].seconds < top
+
+
+def test_compile_times():
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate("1 + 2")
+
+    assert ev.profiler is not None
+
+    tokenizer_seconds = ev.profiler.tokenizer_seconds
+
+    assert tokenizer_seconds > 0
+    assert ev.profiler.compiler_seconds > 0
+
+    # Cached code isn't compiled again.
+    _ = ev.evaluate("1 + 2")
+
+    assert ev.profiler.tokenizer_seconds == tokenizer_seconds
+
+
+def test_heap_sizes():
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate('s <- "abc"; t <- str 42')
+
+    assert ev.profiler is not None
+
+    sizes = [size for _, size in ev.profiler.heap_sizes]
+
+    assert sizes[0] == 0
+    assert sizes[-1] == ev.heap.size > 0
+
+
+def test_errors():
+    ev = Evaluator(profile=True)
+
+    with pytest.raises(ZeroDivisionError):
+        _ = ev.evaluate("f <- {1 / 0}; g <- {call f; 2}; call g")
+
+    assert ev.profiler is not None
+    assert not ev.profiler.running
+
+    _ = ev.evaluate(LOOP)
+
+    assert not ev.profiler.running
+
+
+def test_deep_recursion():
+    depth = 2 * sys.getrecursionlimit()
+    ev = Evaluator(profile=True)
+    _ = ev.evaluate("f <- {n <- n - 1; n { call f; k <- k + 1 }}")
+
+    assert ev.evaluate(f"n <- {depth}; call f; k") == depth - 1
+
+
+def test_toggle():
+    ev = Evaluator()
+    _ = ev.evaluate(LOOP)
+
+    assert ev.profiler is None
+
+    ev.profiler = Evaluator(profile=True).profiler
+    _ = ev.evaluate("n <- 3; call f")
+
+    assert ev.profiler is not None
+    assert ev.profiler.op_counts()[Opcode.CALL] == 3
+    assert "@0" in ev.profiler.report()
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pratt_calc.compiler import Opcode
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.programs import Programs
+
+LOOP = "f <- {n <- n - 1; total <- total + n; n { call f }}"
+
+
+def test_shared():
+    programs = Programs()
+    first = Evaluator(programs=programs)
+    second = Evaluator(programs=programs)
+
+    assert first.compile("x <- 2 + 3") is second.compile("x <- 2 + 3")
+    assert programs.cache.hits == 1
+
+    # Only compiled code is shared.
+    _ = first.evaluate("x <- 2 + 3")
+
+    assert first.evaluate("x") == 5
+    assert second.evaluate("x") == 0
+
+
+def test_options():
+    programs = Programs(cache_size=0, optimize=False)
+    ev = Evaluator(programs=programs)
+
+    assert [instr.op for instr in ev.compile("2 * 3").ops] == [
+        Opcode.PUSH,
+        Opcode.PUSH,
+        Opcode.MUL,
+        Opcode.RETURN,
+    ]
+    assert len(ev.cache) == 0
+
+
+def test_threads():
+    programs = Programs(cache_size=8)
+
+    def work(n: int) -> list[int | float]:
+        ev = Evaluator(programs=programs, native=n % 2 == 0)
+        _ = ev.evaluate(LOOP)
+
+        return [
+            ev.evaluate(f"n <- {n + 1 + i % 10}; total <- 0; call f; total")
+            for i in range(200)
+        ]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(work, range(16)))
+
+    for n, values in enumerate(results):
+        assert values == [(n + i % 10) * (n + 1 + i % 10) // 2 for i in range(200)]
+
+    assert programs.cache.hits + programs.cache.misses == 16 * 201
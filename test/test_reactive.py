@@ -0,0 +1,81 @@
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+from pratt_calc.reactive import Model
+
+script = """
+price <- 10
+qty <- 3
+rate <- 0.5
+total <- price * qty
+tax <- total * rate
+label <- qty + 1
+"""
+
+
+def test_same_as_evaluator():
+    model = Model()
+    ev = Evaluator()
+
+    assert model.evaluate(script + "tax") == ev.evaluate(script + "tax")
+
+
+def test_set_recomputes_dependents():
+    model = Model()
+    _ = model.evaluate(script)
+
+    update = model.set("price", 12)
+
+    assert update.recomputed == ("total", "tax")
+    assert update.skipped == 3
+    assert model.get("total") == 36
+    assert model.get("tax") == 18
+
+
+def test_set_unrelated():
+    model = Model()
+    _ = model.evaluate(script)
+
+    update = model.set("rate", 2)
+
+    assert update.recomputed == ("tax",)
+    assert model.get("tax") == 60
+    assert model.get("label") == 4
+
+
+def test_set_formula_makes_input():
+    model = Model()
+    _ = model.evaluate(script)
+
+    _ = model.set("total", 100)
+    update = model.set("price", 1)
+
+    assert update.recomputed == ()
+    assert model.get("total") == 100
+
+
+def test_reads_through_calls():
+    model = Model()
+    _ = model.evaluate("f <- {a * 2}; b <- (call f); a <- 5")
+
+    update = model.set("a", 7)
+
+    assert update.recomputed == ("b",)
+    assert model.get("b") == 14
+
+
+def test_self_reference():
+    model = Model()
+    _ = model.evaluate("x <- 1; y <- y + x")
+
+    _ = model.set("x", 5)
+
+    assert model.get("y") == 6
+
+
+def test_cycle():
+    model = Model()
+    _ = model.evaluate("a <- b + 1; b <- a + 1; c <- 0; b <- a + c")
+
+    with pytest.raises(ValueError):
+        _ = model.set("c", 1)
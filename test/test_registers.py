@@ -17,3 +17,18 @@ def test_examples(raw_expression: str, value: int | float):
     result = ev.evaluate(raw_expression)
 
     assert math.isclose(result, value, abs_tol=1e-10)
+
+
+def test_computed_register_address():
+    ev = Evaluator()
+
+    # 'x' lives at address 0, so '1 + x' is the address of 'y'.
+    assert ev.evaluate("x <- 0; y <- 0; 1 + x <- 5; y") == 5
+
+
+def test_definition_order():
+    ev = Evaluator()
+    _ = ev.evaluate("b <- {a <- 1}; call b; c <- 2")
+
+    assert [r.alias for r in ev.registers] == ["b", "a", "c"]
+    assert ev.symbols == {"b": 0, "a": 1, "c": 2}
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import pathlib
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+from typing import cast
+
+from pratt_calc.server import Server
+
+type Client = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def run(
+    session: Callable[[Client], Awaitable[None]],
+    address: str = "127.0.0.1:0",
+    timeout: float = 10.0,
+    max_pending: int = 64,
+):
+    """Run SESSION against a fresh server listening on ADDRESS."""
+
+    async def main():
+        server = Server(2, timeout, max_pending)
+
+        try:
+            listener = await server.start(address)
+
+            async with listener:
+                if address.startswith("unix:"):
+                    client = await asyncio.open_unix_connection(address[5:])
+                else:
+                    sockname = cast(tuple[str, int], listener.sockets[0].getsockname())
+                    host, port = sockname[:2]
+                    client = await asyncio.open_connection(host, port)
+
+                await session(client)
+
+                client[1].close()
+        finally:
+            server.close()
+
+    asyncio.run(main())
+
+
+async def send(client: Client, **request: object):
+    client[1].write(json.dumps(request).encode() + b"\n")
+    await client[1].drain()
+
+
+async def receive(client: Client) -> dict[str, object]:
+    return cast(dict[str, object], json.loads(await client[0].readline()))
+
+
+def test_evaluate():
+    async def session(client: Client):
+        await send(client, id=1, expr='print "hi"; x <- 3; x * 2')
+
+        assert await receive(client) == {
+            "id": 1,
+            "value": 6,
+            "output": "hi\n",
+            "error": None,
+        }
+
+    run(session)
+
+
+def test_unix_socket(tmp_path: pathlib.Path):
+    async def session(client: Client):
+        await send(client, id="a", expr="2 ^ 10")
+
+        assert (await receive(client))["value"] == 1024
+
+    run(session, f"unix:{tmp_path / 'calc.sock'}")
+
+
+def test_fresh_registers():
+    async def session(client: Client):
+        for i in range(4):
+            await send(client, id=i, expr="x <- x + 1")
+
+            assert (await receive(client))["value"] == 1
+
+    run(session)
+
+
+def test_pipelining():
+    async def session(client: Client):
+        for i in range(20):
+            await send(client, id=i, expr=f"{i} * 2")
+
+        replies = [await receive(client) for _ in range(20)]
+
+        assert {r["id"]: r["value"] for r in replies} == {i: i * 2 for i in range(20)}
+
+    run(session, max_pending=3)
+
+
+def test_errors():
+    async def session(client: Client):
+        await send(client, id=1, expr="1 / 0")
+        await send(client, id=2, nonsense=True)
+        client[1].write(b"not json\n")
+
+        replies = [await receive(client) for _ in range(3)]
+
+        assert {r["id"]: r["error"] for r in replies} == {
+            1: "division by zero",
+            2: "Unknown request",
+            None: "Malformed request",
+        }
+
+    run(session)
+
+
+def test_long_integers():
+    async def session(client: Client):
+        await send(client, id=1, expr="2000!")
+        await send(client, id=2, expr="2 ^ 10")
+
+        replies = {r["id"]: r for r in [await receive(client) for _ in range(2)]}
+
+        # Too long for a JSON number, and so sent as a string.
+        assert replies[1]["value"] == str(Decimal(math.factorial(2000)))
+        assert replies[2]["value"] == 1024
+
+    run(session)
+
+
+def test_worker_dies():
+    async def session(client: Client):
+        await send(client, id=1, expr="f <- {call f}; call f")
+        await asyncio.sleep(0.5)
+
+        for process in multiprocessing.active_children():
+            process.kill()
+
+        reply = await receive(client)
+
+        assert reply["id"] == 1
+        assert str(reply["error"]).startswith("Worker failed")
+
+        # Every worker is replaced once it's found to be gone.
+        values: list[object] = []
+
+        for i in range(4):
+            await send(client, id=i, expr="1 + 1")
+            values.append((await receive(client)).get("value"))
+
+        assert values[-2:] == [2, 2]
+
+    run(session)
+
+
+def test_timeout():
+    async def session(client: Client):
+        await send(client, id=1, expr="f <- {call f}; call f")
+
+        assert (await receive(client))["error"] == "Timed out after 0.5 s"
+
+        # The stuck worker has been replaced.
+        for i in range(3):
+            await send(client, id=i, expr="1 + 1")
+
+            assert (await receive(client))["value"] == 2
+
+    run(session, timeout=0.5)
+
+
+def test_stats():
+    async def session(client: Client):
+        for i in range(5):
+            await send(client, id=i, expr="1")
+            _ = await receive(client)
+
+        await send(client, id="stats", op="stats")
+        stats = await receive(client)
+
+        assert stats["completed"] == 5
+        assert {"throughput", "p50", "p90", "p99"} <= stats.keys()
+
+    run(session)
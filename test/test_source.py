@@ -5,15 +5,18 @@ from pratt_calc.evaluator import Evaluator
 examples = [
     ("test/source.txt", ["20"]),
     ("test/source_comments.txt", ["11", "15"]),
-    ("test/nested_blocks.txt", ["20", "100", "10000000000.0"]),
+    ("test/nested_blocks.txt", ["20", "100", "10000000000"]),
     ("test/conditionals.txt", ["hello", "goodbye"]),
 ]
 
 
+@pytest.mark.parametrize("stream", [False, True])
 @pytest.mark.parametrize("filename, lines", examples)
-def test_examples(filename: str, lines: list[str], capsys: pytest.CaptureFixture[str]):
+def test_examples(
+    filename: str, lines: list[str], stream: bool, capsys: pytest.CaptureFixture[str]
+):
     ev = Evaluator()
-    _ = ev.evaluate_file(filename)
+    _ = ev.evaluate_file(filename, stream)
 
     output = capsys.readouterr().out.splitlines()
     errors = capsys.readouterr().err
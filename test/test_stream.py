@@ -0,0 +1,41 @@
+import pytest
+
+from pratt_calc.evaluator import Evaluator
+
+source = """
+f <- {n <- n - 1; acc <- acc * 2; n { call f }}
+/* A comment which
+   spans several lines */
+n <- 10; acc <- 1
+s <- "hello { there"
+print(s); print(str call f)
+acc + 1
+"""
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 1000])
+def test_chunk_sizes(size: int, capsys: pytest.CaptureFixture[str]):
+    whole = Evaluator()
+    expected = whole.evaluate(source)
+    expected_output = capsys.readouterr().out
+
+    ev = Evaluator()
+    chunks = [source[i : i + size] for i in range(0, len(source), size)]
+
+    assert ev.evaluate_stream(chunks) == expected
+    assert capsys.readouterr().out == expected_output
+    assert [str(r) for r in ev.registers] == [str(r) for r in whole.registers]
+
+
+def test_statements_run_as_they_complete():
+    ev = Evaluator()
+    seen: list[int | float] = []
+
+    def chunks():
+        yield "x <- 1\ny <- "
+        seen.append(ev.evaluate("x"))
+        yield "2\n"
+
+    assert ev.evaluate_stream(chunks()) == 0
+    assert seen == [1]
+    assert ev.evaluate("y") == 2
@@ -0,0 +1,99 @@
+import pytest
+
+from pratt_calc.tokenizer import (
+    Cursor,
+    Op,
+    Span,
+    Token,
+    Type,
+    match_braces,
+    scan,
+    scan_chunks,
+    statements,
+)
+
+examples = [
+    ("1\n\n2", ["1", ";", "2", "eof"]),
+    ("1\n/* one */\n/* two */\n2", ["1", ";", "2", "eof"]),
+    ("1\n \n2", ["1", ";", ";", "2", "eof"]),
+    ("/* a\nmulti-line\ncomment */x", ["x", "eof"]),
+    ("a /* x */ <- 3.5", ["a", "<-", "3.5", "eof"]),
+]
+
+
+@pytest.mark.parametrize("raw_expression, whats", examples)
+def test_examples(raw_expression: str, whats: list[str]):
+    assert [t.what for t in scan(raw_expression)] == whats
+
+
+def test_operators_are_interned():
+    plus, semicolon = scan("+\n")[:2]
+
+    assert plus is Op.plus
+    assert semicolon is Op.semicolon
+
+
+def test_numbers():
+    assert scan("3 3.5")[:2] == [Token(Type.INT, "3"), Token(Type.FLOAT, "3.5")]
+
+
+@pytest.mark.parametrize("raw_expression, _", examples)
+def test_chunks(raw_expression: str, _: list[str]):
+    expected = scan(raw_expression)
+
+    for size in range(1, len(raw_expression) + 1):
+        chunks = [
+            raw_expression[i : i + size] for i in range(0, len(raw_expression), size)
+        ]
+
+        assert list(scan_chunks(chunks)) == expected
+
+
+splits = [
+    ("a <- 1; b <- 2\nc", ["a <- 1", "b <- 2", "c"]),
+    ('f <- {x; y}; (1; 2); "a ; b"', ["f <- { x ; y }", "( 1 ; 2 )", '" a ; b "']),
+    ("2 * ; 3; 4", ["2 * ; 3 ; 4"]),
+    ("x <- call f; y; z", ["x <- call f ; y ; z"]),
+    ("print(x); 1 + y {z}; w", ["print ( x )", "1 + y { z } ; w"]),
+    ("1; 2 ) 3; 4", ["1", "2 )"]),
+    ("1;", ["1", ""]),
+]
+
+
+@pytest.mark.parametrize("raw_expression, expected", splits)
+def test_statements(raw_expression: str, expected: list[str]):
+    result = [" ".join([t.what for t in s]) for s in statements(scan(raw_expression))]
+
+    assert result == expected
+
+
+def test_match_braces():
+    tokens = scan("} { a { b } { } } {")
+
+    assert match_braces(tokens) == {1: 8, 3: 5, 6: 7}
+
+
+def test_span():
+    tokens = scan("a b c d e")
+    span = Span(tokens, 1, 4)
+
+    assert list(span) == tokens[1:4]
+    assert len(span) == 3
+    assert span[0] == span[-3] == tokens[1]
+    assert list(span[1:]) == tokens[2:4]
+    assert list(span[::2]) == [tokens[1], tokens[3]]
+
+    with pytest.raises(IndexError):
+        _ = span[3]
+
+
+def test_cursor():
+    tokens = scan("a b c")
+    cursor = Cursor(Span(tokens, 1, 3))
+
+    assert cursor.peek() == cursor.advance() == tokens[1]
+    assert list(cursor) == [tokens[2]]
+
+    # Past the end, there's no end of 'eof' tokens.
+    assert cursor.advance() == cursor.advance() == Op.eof
+    assert cursor.peek() == Op.eof